@@ -0,0 +1,285 @@
+"""
+Checkout and return as atomic conditional updates.
+
+Checkout claims the book with a single UPDATE that only matches while the
+book is still available, and the student's quota with a single UPDATE that
+only matches while the student is under both limits; whichever desk loses
+the race updates no row and gets an error, without waiting on a lock held
+for the whole request. Return closes the borrow the same way, so a borrow
+is never returned twice. The open_book unique constraint on Borrow is the
+last line of defence: at most one active or late borrow per book.
+
+Each operation runs in one short transaction that starts by locking the
+book row, so two operations on the same book queue there and nowhere else.
+The bulk variants lock their books (in ISBN order) up front instead, then
+apply each kind of change to the whole stack with one statement.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, F, OuterRef
+from django.db.models.functions import Now
+
+from Books.cache import bump_catalog_version
+from Books.models import Book
+from fine.accrual import fine_amount
+from fine.models import Fine
+from user.models import StudentStats
+from user.stats import OPEN_BORROW_STATUSES, reconcile, record_fine, record_return, touch_history
+from .models import Borrow
+
+MAX_ACTIVE_BORROWS = 5
+MAX_UNPAID_FINES = 100  # TL
+ACTIVE_LIMIT_MESSAGE = (
+    f'Bu üye zaten {MAX_ACTIVE_BORROWS} kitap ödünç almış. Maksimum kitap limitine ulaşıldı.'
+)
+
+
+class CirculationError(ValueError):
+    """Raised when a checkout or return cannot be done; ``status`` is the HTTP status."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def _claim_quota(student_id):
+    # Counts the borrow only while the student is under both limits
+    return StudentStats.objects.filter(
+        student_id=student_id,
+        active_borrows__lt=MAX_ACTIVE_BORROWS,
+        unpaid_fines__lt=MAX_UNPAID_FINES
+    ).update(
+        active_borrows=F('active_borrows') + 1,
+        total_borrows=F('total_borrows') + 1,
+        history_changed=Now()
+    ) == 1
+
+
+def _quota_error(stats):
+    """The error for a student whose counters ``stats`` are over a limit."""
+    if stats.active_borrows >= MAX_ACTIVE_BORROWS:
+        return CirculationError(ACTIVE_LIMIT_MESSAGE)
+    return CirculationError(
+        f'Bu üyenin ödenmemiş cezası {stats.unpaid_fines} TL. Limit {MAX_UNPAID_FINES} TL. '
+        'Önce cezalarını ödemesi gerekiyor.'
+    )
+
+
+def checkout(staff, student, isbn, borrow_date, due_date):
+    """
+    Lend book ``isbn`` to ``student``. Returns the new Borrow (with its
+    book loaded); raises CirculationError if the book is missing or not
+    available, or the student is over a quota.
+    """
+    with transaction.atomic():
+        # 1. available -> borrowed, only if nobody got there first
+        if not Book.objects.filter(ISBN=isbn, status='available').update(status='borrowed'):
+            if not Book.objects.filter(ISBN=isbn).exists():
+                raise CirculationError('Book not found', status=404)
+            raise CirculationError('Book is not available')
+
+        # 2. The student's quota, counted only while under the limits
+        if not _claim_quota(student.pk):
+            if not StudentStats.objects.filter(student=student).exists():
+                # No counters row yet: build it from history and retry
+                reconcile([student.pk])
+            if not _claim_quota(student.pk):
+                raise _quota_error(StudentStats.objects.get(student=student))
+
+        # 3. The borrow; the open_book constraint rejects a second open one
+        try:
+            with transaction.atomic():
+                borrow = Borrow.objects.create(
+                    staff=staff,
+                    student=student,
+                    book_id=isbn,
+                    date=borrow_date,
+                    last_date=due_date,
+                    status='active'
+                )
+        except IntegrityError:
+            raise CirculationError('Book is not available')
+
+        bump_catalog_version()
+
+    borrow.book = Book.objects.only('ISBN', 'name').get(ISBN=isbn)
+    return borrow
+
+
+def checkin(staff, borrow_id, today):
+    """
+    Return borrow ``borrow_id``, fining a late return. Raises
+    CirculationError if the borrow is missing or already returned.
+    Returns the fine created, or None.
+    """
+    with transaction.atomic():
+        borrow = Borrow.objects.filter(Borrow_ID=borrow_id).only(
+            'Borrow_ID', 'book_id', 'student_id', 'last_date', 'status'
+        ).first()
+        if borrow is None:
+            raise CirculationError('Borrow record not found', status=404)
+
+        # Book first, the same lock order as checkout
+        Book.objects.filter(ISBN=borrow.book_id).update(status='available')
+
+        # open -> returned, only once
+        if not Borrow.objects.filter(
+            Borrow_ID=borrow_id,
+            status__in=OPEN_BORROW_STATUSES
+        ).update(status='returned'):
+            raise CirculationError('Book already returned')
+
+        fine = None
+        if today > borrow.last_date and not Fine.objects.filter(Borrow_ID_id=borrow_id).exists():
+            fine = Fine.objects.create(
+                Staff_ID=staff,
+                Student_ID_id=borrow.student_id,
+                Borrow_ID_id=borrow_id,
+                Date=today,
+                Status='unpaid',
+                Amount=fine_amount(borrow.last_date, today)
+            )
+            record_fine(borrow.student_id, fine.Amount)
+
+        record_return(borrow.student_id)
+        bump_catalog_version()
+    return fine
+
+
+def bulk_checkout(staff, student, isbns, borrow_date, due_date):
+    """
+    Lend a stack of books to ``student`` in one transaction with a fixed
+    number of queries. The quota and fine limit are checked once for the
+    whole stack; books past the quota, missing or not available are
+    reported and skipped. Returns one result dict per ISBN, in order.
+    """
+    results = [{'isbn': isbn, 'success': False} for isbn in isbns]
+
+    with transaction.atomic():
+        # Lock order as in checkout: the books, then the student's counters
+        books = {
+            book['ISBN']: book
+            for book in Book.objects.select_for_update().filter(ISBN__in=isbns)
+            .order_by('ISBN').values('ISBN', 'name', 'status')
+        }
+        stats = StudentStats.objects.select_for_update().filter(student=student).first()
+        if stats is None:
+            reconcile([student.pk])
+            stats = StudentStats.objects.select_for_update().get(student=student)
+
+        # Books the student may still take, and why the rest are refused
+        if stats.unpaid_fines >= MAX_UNPAID_FINES:
+            quota = 0
+            quota_error = str(_quota_error(stats))
+        else:
+            quota = MAX_ACTIVE_BORROWS - stats.active_borrows
+            quota_error = ACTIVE_LIMIT_MESSAGE
+        accepted = []
+        for result in results:
+            isbn = result['isbn']
+            book = books.get(isbn)
+            if book is None:
+                result['error'] = 'Book not found'
+            elif book['status'] != 'available':
+                result['error'] = 'Book is not available'
+            elif len(accepted) >= quota:
+                result['error'] = quota_error
+            else:
+                # A repeated ISBN is not available the second time
+                book['status'] = 'borrowed'
+                result['book_name'] = book['name']
+                accepted.append(isbn)
+
+        if accepted:
+            Book.objects.filter(ISBN__in=accepted).update(status='borrowed')
+            borrows = Borrow.objects.bulk_create([
+                Borrow(staff=staff, student=student, book_id=isbn, date=borrow_date, last_date=due_date, status='active')
+                for isbn in accepted
+            ])
+            if all(borrow.pk for borrow in borrows):
+                borrow_ids = {borrow.book_id: borrow.pk for borrow in borrows}
+            else:
+                # Backends that do not return ids from a bulk INSERT (MySQL)
+                borrow_ids = dict(
+                    Borrow.objects.filter(open_book__in=accepted).values_list('book_id', 'Borrow_ID')
+                )
+            StudentStats.objects.filter(student=student).update(
+                active_borrows=F('active_borrows') + len(accepted),
+                total_borrows=F('total_borrows') + len(accepted),
+                history_changed=Now()
+            )
+            bump_catalog_version()
+
+            for result in results:
+                if result['isbn'] in borrow_ids and 'error' not in result:
+                    result['success'] = True
+                    result['borrow_id'] = borrow_ids[result['isbn']]
+    return results
+
+
+def bulk_checkin(staff, borrow_ids, today):
+    """
+    Return a stack of borrows in one transaction with a fixed number of
+    queries, fining late returns. Borrows that are missing or already
+    returned are reported and skipped. Returns one result dict per
+    borrow id, in order.
+    """
+    results = [{'borrow_id': borrow_id, 'success': False} for borrow_id in borrow_ids]
+
+    with transaction.atomic():
+        # Lock order as in checkin: the books, then the borrows
+        list(
+            Book.objects.select_for_update()
+            .filter(ISBN__in=Borrow.objects.filter(Borrow_ID__in=borrow_ids).values('book_id'))
+            .order_by('ISBN').values_list('ISBN', flat=True)
+        )
+        borrows = {
+            borrow['Borrow_ID']: borrow
+            for borrow in Borrow.objects.select_for_update().filter(Borrow_ID__in=borrow_ids)
+            .annotate(has_fine=Exists(Fine.objects.filter(Borrow_ID=OuterRef('pk'))))
+            .values('Borrow_ID', 'book_id', 'student_id', 'last_date', 'status', 'has_fine')
+        }
+
+        closing = []
+        for result in results:
+            borrow = borrows.get(result['borrow_id'])
+            if borrow is None:
+                result['error'] = 'Borrow record not found'
+            elif borrow['status'] not in OPEN_BORROW_STATUSES:
+                result['error'] = 'Book already returned'
+            else:
+                # A repeated id is already returned the second time
+                borrow['status'] = 'returned'
+                closing.append(borrow)
+
+        if closing:
+            Borrow.objects.filter(Borrow_ID__in=[borrow['Borrow_ID'] for borrow in closing]).update(status='returned')
+            Book.objects.filter(ISBN__in=[borrow['book_id'] for borrow in closing]).update(status='available')
+
+            fines = [
+                Fine(
+                    Staff_ID=staff,
+                    Student_ID_id=borrow['student_id'],
+                    Borrow_ID_id=borrow['Borrow_ID'],
+                    Date=today,
+                    Status='unpaid',
+                    Amount=fine_amount(borrow['last_date'], today)
+                )
+                for borrow in closing
+                if today > borrow['last_date'] and not borrow['has_fine']
+            ]
+            Fine.objects.bulk_create(fines)
+            fined = {fine.Borrow_ID_id: fine.Amount for fine in fines}
+
+            # Counters of every student in the stack, rebuilt in a fixed
+            # number of statements
+            student_ids = {borrow['student_id'] for borrow in closing} - {None}
+            reconcile(student_ids)
+            touch_history(student_ids)
+            bump_catalog_version()
+
+            closed = {borrow['Borrow_ID'] for borrow in closing}
+            for result in results:
+                if result['borrow_id'] in closed and 'error' not in result:
+                    result['success'] = True
+                    result['fine'] = fined.get(result['borrow_id'])
+    return results
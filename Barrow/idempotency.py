@@ -0,0 +1,165 @@
+"""
+Idempotency-Key support for the staff circulation endpoints.
+
+Kiosks and desks on flaky networks retry requests whose response they never
+saw. A staff request carrying an Idempotency-Key header is recorded before it
+runs, and its response is stored in the same transaction as the view's
+writes; a retry with the same key is answered from that record with one
+indexed read, without running the view again or touching Borrow, Book or
+Fine. If the process dies before that transaction commits, nothing of the
+request is kept and the record is taken over by a retry once it is
+IDEMPOTENCY_PROCESSING_TIMEOUT seconds old.
+
+Keys are scoped to the staff member, and a key reused for a different
+request (other path or body) is rejected. Server errors are not stored and
+their writes are rolled back, so those requests can be retried for real.
+Records expire after IDEMPOTENCY_KEY_TTL seconds; the
+purge_idempotency_keys command deletes expired ones.
+"""
+import hashlib
+import json
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse, JsonResponse
+from django.utils import timezone
+
+from .models import IdempotencyRecord
+
+HEADER = 'HTTP_IDEMPOTENCY_KEY'
+MAX_KEY_LENGTH = 255
+
+# Expired records deleted per statement by purge_expired()
+PURGE_BATCH_SIZE = 1000
+
+
+def _ttl():
+    return timedelta(seconds=getattr(settings, 'IDEMPOTENCY_KEY_TTL', 86400))
+
+
+def _processing_timeout():
+    # A record left in progress this long belongs to a request that died
+    return timedelta(seconds=getattr(settings, 'IDEMPOTENCY_PROCESSING_TIMEOUT', 60))
+
+
+def fingerprint(request):
+    """Hash identifying the request a key was first used for."""
+    digest = hashlib.sha256()
+    digest.update(request.method.encode())
+    digest.update(b'\0')
+    digest.update(request.get_full_path().encode())
+    digest.update(b'\0')
+    digest.update(request.body)
+    return digest.hexdigest()
+
+
+def purge_expired(batch_size=PURGE_BATCH_SIZE):
+    """Delete at most ``batch_size`` expired records; returns how many."""
+    # MySQL cannot DELETE with a LIMIT subquery: fetch the keys first
+    pks = list(
+        IdempotencyRecord.objects.filter(expires__lt=timezone.now()).values_list('pk', flat=True)[:batch_size]
+    )
+    if not pks:
+        return 0
+    deleted, _ = IdempotencyRecord.objects.filter(pk__in=pks).delete()
+    return deleted
+
+
+def _replay(record):
+    response = HttpResponse(bytes(record.body), status=record.status_code)
+    for name, value in json.loads(record.headers or '{}').items():
+        response[name] = value
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def _error(message, status, cors):
+    return cors(JsonResponse({'error': message}, status=status))
+
+
+def _claim(owner, key, digest):
+    """
+    Record that the request with ``key`` is starting. Returns None when
+    this request owns the key, otherwise the existing record.
+    """
+    now = timezone.now()
+    # Retries are the common case here: one read answers them
+    record = IdempotencyRecord.objects.filter(owner=owner, key=key).first()
+    if record is None:
+        try:
+            with transaction.atomic():
+                IdempotencyRecord.objects.create(
+                    owner=owner, key=key, fingerprint=digest, created=now, expires=now + _ttl()
+                )
+            return None
+        except IntegrityError:
+            # A concurrent request with the same key got there first
+            record = IdempotencyRecord.objects.get(owner=owner, key=key)
+
+    if record.expires < now or (
+        record.status_code is None and record.created < now - _processing_timeout()
+    ):
+        # Expired, or abandoned by a request that died: take it over
+        taken = IdempotencyRecord.objects.filter(
+            pk=record.pk, created=record.created, status_code=record.status_code
+        ).update(fingerprint=digest, created=now, expires=now + _ttl(), status_code=None, headers='', body=b'')
+        if taken:
+            return None
+        record.refresh_from_db()
+    return record
+
+
+def idempotent(cors, permission):
+    """
+    Make a circulation view safe to retry with an Idempotency-Key header.
+    ``cors`` adds the view module's CORS headers to the responses built here;
+    requests failing ``permission`` go to the view without claiming a key.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            key = request.META.get(HEADER, '').strip()
+            if not key or request.method == 'OPTIONS' or not permission(request):
+                return view(request, *args, **kwargs)
+            if len(key) > MAX_KEY_LENGTH:
+                return _error(f'Idempotency-Key must be at most {MAX_KEY_LENGTH} characters', 400, cors)
+
+            owner = str(request.session.get('user_id'))
+            digest = fingerprint(request)
+            record = _claim(owner, key, digest)
+            if record is not None:
+                if record.fingerprint != digest:
+                    return _error('Idempotency-Key was already used for a different request', 422, cors)
+                if record.status_code is None:
+                    return _error('A request with this Idempotency-Key is still being processed', 409, cors)
+                return _replay(record)
+
+            try:
+                with transaction.atomic():
+                    response = view(request, *args, **kwargs)
+                    final = response.status_code < 500 and not response.streaming
+                    if final:
+                        # Committed together with the view's writes, or not at all
+                        headers = {
+                            name: value for name, value in response.items()
+                            if name.lower() not in ('content-length', 'set-cookie')
+                        }
+                        IdempotencyRecord.objects.filter(owner=owner, key=key, status_code=None).update(
+                            status_code=response.status_code,
+                            headers=json.dumps(headers),
+                            body=response.content
+                        )
+                    elif response.status_code >= 500:
+                        transaction.set_rollback(True)
+            except Exception:
+                IdempotencyRecord.objects.filter(owner=owner, key=key, status_code=None).delete()
+                raise
+
+            if not final:
+                # Not a final answer: let the client retry for real
+                IdempotencyRecord.objects.filter(owner=owner, key=key, status_code=None).delete()
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,177 @@
+import statistics
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Count, Q, Sum
+
+from Barrow.models import Borrow
+from fine.models import Fine
+
+# The circulation indexes this command measures (see the models' Meta)
+INDEXES = [
+    (Borrow, "borrow_status_due_idx"),
+    (Borrow, "borrow_student_status_idx"),
+    (Fine, "fine_student_status_idx"),
+    (Fine, "fine_status_date_idx"),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the circulation query shapes (overdue sweep, late list, student "
+        "quotas and fines, filtered borrow and fine lists) and print their query "
+        "plans. With --compare the circulation indexes are dropped for a second "
+        "run and recreated afterwards; use a copy of the database for that."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=20,
+            help="Runs per query; the median is reported.",
+        )
+        parser.add_argument(
+            "--compare",
+            action="store_true",
+            help="Also measure without the circulation indexes (drops and recreates them).",
+        )
+        parser.add_argument(
+            "--plans",
+            action="store_true",
+            help="Print the query plan of every query.",
+        )
+
+    def handle(self, *args, **options):
+        queries = self._queries()
+        self.stdout.write(
+            f"{Borrow.objects.count()} borrows, {Fine.objects.count()} fines, "
+            f"{options['repeat']} runs per query"
+        )
+
+        with_indexes = self._measure(queries, options, "with indexes")
+        if not options["compare"]:
+            self._report(with_indexes)
+            return
+
+        self.stdout.write("Dropping the circulation indexes...")
+        with connection.schema_editor() as editor:
+            for model, name in INDEXES:
+                editor.remove_index(model, self._index(model, name))
+        try:
+            without_indexes = self._measure(queries, options, "without indexes")
+        finally:
+            self.stdout.write("Recreating the circulation indexes...")
+            with connection.schema_editor() as editor:
+                for model, name in INDEXES:
+                    editor.add_index(model, self._index(model, name))
+
+        self._report(with_indexes, without_indexes)
+
+    def _index(self, model, name):
+        return next(index for index in model._meta.indexes if index.name == name)
+
+    def _queries(self):
+        """
+        (label, queryset, run) triples in the shapes the views use; ``run``
+        evaluates the queryset the way its view does.
+        """
+        today = date.today()
+        month_ago = today - timedelta(days=30)
+        # The busiest student stands in for a long-time member
+        student_id = (
+            Borrow.objects.exclude(student=None)
+            .values("student")
+            .annotate(n=Count("pk"))
+            .order_by("-n")
+            .values_list("student", flat=True)
+            .first()
+        )
+        fetch = list
+        count = lambda queryset: queryset.count()
+
+        return [
+            (
+                "sweep: active borrows now due",
+                Borrow.objects.filter(status="active", last_date__lt=today).values_list("pk"),
+                fetch,
+            ),
+            (
+                "late list, most overdue first",
+                Borrow.objects.filter(Q(status="late") | Q(status="active", last_date__lt=today))
+                .order_by("last_date", "Borrow_ID")
+                .values_list("pk")[:100],
+                fetch,
+            ),
+            (
+                "student's open borrows",
+                Borrow.objects.filter(student_id=student_id, status__in=["active", "late"]),
+                count,
+            ),
+            (
+                "borrows by status, last 30 days",
+                Borrow.objects.filter(status="returned", date__gte=month_ago)
+                .order_by("-Borrow_ID")
+                .values_list("pk")[:100],
+                fetch,
+            ),
+            (
+                "student's unpaid fine total",
+                Fine.objects.filter(Student_ID_id=student_id, Status="unpaid"),
+                lambda queryset: queryset.aggregate(total=Sum("Amount")),
+            ),
+            (
+                "unpaid fines, last 30 days",
+                Fine.objects.filter(Status="unpaid", Date__gte=month_ago)
+                .order_by("-Date", "-Fine_ID")
+                .values_list("pk")[:100],
+                fetch,
+            ),
+        ]
+
+    def _analyze(self):
+        # Fresh planner statistics, so plans reflect the current indexes
+        with connection.cursor() as cursor:
+            for model in (Borrow, Fine):
+                table = connection.ops.quote_name(model._meta.db_table)
+                cursor.execute(f"ANALYZE TABLE {table}" if connection.vendor == "mysql" else f"ANALYZE {table}")
+                if cursor.description:
+                    cursor.fetchall()
+
+    def _measure(self, queries, options, title):
+        """Median milliseconds per query label; prints plans with --plans."""
+        self._analyze()
+        results = {}
+        if options["plans"]:
+            self.stdout.write(self.style.MIGRATE_HEADING(f"Query plans {title}"))
+
+        for label, queryset, run in queries:
+            if options["plans"]:
+                self.stdout.write(f"{label}:\n{queryset.explain()}\n")
+            run(queryset.all())  # warm up the caches
+            timings = []
+            for _ in range(max(1, options["repeat"])):
+                # .all() is a fresh copy, so nothing is served from the result cache
+                started = time.perf_counter()
+                run(queryset.all())
+                timings.append((time.perf_counter() - started) * 1000)
+            results[label] = statistics.median(timings)
+        return results
+
+    def _report(self, with_indexes, without_indexes=None):
+        width = max(len(label) for label in with_indexes)
+        if without_indexes is None:
+            self.stdout.write(f"{'query'.ljust(width)}  with indexes")
+            for label, ms in with_indexes.items():
+                self.stdout.write(f"{label.ljust(width)}  {ms:9.2f} ms")
+            return
+
+        self.stdout.write(f"{'query'.ljust(width)}  without indexes  with indexes  speedup")
+        for label, ms in with_indexes.items():
+            before = without_indexes[label]
+            speedup = before / ms if ms else 0
+            self.stdout.write(
+                f"{label.ljust(width)}  {before:12.2f} ms  {ms:9.2f} ms  {speedup:6.1f}x"
+            )
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from Barrow.idempotency import PURGE_BATCH_SIZE, purge_expired
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete expired Idempotency-Key records, in batches so no statement "
+        "holds locks for long. Run it periodically, e.g. hourly from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=PURGE_BATCH_SIZE,
+            help="Records deleted per statement.",
+        )
+
+    def handle(self, *args, **options):
+        total = 0
+        while True:
+            deleted = purge_expired(options["batch_size"])
+            total += deleted
+            if deleted < options["batch_size"]:
+                break
+        self.stdout.write(self.style.SUCCESS(f"Deleted {total} expired idempotency records"))
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("Barrow", "0002_alter_borrow_student"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="OverdueSweep",
+            fields=[
+                ("name", models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ("locked_by", models.CharField(blank=True, default="", max_length=100)),
+                ("locked_until", models.DateTimeField(blank=True, null=True)),
+                ("last_run", models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+    ]
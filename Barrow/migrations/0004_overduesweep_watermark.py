@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("Barrow", "0003_overduesweep"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="overduesweep",
+            name="watermark",
+            field=models.DateField(blank=True, null=True),
+        ),
+    ]
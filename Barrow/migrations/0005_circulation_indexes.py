@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("Barrow", "0004_overduesweep_watermark"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="borrow",
+            index=models.Index(fields=["status", "last_date"], name="borrow_status_due_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="borrow",
+            index=models.Index(fields=["student", "status"], name="borrow_student_status_idx"),
+        ),
+    ]
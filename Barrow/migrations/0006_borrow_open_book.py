@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("Barrow", "0005_circulation_indexes"),
+        ("Books", "0010_catalogversion"),
+        ("user", "0006_studentstats_history_changed"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="borrow",
+            name="open_book",
+            field=models.GeneratedField(db_persist=True, expression=models.Case(models.When(status__in=["active", "late"], then=models.F("book")), default=None), output_field=models.CharField(max_length=20, null=True)),
+        ),
+        migrations.AddConstraint(
+            model_name="borrow",
+            constraint=models.UniqueConstraint(fields=("open_book",), name="borrow_one_open_per_book"),
+        ),
+    ]
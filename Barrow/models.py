@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models import Case, F, When
 from user.models import Staff, Student
 from Books.models import Book
 
@@ -37,4 +38,66 @@ class Borrow(models.Model):
     # Date (Borrow Date)
     date = models.DateField()      # ödünç alma tarihi
     # Last_Date (Due Date)
-    last_date = models.DateField() # teslim edilmesi gereken son gün
\ No newline at end of file
+    last_date = models.DateField() # teslim edilmesi gereken son gün
+    # The book while the borrow is open, NULL once returned; unique, so a
+    # book has at most one open borrow (NULLs never collide)
+    open_book = models.GeneratedField(
+        expression=Case(
+            When(status__in=['active', 'late'], then=F('book')),
+            default=None,
+        ),
+        output_field=models.CharField(max_length=20, null=True),
+        db_persist=True,
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['open_book'], name='borrow_one_open_per_book'),
+        ]
+        indexes = [
+            # Overdue sweep and late list: status with a due-date range
+            models.Index(fields=['status', 'last_date'], name='borrow_status_due_idx'),
+            # A student's open borrows (quota checks, student filter)
+            models.Index(fields=['student', 'status'], name='borrow_student_status_idx'),
+        ]
+
+class OverdueSweep(models.Model):
+    """
+    Bookkeeping row for the background overdue sweeper.
+    Doubles as a lease-based lock so only one worker sweeps at a time,
+    and stores the watermark that makes the next sweep incremental.
+    """
+    name = models.CharField(max_length=50, primary_key=True)
+    locked_by = models.CharField(max_length=100, blank=True, default='')
+    locked_until = models.DateTimeField(null=True, blank=True)
+    last_run = models.DateTimeField(null=True, blank=True)
+    # Date of the last completed sweep; borrows due before it are already late
+    watermark = models.DateField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Sweep: {self.name}"
+
+class IdempotencyRecord(models.Model):
+    """
+    Outcome of a staff circulation request sent with an Idempotency-Key
+    header, so a retried request is answered with the stored response
+    instead of being applied again (see Barrow/idempotency.py).
+    A row without a status code is a request still being processed.
+    """
+    owner = models.CharField(max_length=50)  # User_ID of the staff member
+    key = models.CharField(max_length=255)
+    # Hash of method, path and body: a key may only be reused for the same request
+    fingerprint = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    headers = models.TextField(blank=True, default='')
+    body = models.BinaryField(blank=True, default=b'')
+    created = models.DateTimeField()
+    expires = models.DateTimeField(db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['owner', 'key'], name='idempotency_owner_key_uniq'),
+        ]
+
+    def __str__(self):
+        return f"Idempotency key: {self.key}"
@@ -0,0 +1,91 @@
+"""
+Overdue sweeper shared by the whole project.
+
+Moves overdue borrows to late status and creates/updates their fines
+through the set-based accrual engine in ``fine.accrual``. Runs in the
+background through the ``sweep_overdue`` management command instead of
+inline on the request path.
+
+Each completed sweep stores its date as a watermark, so the next sweep only
+looks at borrows that fell due since then.
+"""
+import logging
+import os
+import socket
+from datetime import date, timedelta
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from Books.cache import bump_catalog_version
+from fine.accrual import accrue_fines
+from .models import OverdueSweep
+
+logger = logging.getLogger(__name__)
+
+SWEEP_NAME = 'overdue'
+
+
+def acquire_sweep_lock(owner, lease_seconds):
+    """
+    Take the sweep lock for ``owner`` if nobody holds an unexpired lease.
+    The lease expires on its own, so a crashed worker cannot block sweeping.
+    Returns True if the lock was acquired.
+    """
+    OverdueSweep.objects.get_or_create(name=SWEEP_NAME)
+    now = timezone.now()
+
+    # Conditional UPDATE: only one worker can win the row
+    acquired = OverdueSweep.objects.filter(
+        Q(locked_until__isnull=True) | Q(locked_until__lt=now) | Q(locked_by=owner),
+        name=SWEEP_NAME
+    ).update(
+        locked_by=owner,
+        locked_until=now + timedelta(seconds=lease_seconds)
+    )
+    return acquired == 1
+
+
+def release_sweep_lock(owner):
+    """Release the sweep lock if ``owner`` still holds it."""
+    OverdueSweep.objects.filter(name=SWEEP_NAME, locked_by=owner).update(
+        locked_by='',
+        locked_until=None,
+        last_run=timezone.now()
+    )
+
+
+def default_owner():
+    """Identify this worker process in the lock row."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def run_sweep(owner=None, lease_seconds=600, full=False):
+    """
+    Run one overdue sweep under the database lock.
+    Incremental from the stored watermark unless ``full`` is set or no
+    sweep has completed yet.
+    Returns the accrual report, or None if another worker holds the lock.
+    """
+    owner = owner or default_owner()
+
+    if not acquire_sweep_lock(owner, lease_seconds):
+        logger.info("Overdue sweep skipped, lock held by another worker")
+        return None
+
+    try:
+        today = date.today()
+        sweep = OverdueSweep.objects.get(name=SWEEP_NAME)
+        since = None if full else sweep.watermark
+
+        # The watermark only moves if the accrual commits
+        with transaction.atomic():
+            report = accrue_fines(today=today, since=since)
+            OverdueSweep.objects.filter(name=SWEEP_NAME).update(watermark=today)
+            if report['borrows_marked_late'] or report['books_marked_late']:
+                bump_catalog_version()
+    finally:
+        release_sweep_lock(owner)
+
+    return report
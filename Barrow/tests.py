@@ -1,3 +1,311 @@
+import json
+from datetime import date, timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.db.models import F
 from django.test import TestCase
 
-# Create your tests here.
+from Books.models import Book
+from fine.accrual import FINE_PER_DAY
+from fine.models import Fine
+from user.models import Staff, Student, StudentStats, User
+from user.stats import reconcile
+from .circulation import (
+    MAX_ACTIVE_BORROWS, CirculationError, bulk_checkin, bulk_checkout, checkin, checkout
+)
+from .models import Borrow, IdempotencyRecord, OverdueSweep
+from .overdue import SWEEP_NAME, acquire_sweep_lock, run_sweep
+
+TODAY = date(2025, 3, 1)
+DUE = TODAY + timedelta(days=10)
+
+
+class CirculationTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create(
+            Name='Desk', Email='desk@example.com', Phone='5000000000', Username='desk',
+            Password=make_password('secret'), Type='staff'
+        )
+        cls.staff = Staff.objects.create(user=user)
+        cls.students = []
+        for i in range(2):
+            user = User.objects.create(
+                Name=f'Öğrenci {i}', Email=f'student{i}@example.com', Phone=f'510000000{i}',
+                Username=f'student{i}', Password=make_password('secret'), Type='student'
+            )
+            cls.students.append(Student.objects.create(user=user))
+        reconcile()
+        for i in range(MAX_ACTIVE_BORROWS + 3):
+            Book.objects.create(
+                ISBN=f'97800000{i:02d}', name=f'Kitap {i}', explanation='', publisher='Yapı Kredi',
+                author='Orhan Pamuk', type='Roman', image=''
+            )
+
+    def isbn(self, i):
+        return f'97800000{i:02d}'
+
+    def assertStats(self, student, active, total, unpaid=0):
+        stats = StudentStats.objects.get(student=student)
+        self.assertEqual(
+            (stats.active_borrows, stats.total_borrows, stats.unpaid_fines),
+            (active, total, unpaid)
+        )
+
+    def assertBookStatus(self, i, status):
+        self.assertEqual(Book.objects.get(ISBN=self.isbn(i)).status, status)
+
+
+class CheckoutTests(CirculationTestCase):
+
+    def test_same_book_twice(self):
+        first, second = self.students
+        checkout(self.staff, first, self.isbn(0), TODAY, DUE)
+
+        for student in (first, second):
+            with self.assertRaisesMessage(CirculationError, 'Book is not available'):
+                checkout(self.staff, student, self.isbn(0), TODAY, DUE)
+
+        self.assertEqual(Borrow.objects.filter(book_id=self.isbn(0)).count(), 1)
+        self.assertBookStatus(0, 'borrowed')
+        self.assertStats(first, 1, 1)
+        self.assertStats(second, 0, 0)
+
+    def test_quota(self):
+        student = self.students[0]
+        for i in range(MAX_ACTIVE_BORROWS):
+            checkout(self.staff, student, self.isbn(i), TODAY, DUE)
+
+        with self.assertRaises(CirculationError):
+            checkout(self.staff, student, self.isbn(MAX_ACTIVE_BORROWS), TODAY, DUE)
+
+        # The refused book was claimed first; the claim is rolled back
+        self.assertBookStatus(MAX_ACTIVE_BORROWS, 'available')
+        self.assertEqual(Borrow.objects.filter(student=student).count(), MAX_ACTIVE_BORROWS)
+        self.assertStats(student, MAX_ACTIVE_BORROWS, MAX_ACTIVE_BORROWS)
+
+    def test_open_borrow_constraint_rolls_back(self):
+        first, second = self.students
+        checkout(self.staff, first, self.isbn(0), TODAY, DUE)
+        # A book wrongly marked available while its borrow is still open
+        Book.objects.filter(ISBN=self.isbn(0)).update(status='available')
+
+        with self.assertRaisesMessage(CirculationError, 'Book is not available'):
+            checkout(self.staff, second, self.isbn(0), TODAY, DUE)
+
+        self.assertEqual(Borrow.objects.filter(book_id=self.isbn(0)).count(), 1)
+        self.assertBookStatus(0, 'available')
+        self.assertStats(second, 0, 0)
+
+    def test_missing_book(self):
+        with self.assertRaisesMessage(CirculationError, 'Book not found'):
+            checkout(self.staff, self.students[0], '9789999999999', TODAY, DUE)
+        self.assertFalse(Borrow.objects.exists())
+
+
+class CheckinTests(CirculationTestCase):
+
+    def test_twice(self):
+        student = self.students[0]
+        borrow = checkout(self.staff, student, self.isbn(0), TODAY, DUE)
+        returned = DUE + timedelta(days=3)
+
+        fine = checkin(self.staff, borrow.pk, returned)
+        with self.assertRaisesMessage(CirculationError, 'Book already returned'):
+            checkin(self.staff, borrow.pk, returned)
+
+        self.assertEqual(Borrow.objects.get(pk=borrow.pk).status, 'returned')
+        self.assertBookStatus(0, 'available')
+        self.assertEqual(list(Fine.objects.values_list('Borrow_ID', 'Amount')), [(borrow.pk, fine.Amount)])
+        self.assertGreater(fine.Amount, 0)
+        self.assertStats(student, 0, 1, fine.Amount)
+
+    def test_on_time(self):
+        student = self.students[0]
+        borrow = checkout(self.staff, student, self.isbn(0), TODAY, DUE)
+
+        self.assertIsNone(checkin(self.staff, borrow.pk, DUE))
+        self.assertFalse(Fine.objects.exists())
+        self.assertStats(student, 0, 1)
+
+    def test_missing_borrow(self):
+        with self.assertRaisesMessage(CirculationError, 'Borrow record not found'):
+            checkin(self.staff, 12345, TODAY)
+
+
+class BulkTests(CirculationTestCase):
+
+    def test_checkout_stack(self):
+        student = self.students[0]
+        checkout(self.staff, self.students[1], self.isbn(0), TODAY, DUE)
+        isbns = [self.isbn(0), self.isbn(1), self.isbn(1), '9789999999999'] + [
+            self.isbn(i) for i in range(2, MAX_ACTIVE_BORROWS + 2)
+        ]
+
+        results = bulk_checkout(self.staff, student, isbns, TODAY, DUE)
+
+        self.assertEqual(
+            [result.get('error') for result in results[:4]],
+            ['Book is not available', None, 'Book is not available', 'Book not found']
+        )
+        # Five taken, the last one over the quota
+        self.assertEqual(sum(result['success'] for result in results), MAX_ACTIVE_BORROWS)
+        self.assertFalse(results[-1]['success'])
+        self.assertBookStatus(MAX_ACTIVE_BORROWS + 1, 'available')
+        self.assertEqual(Borrow.objects.filter(student=student, status='active').count(), MAX_ACTIVE_BORROWS)
+        self.assertStats(student, MAX_ACTIVE_BORROWS, MAX_ACTIVE_BORROWS)
+
+        # Again: nothing left to take
+        results = bulk_checkout(self.staff, student, [self.isbn(1)], TODAY, DUE)
+        self.assertFalse(results[0]['success'])
+        self.assertStats(student, MAX_ACTIVE_BORROWS, MAX_ACTIVE_BORROWS)
+
+    def test_checkin_stack(self):
+        first, second = self.students
+        late = checkout(self.staff, first, self.isbn(0), TODAY, DUE)
+        on_time = checkout(self.staff, second, self.isbn(1), TODAY, DUE + timedelta(days=5))
+        returned = DUE + timedelta(days=2)
+        ids = [late.pk, on_time.pk, late.pk, 12345]
+
+        results = bulk_checkin(self.staff, ids, returned)
+        again = bulk_checkin(self.staff, ids, returned)
+
+        self.assertEqual(
+            [(result['success'], result.get('error')) for result in results],
+            [(True, None), (True, None), (False, 'Book already returned'), (False, 'Borrow record not found')]
+        )
+        self.assertFalse(any(result['success'] for result in again))
+        self.assertFalse(Borrow.objects.exclude(status='returned').exists())
+        self.assertBookStatus(0, 'available')
+        self.assertBookStatus(1, 'available')
+        fine = Fine.objects.get()
+        self.assertEqual((fine.Borrow_ID_id, fine.Amount), (late.pk, results[0]['fine']))
+        self.assertStats(first, 0, 1, fine.Amount)
+        self.assertStats(second, 0, 1)
+
+
+class IdempotencyTests(CirculationTestCase):
+
+    def setUp(self):
+        self.client.post(
+            '/api/auth/login/', json.dumps({'username': 'desk', 'password': 'secret'}),
+            content_type='application/json'
+        )
+
+    def create(self, key, isbn=None, client=None):
+        body = json.dumps({
+            'student_id': self.students[0].user_id,
+            'isbn': isbn or self.isbn(0),
+            'borrow_date': str(date.today()),
+            'due_date': str(date.today() + timedelta(days=10)),
+        })
+        return (client or self.client).post(
+            '/api/staff/borrows/create/', body, content_type='application/json', HTTP_IDEMPOTENCY_KEY=key
+        )
+
+    def test_replay(self):
+        first = self.create('key-1')
+        second = self.create('key-1')
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(Borrow.objects.count(), 1)
+        self.assertBookStatus(0, 'borrowed')
+        self.assertStats(self.students[0], 1, 1)
+
+    def test_new_key_runs_again(self):
+        self.create('key-1')
+        response = self.create('key-2')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertNotIn('Idempotent-Replayed', response)
+        self.assertEqual(Borrow.objects.count(), 1)
+
+    def test_key_reused_for_another_request(self):
+        self.create('key-1')
+        response = self.create('key-1', isbn=self.isbn(1))
+
+        self.assertEqual(response.status_code, 422)
+        self.assertBookStatus(1, 'available')
+
+    def test_return_replay(self):
+        borrow_id = self.create('key-1').json()['borrow']['id']
+        url = f'/api/staff/borrows/return/{borrow_id}/'
+
+        first = self.client.put(url, HTTP_IDEMPOTENCY_KEY='key-2')
+        second = self.client.put(url, HTTP_IDEMPOTENCY_KEY='key-2')
+
+        self.assertEqual((first.status_code, second.status_code), (200, 200))
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertFalse(Fine.objects.exists())
+        self.assertStats(self.students[0], 0, 1)
+
+    def test_no_claim_without_permission(self):
+        response = self.create('key-1', client=self.client_class())
+
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(IdempotencyRecord.objects.exists())
+        self.assertFalse(Borrow.objects.exists())
+
+
+class OverdueSweepTests(CirculationTestCase):
+
+    def overdue_borrow(self, i, days_late):
+        today = date.today()
+        Book.objects.filter(ISBN=self.isbn(i)).update(status='borrowed')
+        return Borrow.objects.create(
+            staff=self.staff, student=self.students[0], book_id=self.isbn(i), status='active',
+            date=today - timedelta(days=days_late + 10), last_date=today - timedelta(days=days_late)
+        )
+
+    def test_lease_refuses_second_worker(self):
+        self.assertTrue(acquire_sweep_lock('worker-1', 600))
+        self.overdue_borrow(0, 3)
+
+        self.assertIsNone(run_sweep(owner='worker-2'))
+        self.assertEqual(Borrow.objects.get().status, 'active')
+        self.assertFalse(Fine.objects.exists())
+        self.assertIsNone(OverdueSweep.objects.get(name=SWEEP_NAME).watermark)
+
+        # The holder may sweep, and releases the lease when done
+        self.assertIsNotNone(run_sweep(owner='worker-1'))
+        self.assertTrue(acquire_sweep_lock('worker-2', 600))
+
+    def test_watermark(self):
+        borrow = self.overdue_borrow(0, 3)
+
+        first = run_sweep(owner='worker-1')
+        second = run_sweep(owner='worker-1')
+
+        self.assertEqual((first['mode'], first['borrows_marked_late'], first['fines_created']), ('full', 1, 1))
+        self.assertEqual(Borrow.objects.get(pk=borrow.pk).status, 'late')
+        self.assertBookStatus(0, 'late')
+        self.assertEqual(OverdueSweep.objects.get(name=SWEEP_NAME).watermark, date.today())
+        # Incremental from today's watermark: nothing left to do
+        self.assertEqual(second['mode'], 'incremental')
+        self.assertEqual((second['fines_updated'], second['fines_created']), (0, 0))
+        self.assertEqual(Fine.objects.get().Amount, 3 * FINE_PER_DAY)
+        self.assertStats(self.students[0], 1, 1, 3 * FINE_PER_DAY)
+
+    def test_incremental_from_older_watermark(self):
+        self.overdue_borrow(0, 3)
+        run_sweep(owner='worker-1')
+        # As if the last sweep ran two days ago
+        since = date.today() - timedelta(days=2)
+        OverdueSweep.objects.filter(name=SWEEP_NAME).update(watermark=since)
+        Fine.objects.update(Date=since, Amount=F('Amount') - 2 * FINE_PER_DAY)
+        reconcile()
+        self.overdue_borrow(1, 1)
+
+        report = run_sweep(owner='worker-1')
+
+        self.assertEqual(report['mode'], 'incremental')
+        self.assertEqual((report['fines_updated'], report['fines_created']), (1, 1))
+        self.assertEqual(
+            sorted(Fine.objects.values_list('Amount', flat=True)),
+            [1 * FINE_PER_DAY, 3 * FINE_PER_DAY]
+        )
+        self.assertStats(self.students[0], 2, 2, 4 * FINE_PER_DAY)
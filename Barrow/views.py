@@ -1,70 +1,74 @@
 from django.shortcuts import render
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
-from django.db.models import Sum
+from django.db.models import Q
 from .models import Borrow
-from Books.models import Book
+from .circulation import CirculationError, bulk_checkin, bulk_checkout, checkin, checkout
+from .idempotency import idempotent
 from user.models import Student, Staff, User
-from fine.models import Fine
+from library_management.fields import FieldsError, lookups_for, requested_fields, serialize_row
+from library_management.querybudget import query_budget
+from library_management.tracing import span
+from library_management.listing import (
+    filter_date_range, ordered, paginate_rows, parse_limit, parse_sort, stream_rows, wants_stream
+)
 from datetime import date, datetime, timedelta
 import json
 
 # Create your views here.
 
-def update_late_borrows():
-    """Check and update overdue borrows to late status and create/update fines."""
-    today = date.today()
+# fields= keys of borrow list results -> the lookup each one is read from
+BORROW_FIELDS = {
+    'borrow_id': 'Borrow_ID',
+    'student_id': 'student__user__User_ID',
+    'student_name': 'student__user__Name',
+    'staff_name': 'staff__user__Name',
+    'book_isbn': 'book_id',
+    'book_name': 'book__name',
+    'borrow_date': 'date',
+    'due_date': 'last_date',
+    'status': 'status',
+}
+# sort= options of the borrow list -> the column ordered on ("-" prefix
+# for descending); Borrow_ID breaks ties
+BORROW_SORTS = {
+    'borrow_id': 'Borrow_ID',
+    'borrow_date': 'date',
+    'due_date': 'last_date',
+}
+DEFAULT_BORROW_SORT = '-borrow_id'
+# Items per bulk checkout or return request (a desk's stack)
+BULK_CIRCULATION_MAX = 100
+# Most overdue first
+DEFAULT_LATE_SORT = 'due_date'
+
+
+def filter_borrows(borrows, request, date_lookup):
+    """
+    ``borrows`` narrowed by the student_id, staff_id and isbn parameters and
+    the from=/to= range on ``date_lookup``. Raises ValueError for a bad value.
+    """
+    # Student and staff primary keys are their User_IDs, so no join is needed
+    student_id = request.GET.get('student_id')
+    if student_id:
+        borrows = borrows.filter(student_id=student_id)
     
-    # Get ALL overdue borrows (both active and already late status)
-    late_borrows = Borrow.objects.filter(
-        status__in=['active', 'late'],
-        last_date__lt=today
-    ).select_related('book', 'student')
-    
-    for borrow in late_borrows:
-        # Update status to late if it's still active
-        if borrow.status == 'active':
-            borrow.status = 'late'
-            borrow.save()
-        
-        # Update book status to late if not already
-        if borrow.book.status != 'late':
-            borrow.book.status = 'late'
-            borrow.book.save()
-        
-        # Calculate current fine amount
-        days_late = (today - borrow.last_date).days
-        fine_amount = days_late * 5.0  # 5 TL per day
-        
-        # Find existing unpaid fine for this borrow
-        existing_fine = Fine.objects.filter(Borrow_ID=borrow, Status='unpaid').first()
-        
-        if existing_fine:
-            # Update existing fine amount and date
-            existing_fine.Amount = fine_amount
-            existing_fine.Date = today
-            existing_fine.save()
-        else:
-            # Create new fine if it doesn't exist
-            try:
-                staff = Staff.objects.first()
-                if staff and borrow.student:
-                    Fine.objects.create(
-                        Staff_ID=staff,
-                        Student_ID=borrow.student,
-                        Borrow_ID=borrow,
-                        Date=today,
-                        Status='unpaid',
-                        Amount=fine_amount
-                    )
-            except Exception:
-                pass  # If no staff exists, skip fine creation
+    staff_id = request.GET.get('staff_id')
+    if staff_id:
+        borrows = borrows.filter(staff_id=staff_id)
+    
+    isbn = request.GET.get('isbn', '').strip()
+    if isbn:
+        borrows = borrows.filter(book_id=isbn)
+    
+    return filter_date_range(borrows, request, date_lookup)
+
 
 def add_cors_headers(response):
     """Add CORS headers to response"""
     response['Access-Control-Allow-Origin'] = 'http://localhost:8080'
     response['Access-Control-Allow-Methods'] = 'GET, POST, PUT, PATCH, DELETE, OPTIONS'
-    response['Access-Control-Allow-Headers'] = 'Content-Type, Authorization'
+    response['Access-Control-Allow-Headers'] = 'Content-Type, Authorization, Idempotency-Key'
     response['Access-Control-Allow-Credentials'] = 'true'
     return response
 
@@ -77,7 +81,30 @@ def check_staff_permission(request):
     return user_type == 'staff'
 
 
+def loan_dates(data):
+    """
+    (borrow_date, due_date) of a checkout request. Raises ValueError for
+    bad dates or a loan longer than 15 days.
+    """
+    try:
+        borrow_date = datetime.strptime(data.get('borrow_date'), '%Y-%m-%d').date()
+        due_date = datetime.strptime(data.get('due_date'), '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        raise ValueError('Invalid date format. Use YYYY-MM-DD.')
+    
+    # Validate dates
+    if due_date <= borrow_date:
+        raise ValueError('Due date must be after borrow date')
+    
+    # Check maximum borrow duration (15 days)
+    if (due_date - borrow_date).days > 15:
+        raise ValueError('Maksimum ödünç süresi 15 gündür. Lütfen daha kısa bir süre giriniz.')
+    return borrow_date, due_date
+
+
+@query_budget(27)
 @csrf_exempt
+@idempotent(add_cors_headers, check_staff_permission)
 def create_borrow(request):
     """
     Create a new borrow record. Staff only.
@@ -92,9 +119,6 @@ def create_borrow(request):
     
     if request.method == 'POST':
         try:
-            # Update late borrows before creating new borrow
-            update_late_borrows()
-            
             data = json.loads(request.body)
             
             # Validate required fields
@@ -119,84 +143,26 @@ def create_borrow(request):
                 response = JsonResponse({'error': 'Student not found'}, status=404)
                 return add_cors_headers(response)
             
-            # Get book
             try:
-                book = Book.objects.get(ISBN=data['isbn'])
-            except Book.DoesNotExist:
-                response = JsonResponse({'error': 'Book not found'}, status=404)
-                return add_cors_headers(response)
-            
-            # Check if book is available
-            if book.status != 'available':
-                response = JsonResponse({'error': 'Book is not available'}, status=400)
-                return add_cors_headers(response)
-            
-            # Check maximum book limit (5 books per student)
-            active_borrows_count = Borrow.objects.filter(
-                student=student,
-                status__in=['active', 'late']
-            ).count()
-            
-            if active_borrows_count >= 5:
-                response = JsonResponse({
-                    'error': 'Bu üye zaten 5 kitap ödünç almış. Maksimum kitap limitine ulaşıldı.'
-                }, status=400)
-                return add_cors_headers(response)
-            
-            # Check unpaid fines limit (100 TL maximum)
-            unpaid_fines_total = Fine.objects.filter(
-                Student_ID=student,
-                Status='unpaid'
-            ).aggregate(total=Sum('Amount'))['total'] or 0
-            
-            if unpaid_fines_total >= 100:
-                response = JsonResponse({
-                    'error': f'Bu üyenin ödenmemiş cezası {unpaid_fines_total} TL. Limit 100 TL. Önce cezalarını ödemesi gerekiyor.'
-                }, status=400)
+                borrow_date, due_date = loan_dates(data)
+            except ValueError as e:
+                response = JsonResponse({'error': str(e)}, status=400)
                 return add_cors_headers(response)
             
-            # Parse dates
+            # Claims the book and the quota atomically
             try:
-                borrow_date = datetime.strptime(data['borrow_date'], '%Y-%m-%d').date()
-                due_date = datetime.strptime(data['due_date'], '%Y-%m-%d').date()
-            except ValueError:
-                response = JsonResponse({'error': 'Invalid date format. Use YYYY-MM-DD.'}, status=400)
-                return add_cors_headers(response)
-            
-            # Validate dates
-            if due_date <= borrow_date:
-                response = JsonResponse({'error': 'Due date must be after borrow date'}, status=400)
+                borrow = checkout(staff, student, data['isbn'], borrow_date, due_date)
+            except CirculationError as e:
+                response = JsonResponse({'error': str(e)}, status=e.status)
                 return add_cors_headers(response)
             
-            # Check maximum borrow duration (15 days)
-            borrow_duration = (due_date - borrow_date).days
-            if borrow_duration > 15:
-                response = JsonResponse({
-                    'error': 'Maksimum ödünç süresi 15 gündür. Lütfen daha kısa bir süre giriniz.'
-                }, status=400)
-                return add_cors_headers(response)
-            
-            # Create borrow record
-            borrow = Borrow.objects.create(
-                staff=staff,
-                student=student,
-                book=book,
-                date=borrow_date,
-                last_date=due_date,
-                status='active'
-            )
-            
-            # Update book status
-            book.status = 'borrowed'
-            book.save()
-            
             response = JsonResponse({
                 'success': True,
                 'message': 'Borrow record created successfully',
                 'borrow': {
                     'id': borrow.Borrow_ID,
                     'student_name': student.user.Name,
-                    'book_name': book.name,
+                    'book_name': borrow.book.name,
                     'borrow_date': borrow.date.strftime('%Y-%m-%d'),
                     'due_date': borrow.last_date.strftime('%Y-%m-%d'),
                     'status': borrow.status
@@ -215,7 +181,9 @@ def create_borrow(request):
     return add_cors_headers(response)
 
 
+@query_budget(20)
 @csrf_exempt
+@idempotent(add_cors_headers, check_staff_permission)
 def return_book(request, borrow_id):
     """
     Mark a book as returned. Staff only.
@@ -230,40 +198,14 @@ def return_book(request, borrow_id):
     
     if request.method == 'PUT':
         try:
-            borrow = Borrow.objects.get(Borrow_ID=borrow_id)
-            
-            if borrow.status == 'returned':
-                response = JsonResponse({'error': 'Book already returned'}, status=400)
+            staff_user_id = request.session.get('user_id')
+            staff = Staff.objects.filter(user__User_ID=staff_user_id).first()
+            if staff is None:
+                response = JsonResponse({'error': 'Staff not found'}, status=404)
                 return add_cors_headers(response)
             
-            # Check if book is late and create fine if necessary
-            today = date.today()
-            if today > borrow.last_date and borrow.status != 'returned':
-                days_late = (today - borrow.last_date).days
-                fine_amount = days_late * 5.0  # 5 TL per day
-                
-                staff_user_id = request.session.get('user_id')
-                staff = Staff.objects.get(user__User_ID=staff_user_id)
-                
-                # Create fine if it doesn't exist
-                if not Fine.objects.filter(Borrow_ID=borrow, Status='unpaid').exists():
-                    Fine.objects.create(
-                        Staff_ID=staff,
-                        Student_ID=borrow.student,
-                        Borrow_ID=borrow,
-                        Date=today,
-                        Status='unpaid',
-                        Amount=fine_amount
-                    )
-            
-            # Update borrow status
-            borrow.status = 'returned'
-            borrow.save()
-            
-            # Update book status
-            book = borrow.book
-            book.status = 'available'
-            book.save()
+            # Closes the borrow only if it is still open
+            checkin(staff, borrow_id, date.today())
             
             response = JsonResponse({
                 'success': True,
@@ -271,8 +213,8 @@ def return_book(request, borrow_id):
             })
             return add_cors_headers(response)
             
-        except Borrow.DoesNotExist:
-            response = JsonResponse({'error': 'Borrow record not found'}, status=404)
+        except CirculationError as e:
+            response = JsonResponse({'error': str(e)}, status=e.status)
             return add_cors_headers(response)
         except Exception as e:
             response = JsonResponse({'error': str(e)}, status=500)
@@ -282,87 +224,253 @@ def return_book(request, borrow_id):
     return add_cors_headers(response)
 
 
+@query_budget(22)
+@csrf_exempt
+@idempotent(add_cors_headers, check_staff_permission)
+def bulk_create_borrows(request):
+    """
+    Lend a stack of books to one student. Staff only.
+    Body: student_id, isbns (list), borrow_date, due_date. The quota and
+    fine limit are checked once for the stack and every borrow is written
+    in one transaction; the response has one result per ISBN.
+    """
+    if request.method == 'OPTIONS':
+        response = JsonResponse({})
+        return add_cors_headers(response)
+    
+    if not check_staff_permission(request):
+        response = JsonResponse({'error': 'Permission denied. Staff only.'}, status=403)
+        return add_cors_headers(response)
+    
+    if request.method != 'POST':
+        response = JsonResponse({'error': 'POST method required'}, status=405)
+        return add_cors_headers(response)
+    
+    try:
+        data = json.loads(request.body)
+        
+        isbns = data.get('isbns')
+        if not isinstance(isbns, list) or not isbns:
+            response = JsonResponse({'error': 'isbns must be a non-empty list'}, status=400)
+            return add_cors_headers(response)
+        if len(isbns) > BULK_CIRCULATION_MAX:
+            response = JsonResponse({'error': f'At most {BULK_CIRCULATION_MAX} items per request'}, status=400)
+            return add_cors_headers(response)
+        isbns = [str(isbn).strip() for isbn in isbns]
+        
+        if not data.get('student_id'):
+            response = JsonResponse({'error': 'student_id is required'}, status=400)
+            return add_cors_headers(response)
+        
+        try:
+            borrow_date, due_date = loan_dates(data)
+        except ValueError as e:
+            response = JsonResponse({'error': str(e)}, status=400)
+            return add_cors_headers(response)
+        
+        staff = Staff.objects.filter(user__User_ID=request.session.get('user_id')).first()
+        if staff is None:
+            response = JsonResponse({'error': 'Staff not found'}, status=404)
+            return add_cors_headers(response)
+        
+        student = Student.objects.filter(user__User_ID=data['student_id']).select_related('user').first()
+        if student is None:
+            response = JsonResponse({'error': 'Student not found'}, status=404)
+            return add_cors_headers(response)
+        
+        results = bulk_checkout(staff, student, isbns, borrow_date, due_date)
+        
+    except json.JSONDecodeError:
+        response = JsonResponse({'error': 'Invalid JSON'}, status=400)
+        return add_cors_headers(response)
+    except Exception as e:
+        response = JsonResponse({'error': str(e)}, status=500)
+        return add_cors_headers(response)
+    
+    created = sum(1 for result in results if result['success'])
+    response = JsonResponse({
+        'success': created == len(results),
+        'student_name': student.user.Name,
+        'borrow_date': borrow_date.strftime('%Y-%m-%d'),
+        'due_date': due_date.strftime('%Y-%m-%d'),
+        'created': created,
+        'failed': len(results) - created,
+        'results': results
+    })
+    return add_cors_headers(response)
+
+
+@query_budget(22)
+@csrf_exempt
+@idempotent(add_cors_headers, check_staff_permission)
+def bulk_return_books(request):
+    """
+    Return a stack of borrows. Staff only.
+    Body: borrow_ids (list). Every return, and the fine of a late one, is
+    written in one transaction; the response has one result per borrow.
+    """
+    if request.method == 'OPTIONS':
+        response = JsonResponse({})
+        return add_cors_headers(response)
+    
+    if not check_staff_permission(request):
+        response = JsonResponse({'error': 'Permission denied. Staff only.'}, status=403)
+        return add_cors_headers(response)
+    
+    if request.method != 'POST':
+        response = JsonResponse({'error': 'POST method required'}, status=405)
+        return add_cors_headers(response)
+    
+    try:
+        data = json.loads(request.body)
+        
+        borrow_ids = data.get('borrow_ids')
+        if not isinstance(borrow_ids, list) or not borrow_ids:
+            response = JsonResponse({'error': 'borrow_ids must be a non-empty list'}, status=400)
+            return add_cors_headers(response)
+        if len(borrow_ids) > BULK_CIRCULATION_MAX:
+            response = JsonResponse({'error': f'At most {BULK_CIRCULATION_MAX} items per request'}, status=400)
+            return add_cors_headers(response)
+        try:
+            borrow_ids = [int(borrow_id) for borrow_id in borrow_ids]
+        except (TypeError, ValueError):
+            response = JsonResponse({'error': 'borrow_ids must be integers'}, status=400)
+            return add_cors_headers(response)
+        
+        staff = Staff.objects.filter(user__User_ID=request.session.get('user_id')).first()
+        if staff is None:
+            response = JsonResponse({'error': 'Staff not found'}, status=404)
+            return add_cors_headers(response)
+        
+        results = bulk_checkin(staff, borrow_ids, date.today())
+        
+    except json.JSONDecodeError:
+        response = JsonResponse({'error': 'Invalid JSON'}, status=400)
+        return add_cors_headers(response)
+    except Exception as e:
+        response = JsonResponse({'error': str(e)}, status=500)
+        return add_cors_headers(response)
+    
+    returned = sum(1 for result in results if result['success'])
+    response = JsonResponse({
+        'success': returned == len(results),
+        'returned': returned,
+        'failed': len(results) - returned,
+        'results': results
+    })
+    return add_cors_headers(response)
+
+
+@query_budget(4)
 def get_late_borrows(request):
     """
     Get all late borrows. Staff only.
+    Filters: student_id, staff_id, isbn and from/to on the due date;
+    most overdue first by default, see sort=.
     """
     if not check_staff_permission(request):
         response = JsonResponse({'error': 'Permission denied. Staff only.'}, status=403)
         return add_cors_headers(response)
     
-    # Update late borrows first
-    update_late_borrows()
-    
     today = date.today()
     
-    # Get all late borrows
+    # Get all late borrows, including overdue ones the sweeper has not
+    # moved to late yet
     late_borrows = Borrow.objects.filter(
-        status='late'
+        Q(status='late') | Q(status='active', last_date__lt=today)
     ).select_related('student__user', 'book', 'staff__user')
     
+    try:
+        late_borrows = filter_borrows(late_borrows, request, 'last_date')
+        lookup, descending = parse_sort(request, BORROW_SORTS, DEFAULT_LATE_SORT)
+        late_borrows = ordered(late_borrows, lookup, descending)
+    except ValueError as e:
+        response = JsonResponse({'error': str(e)}, status=400)
+        return add_cors_headers(response)
+    
+    late_borrows = list(late_borrows)
+    
     results = []
-    for borrow in late_borrows:
-        days_late = (today - borrow.last_date).days
-        
-        results.append({
-            'borrow_id': borrow.Borrow_ID,
-            'student_id': borrow.student.user.User_ID,
-            'student_name': borrow.student.user.Name,
-            'student_email': borrow.student.user.Email,
-            'student_phone': borrow.student.user.Phone,
-            'book_isbn': borrow.book.ISBN,
-            'book_name': borrow.book.name,
-            'book_author': borrow.book.author,
-            'borrow_date': borrow.date.strftime('%Y-%m-%d'),
-            'due_date': borrow.last_date.strftime('%Y-%m-%d'),
-            'days_late': days_late,
-            'status': borrow.status
-        })
+    with span('serialize', borrows=len(late_borrows)):
+        for borrow in late_borrows:
+            days_late = (today - borrow.last_date).days
+            
+            results.append({
+                'borrow_id': borrow.Borrow_ID,
+                'student_id': borrow.student.user.User_ID,
+                'student_name': borrow.student.user.Name,
+                'student_email': borrow.student.user.Email,
+                'student_phone': borrow.student.user.Phone,
+                'book_isbn': borrow.book.ISBN,
+                'book_name': borrow.book.name,
+                'book_author': borrow.book.author,
+                'borrow_date': borrow.date.strftime('%Y-%m-%d'),
+                'due_date': borrow.last_date.strftime('%Y-%m-%d'),
+                'days_late': days_late,
+                'status': 'late'
+            })
     
-    response = JsonResponse({
-        'results': results,
-        'count': len(results)
-    })
+    with span('json'):
+        response = JsonResponse({
+            'results': results,
+            'count': len(results)
+        })
     return add_cors_headers(response)
 
 
+@query_budget(4)
 def get_all_borrows(request):
     """
     Get all borrow records with filtering options. Staff only.
+    Filters: status, student_id, staff_id, isbn and from/to on the borrow date.
+    fields= picks the result keys; only their columns are read.
+    Paginated with limit and cursor (newest first by default, see sort=);
+    stream=1 returns every matching record in one streamed response.
     """
     if not check_staff_permission(request):
         response = JsonResponse({'error': 'Permission denied. Staff only.'}, status=403)
         return add_cors_headers(response)
     
+    try:
+        fields = requested_fields(request, BORROW_FIELDS, BORROW_FIELDS)
+    except FieldsError as e:
+        response = JsonResponse({'error': str(e)}, status=400)
+        return add_cors_headers(response)
+    
     # Get filter parameters
     status_filter = request.GET.get('status', None)
-    student_id = request.GET.get('student_id', None)
     
-    borrows = Borrow.objects.all().select_related('student__user', 'book', 'staff__user')
+    borrows = Borrow.objects.all()
     
     if status_filter:
         borrows = borrows.filter(status=status_filter)
     
-    if student_id:
-        borrows = borrows.filter(student__user__User_ID=student_id)
+    try:
+        borrows = filter_borrows(borrows, request, 'date')
+        lookup, descending = parse_sort(request, BORROW_SORTS, DEFAULT_BORROW_SORT)
+        borrows = ordered(borrows, lookup, descending, cursor=request.GET.get('cursor'))
+    except ValueError as e:
+        response = JsonResponse({'error': str(e)}, status=400)
+        return add_cors_headers(response)
     
-    results = []
-    for borrow in borrows:
-        results.append({
-            'borrow_id': borrow.Borrow_ID,
-            'student_id': borrow.student.user.User_ID,
-            'student_name': borrow.student.user.Name,
-            'staff_name': borrow.staff.user.Name,
-            'book_isbn': borrow.book.ISBN,
-            'book_name': borrow.book.name,
-            'borrow_date': borrow.date.strftime('%Y-%m-%d'),
-            'due_date': borrow.last_date.strftime('%Y-%m-%d'),
-            'status': borrow.status
-        })
+    # Joined columns come from the same query, without loading whole rows
+    columns = dict.fromkeys([*lookups_for(fields, BORROW_FIELDS), 'Borrow_ID', lookup])
+    rows = borrows.values(*columns)
     
-    response = JsonResponse({
-        'results': results,
-        'count': len(results)
-    })
+    if wants_stream(request):
+        response = stream_rows(rows, lambda row: serialize_row(row, fields, BORROW_FIELDS))
+        return add_cors_headers(response)
+    
+    rows, next_cursor = paginate_rows(rows, lookup, parse_limit(request))
+    with span('serialize', borrows=len(rows)):
+        results = [serialize_row(row, fields, BORROW_FIELDS) for row in rows]
+    
+    with span('json'):
+        response = JsonResponse({
+            'results': results,
+            'count': len(results),
+            'has_more': next_cursor is not None,
+            'next_cursor': next_cursor
+        })
     return add_cors_headers(response)
 
@@ -0,0 +1,109 @@
+"""
+Versioned response cache for the catalog endpoints.
+
+book_list and get_book_detail responses are stored in the "catalog" cache
+(see CACHES in settings) under a key made of the catalog version and the
+normalized request. Anything that changes what those endpoints return
+(adding or deleting a book, lending or returning one, the overdue sweep)
+bumps the version once its transaction commits, so later requests miss and
+rebuild; stale entries are never read again and age out of the cache.
+"""
+import hashlib
+import threading
+from functools import wraps
+from urllib.parse import urlencode
+
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import F
+from django.http import HttpResponse
+
+from .models import CatalogVersion
+
+CACHE_ALIAS = 'catalog'
+CATALOG = 'catalog'
+
+# Hit/miss counters of this process
+_stats = {'hits': 0, 'misses': 0}
+_stats_lock = threading.Lock()
+
+
+def catalog_version():
+    """Current catalog version, 0 before the first change."""
+    version = CatalogVersion.objects.filter(name=CATALOG).values_list('version', flat=True).first()
+    return version or 0
+
+
+def _bump():
+    if CatalogVersion.objects.filter(name=CATALOG).update(version=F('version') + 1):
+        return
+    _, created = CatalogVersion.objects.get_or_create(name=CATALOG, defaults={'version': 1})
+    if not created:
+        CatalogVersion.objects.filter(name=CATALOG).update(version=F('version') + 1)
+
+
+def bump_catalog_version():
+    """
+    Invalidate every cached catalog response once the current transaction
+    commits, so no request can cache data older than the new version.
+    """
+    transaction.on_commit(_bump)
+
+
+def cache_key(request, version):
+    """Key for ``request``: path plus query parameters, sorted, empty ones dropped."""
+    params = sorted(
+        (name, value)
+        for name, values in request.GET.lists()
+        for value in values
+        if value != ''
+    )
+    normalized = f'{request.path}?{urlencode(params)}'
+    digest = hashlib.sha1(normalized.encode()).hexdigest()
+    return f'catalog:{version}:{digest}'
+
+
+def _count(stat):
+    with _stats_lock:
+        _stats[stat] += 1
+
+
+def cache_stats():
+    """Hit/miss counters of this process and the current catalog version."""
+    with _stats_lock:
+        hits, misses = _stats['hits'], _stats['misses']
+    lookups = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': round(hits / lookups, 3) if lookups else None,
+        'version': catalog_version(),
+        'backend': caches[CACHE_ALIAS].__class__.__name__,
+    }
+
+
+def cache_catalog_response(view):
+    """Serve successful GET responses of ``view`` from the catalog cache."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method != 'GET':
+            return view(request, *args, **kwargs)
+
+        cache = caches[CACHE_ALIAS]
+        key = cache_key(request, catalog_version())
+        cached = cache.get(key)
+        if cached is not None:
+            _count('hits')
+            content, headers = cached
+            response = HttpResponse(content, headers=headers)
+            response['X-Cache'] = 'HIT'
+            return response
+
+        _count('misses')
+        response = view(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, (response.content, dict(response.items())))
+        response['X-Cache'] = 'MISS'
+        return response
+
+    return wrapper
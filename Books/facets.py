@@ -0,0 +1,105 @@
+"""
+Catalog filters and facet counts.
+
+Results can be narrowed with type=, publisher=, author= (exact values, as
+returned in the facets) and year_from=/year_to= (inclusive years). Each
+filter is an equality or range condition on an indexed column.
+
+With facets=1 the endpoints also return, for the current result set, how
+many books carry each type, publisher, author and publication decade:
+one grouped query per facet rather than a COUNT per facet value.
+"""
+from datetime import date
+
+from django.db.models import Count
+from django.db.models.functions import ExtractYear
+
+# Exact-match filter parameter -> Book field, also the grouped facets
+FILTER_FIELDS = {
+    'type': 'type',
+    'publisher': 'publisher',
+    'author': 'author',
+}
+FACETS = ['type', 'publisher', 'author', 'decade']
+# Values returned per facet, most frequent first
+FACET_LIMIT = 20
+
+
+class FilterError(ValueError):
+    """Raised for a filter parameter that cannot be used."""
+
+
+def _year(request, param):
+    value = request.GET.get(param)
+    if not value:
+        return None
+    try:
+        year = int(value)
+    except ValueError:
+        raise FilterError(f'Invalid {param}. Use YYYY.')
+    if not 1 <= year <= 9999:
+        raise FilterError(f'Invalid {param}. Use YYYY.')
+    return year
+
+
+def apply_filters(queryset, request):
+    """Narrow ``queryset`` by the filter parameters of ``request``."""
+    for param, field in FILTER_FIELDS.items():
+        value = request.GET.get(param)
+        if value:
+            queryset = queryset.filter(**{field: value})
+
+    # Years are stored as dates; compare against whole-year bounds so the
+    # year index is used
+    year_from = _year(request, 'year_from')
+    year_to = _year(request, 'year_to')
+    if year_from is not None:
+        queryset = queryset.filter(year__gte=date(year_from, 1, 1))
+    if year_to is not None:
+        queryset = queryset.filter(year__lte=date(year_to, 12, 31))
+    return queryset
+
+
+def has_filters(request):
+    """True if any filter parameter is set."""
+    return any(request.GET.get(param) for param in list(FILTER_FIELDS) + ['year_from', 'year_to'])
+
+
+def wants_facets(request):
+    """Facet counts cost one grouped query per facet; only compute them when asked."""
+    return request.GET.get('facets', '').lower() in ('1', 'true', 'yes')
+
+
+def facet_counts(queryset):
+    """
+    Facet counts for the books in ``queryset``.
+    Returns {facet: [{'value': ..., 'count': n}, ...]} for FACETS.
+    """
+    queryset = queryset.order_by()
+    facets = {}
+
+    for facet, field in FILTER_FIELDS.items():
+        rows = (
+            queryset.exclude(**{field: ''})
+            .values(field)
+            .annotate(count=Count('ISBN'))
+            .order_by('-count', field)[:FACET_LIMIT]
+        )
+        facets[facet] = [{'value': row[field], 'count': row['count']} for row in rows]
+
+    # Decades: group by year in SQL (a few hundred rows at most), bucket here
+    decades = {}
+    rows = (
+        queryset.filter(year__isnull=False)
+        .annotate(year_number=ExtractYear('year'))
+        .values('year_number')
+        .annotate(count=Count('ISBN'))
+    )
+    for row in rows:
+        decade = row['year_number'] // 10 * 10
+        decades[decade] = decades.get(decade, 0) + row['count']
+    facets['decade'] = [
+        {'value': decade, 'count': count}
+        for decade, count in sorted(decades.items())
+    ]
+    return facets
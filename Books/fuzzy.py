@@ -0,0 +1,198 @@
+"""
+Typo-tolerant catalog search over a trigram index of book names and authors.
+
+Every book's name and author are Turkish-folded and split into padded word
+trigrams ("pamuk" -> "  p", " pa", "pam", "amu", "muk", "uk "), stored in
+BookTrigram. A query is split the same way; one grouped query over the
+trigram index finds the books sharing the most trigrams, which are then
+scored by trigram similarity, so "Orhan Pamk" still finds Orhan Pamuk.
+
+The candidate query only looks up selective grams. The "  p" grams (one
+per first letter) are always skipped, and so are grams found in more than
+STOP_GRAM_SHARE of the catalog, as long as MIN_LOOKUP_GRAMS of the rarest
+remain; grouping the index rows of such common grams would otherwise
+dominate the query. Gram frequencies are counted once and cached per
+process. Books must also share enough of the looked-up grams to possibly
+reach SIMILARITY_THRESHOLD, so weak candidates are dropped in the database.
+"""
+import math
+import re
+import time
+
+from django.db import connection
+from django.db.models import Count
+
+from .models import Book, BookTrigram
+from .search import fold_turkish
+
+# Books fetched from the index before exact scoring
+CANDIDATE_LIMIT = 200
+# Minimum similarity for a book to be returned
+SIMILARITY_THRESHOLD = 0.3
+INSERT_BATCH_SIZE = 1000
+# Grams in more than this share of the books are not looked up...
+STOP_GRAM_SHARE = 0.02
+# ...unless fewer than this many grams would be left
+MIN_LOOKUP_GRAMS = 3
+# Seconds the cached gram frequencies are trusted
+FREQUENCY_TTL = 3600
+
+# gram -> number of books, and the catalog size, counted at _counted_at
+_frequencies = {}
+_catalog_size = None
+_counted_at = 0.0
+
+
+def trigrams(text):
+    """Set of padded word trigrams of the Turkish-folded ``text``."""
+    grams = set()
+    for word in re.findall(r'\w+', fold_turkish(text)):
+        padded = f'  {word} '
+        for i in range(len(padded) - 2):
+            grams.add(padded[i:i + 3])
+    return grams
+
+
+def similarity(query_grams, text):
+    """Jaccard similarity between the query trigrams and those of ``text``."""
+    grams = trigrams(text)
+    if not query_grams or not grams:
+        return 0.0
+    shared = len(query_grams & grams)
+    return shared / (len(query_grams) + len(grams) - shared)
+
+
+def book_trigrams(book):
+    """Trigrams indexed for ``book``: its name and author together."""
+    return trigrams(book.name) | trigrams(book.author)
+
+
+def index_books(books):
+    """Add ``books`` to the trigram index, replacing any previous entries."""
+    books = list(books)
+    BookTrigram.objects.filter(book_id__in=[book.ISBN for book in books]).delete()
+
+    rows = [
+        (book.ISBN, gram)
+        for book in books
+        for gram in book_trigrams(book)
+    ]
+    # Plain executemany: these rows are too many and too small to be worth
+    # building model instances for
+    table = BookTrigram._meta.db_table
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), INSERT_BATCH_SIZE):
+            cursor.executemany(
+                f"INSERT INTO {table} (book_id, trigram) VALUES (%s, %s)",
+                rows[start:start + INSERT_BATCH_SIZE]
+            )
+    return len(rows)
+
+
+def index_book(book):
+    """Add or refresh a single book in the trigram index."""
+    return index_books([book])
+
+
+def unindex_book(isbn):
+    """Remove a book from the trigram index."""
+    BookTrigram.objects.filter(book_id=isbn).delete()
+
+
+def gram_frequencies(grams):
+    """
+    (number of books having each of ``grams``, catalog size), from a
+    per-process cache refreshed every FREQUENCY_TTL seconds. Uncached grams
+    are counted with one grouped query over the trigram index.
+    """
+    global _catalog_size, _counted_at
+    if time.monotonic() - _counted_at > FREQUENCY_TTL:
+        _frequencies.clear()
+        _catalog_size = Book.objects.count()
+        _counted_at = time.monotonic()
+
+    missing = [gram for gram in grams if gram not in _frequencies]
+    if missing:
+        counts = dict(
+            BookTrigram.objects.filter(trigram__in=missing)
+            .values('trigram')
+            .annotate(books=Count('book_id'))
+            .values_list('trigram', 'books')
+        )
+        for gram in missing:
+            _frequencies[gram] = counts.get(gram, 0)
+    return {gram: _frequencies[gram] for gram in grams}, _catalog_size
+
+
+def lookup_grams(query_grams):
+    """
+    The query trigrams worth looking up in the index: the rarest ones
+    that some book has, without the "  x" word starts and the grams in
+    more than STOP_GRAM_SHARE of the books, keeping at least
+    MIN_LOOKUP_GRAMS.
+    """
+    grams = [gram for gram in query_grams if not gram.startswith('  ')] or list(query_grams)
+    frequencies, catalog_size = gram_frequencies(grams)
+    # Rarest first; grams no book has (typos, usually) cannot find anything
+    grams = sorted((gram for gram in grams if frequencies[gram]), key=lambda gram: (frequencies[gram], gram))
+    limit = STOP_GRAM_SHARE * (catalog_size or 0)
+    selective = [gram for gram in grams if frequencies[gram] <= limit]
+    return set(selective if len(selective) >= MIN_LOOKUP_GRAMS else grams[:MIN_LOOKUP_GRAMS])
+
+
+def min_shared(query_grams, grams):
+    """
+    Fewest of ``grams`` a book can share with the query and still reach
+    SIMILARITY_THRESHOLD. Jaccard similarity s / (|Q| + |B| - s) needs
+    s >= threshold * |Q| shared trigrams, some of which may be among the
+    grams that were not looked up.
+    """
+    needed = math.ceil(SIMILARITY_THRESHOLD * len(query_grams)) - (len(query_grams) - len(grams))
+    return max(1, needed)
+
+
+def candidate_isbns(grams, shared, queryset=None, limit=CANDIDATE_LIMIT):
+    """
+    ISBNs of up to ``limit`` books having at least ``shared`` of ``grams``,
+    those sharing the most first. ``queryset`` optionally restricts the books.
+    """
+    rows = BookTrigram.objects.filter(trigram__in=grams)
+    if queryset is not None:
+        rows = rows.filter(book__in=queryset.order_by().values('ISBN'))
+    return list(
+        rows
+        .values('book_id')
+        .annotate(shared=Count('trigram'))
+        .filter(shared__gte=shared)
+        .order_by('-shared', 'book_id')
+        .values_list('book_id', flat=True)[:limit]
+    )
+
+
+def fuzzy_search(query, limit, queryset=None):
+    """
+    Books whose name or author resemble ``query``, most similar first.
+    ``queryset`` optionally restricts the books that may be returned.
+    Returns a list of (book, score) pairs with score in [0, 1].
+    """
+    query_grams = trigrams(query)
+    if not query_grams:
+        return []
+
+    # Candidates: books sharing the most selective trigrams with the query
+    grams = lookup_grams(query_grams)
+    candidates = candidate_isbns(grams, min_shared(query_grams, grams), queryset)
+    books = Book.objects.in_bulk(candidates)
+
+    matches = []
+    for book in books.values():
+        score = max(
+            similarity(query_grams, book.name),
+            similarity(query_grams, book.author),
+            similarity(query_grams, f'{book.name} {book.author}'),
+        )
+        if score >= SIMILARITY_THRESHOLD:
+            matches.append((book, round(score, 3)))
+
+    matches.sort(key=lambda match: (-match[1], match[0].ISBN))
+    return matches[:limit]
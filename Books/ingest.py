@@ -0,0 +1,201 @@
+"""
+Bulk book ingestion shared by the load_books command and the staff bulk
+endpoint.
+
+Rows (TurkishBookDataSet CSV columns, or add_book's keys for the API) are
+validated into plain dicts of Book fields (no database access, so
+validation can run in worker processes), then written in batches: one
+bulk INSERT per batch, with the search columns and the trigram index
+filled in the same transaction. Upserts also update changed metadata of
+books that already exist.
+
+A book added by someone else between the existence check and the INSERT
+makes the batch fail on the primary key; it is then rolled back and
+written again with that ISBN re-checked, up to WRITE_ATTEMPTS times.
+"""
+from datetime import date, datetime
+
+from django.db import IntegrityError, transaction
+
+from .cache import bump_catalog_version
+from .fuzzy import index_books
+from .models import Book
+
+# Dataset CSV column -> Book field
+CSV_COLUMNS = {
+    'ISBN': 'ISBN',
+    'name': 'name',
+    'explanation': 'explanation',
+    'publisher': 'publisher',
+    'author': 'author',
+    'book_type': 'type',
+    'publication_year': 'year',
+    'book_img': 'image',
+}
+# Staff API record key (as in add_book) -> Book field
+API_COLUMNS = {
+    'isbn': 'ISBN',
+    'name': 'name',
+    'explanation': 'explanation',
+    'publisher': 'publisher',
+    'author': 'author',
+    'type': 'type',
+    'year': 'year',
+    'image': 'image',
+}
+API_REQUIRED = ('ISBN', 'name', 'author', 'publisher', 'type')
+# Fields an upsert may change; status is left to circulation
+METADATA_FIELDS = ['name', 'explanation', 'publisher', 'author', 'type', 'year', 'image']
+# Tries to write a batch that keeps clashing with concurrent inserts
+WRITE_ATTEMPTS = 3
+
+
+class RowError(ValueError):
+    """Raised for a row that cannot become a book."""
+
+
+def parse_year(value):
+    """Publication year as a date: "1998" -> 1998-01-01, ISO dates as-is, else None."""
+    value = str(value or '').strip()
+    if not value:
+        return None
+    if value.isdigit() and len(value) == 4:
+        return date(int(value), 1, 1)
+    try:
+        return datetime.fromisoformat(value).date()
+    except ValueError:
+        return None
+
+
+def _max_length(field):
+    return Book._meta.get_field(field).max_length
+
+
+def validate_row(row, columns=CSV_COLUMNS, required=('ISBN', 'name'), strict=False):
+    """
+    Book fields for one row, a dict keyed by the names in ``columns``.
+    Text is stripped and cut to the column size; raises RowError for a
+    row missing a ``required`` field, or with an unreadable year when
+    ``strict`` (otherwise the year is left empty).
+    """
+    values = {field: str(row.get(column) or '').strip() for column, field in columns.items()}
+
+    for field in required:
+        if not values.get(field):
+            column = next(column for column, mapped in columns.items() if mapped == field)
+            raise RowError(f'{column} is required')
+    isbn = values['ISBN']
+    if len(isbn) > _max_length('ISBN'):
+        raise RowError(f'ISBN longer than {_max_length("ISBN")} characters')
+
+    fields = {'ISBN': isbn, 'status': 'available'}
+    for field in METADATA_FIELDS:
+        if field == 'year':
+            continue
+        value = values.get(field, '')
+        max_length = _max_length(field)
+        fields[field] = value[:max_length] if max_length else value
+
+    fields['year'] = parse_year(values.get('year'))
+    if strict and values.get('year') and fields['year'] is None:
+        raise RowError('Invalid year format. Use YYYY.')
+    return fields
+
+
+def validate_record(record):
+    """Book fields for one staff API record, with add_book's rules."""
+    if not isinstance(record, dict):
+        raise RowError('Each record must be an object')
+    return validate_row(record, columns=API_COLUMNS, required=API_REQUIRED, strict=True)
+
+
+def insert_books(rows):
+    """
+    Insert validated ``rows`` (dicts from validate_row) in one transaction,
+    with their search columns and trigram index entries.
+    Returns the number of books inserted.
+    """
+    books = [Book(**fields) for fields in rows]
+    for book in books:
+        book.refresh_search_fields()
+
+    with transaction.atomic():
+        Book.objects.bulk_create(books)
+        index_books(books)
+        bump_catalog_version()
+    return len(books)
+
+
+def insert_new_books(rows):
+    """
+    Insert the validated ``rows`` whose ISBN is not in the catalog yet, in
+    one transaction. Returns (inserted rows, set of ISBNs that already
+    existed), including ISBNs added concurrently while the batch was
+    written. Raises IntegrityError if the batch still clashes after
+    WRITE_ATTEMPTS tries.
+    """
+    pending = list(rows)
+    existing = set()
+    for attempt in range(WRITE_ATTEMPTS):
+        existing.update(Book.objects.filter(
+            ISBN__in=[fields['ISBN'] for fields in pending]
+        ).values_list('ISBN', flat=True))
+        pending = [fields for fields in pending if fields['ISBN'] not in existing]
+        if not pending:
+            break
+        try:
+            insert_books(pending)
+            break
+        except IntegrityError:
+            # Added by someone else since the check: look again
+            if attempt == WRITE_ATTEMPTS - 1:
+                raise
+    return pending, existing
+
+
+def upsert_books(rows):
+    """
+    Insert the new books among validated ``rows`` and update the metadata
+    of existing ones where it changed, in one transaction. Books are never
+    deleted and their status is kept.
+    Returns (inserted, updated) lists of Book objects. Raises
+    IntegrityError if the batch still clashes with concurrent inserts
+    after WRITE_ATTEMPTS tries.
+    """
+    for attempt in range(WRITE_ATTEMPTS):
+        try:
+            return _upsert(rows)
+        except IntegrityError:
+            # A new ISBN was added by someone else: it is an update now
+            if attempt == WRITE_ATTEMPTS - 1:
+                raise
+
+
+def _upsert(rows):
+    with transaction.atomic():
+        # Read inside the transaction, locked, so updates are not lost
+        existing = Book.objects.select_for_update().in_bulk([fields['ISBN'] for fields in rows])
+
+        new_rows, changed = [], []
+        for fields in rows:
+            book = existing.get(fields['ISBN'])
+            if book is None:
+                new_rows.append(fields)
+                continue
+            if any(getattr(book, field) != fields[field] for field in METADATA_FIELDS):
+                for field in METADATA_FIELDS:
+                    setattr(book, field, fields[field])
+                book.refresh_search_fields()
+                changed.append(book)
+
+        inserted = [Book(**fields) for fields in new_rows]
+        for book in inserted:
+            book.refresh_search_fields()
+
+        Book.objects.bulk_create(inserted)
+        if changed:
+            Book.objects.bulk_update(changed, METADATA_FIELDS + list(Book.SEARCH_SOURCES))
+        index_books(inserted + changed)
+        if inserted or changed:
+            bump_catalog_version()
+    return inserted, changed
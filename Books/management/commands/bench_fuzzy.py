@@ -0,0 +1,81 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+
+from Books.fuzzy import candidate_isbns, fuzzy_search, lookup_grams, min_shared, trigrams
+from Books.models import Book, BookTrigram
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the fuzzy search candidate query on the current catalog, comparing "
+        "the lookup of every query trigram with the selective lookup fuzzy_search "
+        "uses. Queries are book names with a typo unless given."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("queries", nargs="*", help="Queries to run.")
+        parser.add_argument(
+            "--samples",
+            type=int,
+            default=5,
+            help="Queries taken from the catalog when none are given.",
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=5,
+            help="Runs per query; the median is reported.",
+        )
+
+    def handle(self, *args, **options):
+        queries = options["queries"] or self._sample_queries(options["samples"])
+        self.stdout.write(
+            f"{Book.objects.count()} books, {BookTrigram.objects.count()} trigram rows, "
+            f"{options['repeat']} runs per query"
+        )
+        self.stdout.write(
+            f"{'query':30}  {'rows (all)':>10}  {'rows (used)':>11}  {'all grams':>10}  "
+            f"{'selective':>10}  {'fuzzy_search':>12}  matches"
+        )
+        for query in queries:
+            query_grams = trigrams(query)
+            grams = lookup_grams(query_grams)
+            shared = min_shared(query_grams, grams)
+
+            before = self._time(lambda: candidate_isbns(query_grams, 1), options["repeat"])
+            after = self._time(lambda: candidate_isbns(grams, shared), options["repeat"])
+            search = self._time(lambda: fuzzy_search(query, 20), options["repeat"])
+
+            self.stdout.write(
+                f"{query[:30]:30}  {self._postings(query_grams):10d}  {self._postings(grams):11d}  "
+                f"{before:7.1f} ms  {after:7.1f} ms  {search:9.1f} ms  {len(fuzzy_search(query, 20))}"
+            )
+
+    def _sample_queries(self, samples):
+        """Names of random books with one letter dropped."""
+        count = Book.objects.count()
+        rng = random.Random(0)
+        queries = []
+        for _ in range(min(samples, count)):
+            name = Book.objects.order_by("ISBN").values_list("name", flat=True)[rng.randrange(count)]
+            if len(name) > 4:
+                i = rng.randrange(1, len(name) - 1)
+                name = name[:i] + name[i + 1:]
+            queries.append(name)
+        return queries
+
+    def _postings(self, grams):
+        # Index rows the candidate query has to group
+        return BookTrigram.objects.filter(trigram__in=grams).count()
+
+    def _time(self, run, repeat):
+        run()  # warm up the caches
+        timings = []
+        for _ in range(max(1, repeat)):
+            started = time.perf_counter()
+            run()
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
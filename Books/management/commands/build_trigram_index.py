@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from Books.fuzzy import index_books
+from Books.models import Book, BookTrigram
+
+
+class Command(BaseCommand):
+    help = (
+        "Build the trigram index used by fuzzy search (mode=fuzzy) for every book. "
+        "add_book and delete_book keep it up to date afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Books indexed per transaction.",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        BookTrigram.objects.all().delete()
+
+        indexed = 0
+        trigram_rows = 0
+        last_isbn = ""
+        while True:
+            # Walk the catalog in ISBN order, one batch at a time
+            books = list(
+                Book.objects.filter(ISBN__gt=last_isbn)
+                .order_by("ISBN")
+                .only("ISBN", "name", "author")[:batch_size]
+            )
+            if not books:
+                break
+            with transaction.atomic():
+                trigram_rows += index_books(books)
+            indexed += len(books)
+            last_isbn = books[-1].ISBN
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Indexed {indexed} books ({trigram_rows} trigrams)"
+        ))
@@ -0,0 +1,140 @@
+import csv
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from Books.ingest import RowError, insert_books, validate_row
+from Books.models import Book
+
+
+def _validate(row):
+    # Runs in worker processes: report errors as values, not exceptions
+    try:
+        return validate_row(row), None
+    except RowError as e:
+        return None, str(e)
+
+
+class Command(BaseCommand):
+    help = (
+        "Load books from a CSV in the TurkishBookDataSet layout. Streams the file, "
+        "skips ISBNs already in the catalog and inserts in batches; an interrupted "
+        "load continues where it stopped with --resume."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "csv_path",
+            nargs="?",
+            default=str(settings.BASE_DIR.parent / "TurkishBookDataSet.csv"),
+            help="CSV file to load (default: TurkishBookDataSet.csv next to manage.py).",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Books inserted per transaction.",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="Processes validating rows in parallel.",
+        )
+        parser.add_argument(
+            "--checkpoint",
+            help="Progress file, updated after every batch (default: <csv_path>.checkpoint).",
+        )
+        parser.add_argument(
+            "--resume",
+            action="store_true",
+            help="Skip the rows already committed according to the checkpoint.",
+        )
+
+    def handle(self, *args, **options):
+        csv_path = options["csv_path"]
+        batch_size = options["batch_size"]
+        workers = options["workers"]
+        checkpoint_path = options["checkpoint"] or f"{csv_path}.checkpoint"
+
+        if not os.path.exists(csv_path):
+            raise CommandError(f"CSV not found: {csv_path}")
+        if batch_size < 1 or workers < 1:
+            raise CommandError("--batch-size and --workers must be at least 1")
+
+        progress = {"rows": 0, "inserted": 0, "duplicates": 0, "invalid": 0}
+        if options["resume"] and os.path.exists(checkpoint_path):
+            with open(checkpoint_path) as f:
+                progress.update(json.load(f))
+            self.stdout.write(f"Resuming after row {progress['rows']}")
+
+        # Every ISBN in the catalog, read once; new ones are added as they are inserted
+        seen = set(Book.objects.values_list("ISBN", flat=True).iterator(chunk_size=10000))
+
+        started = time.monotonic()
+        rows_read = 0
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=django.setup) if workers > 1 else None
+        try:
+            with open(csv_path, "r", encoding="utf-8-sig", newline="") as f:
+                reader = csv.DictReader(f)
+                for _ in islice(reader, progress["rows"]):
+                    pass
+
+                while True:
+                    chunk = list(islice(reader, batch_size))
+                    if not chunk:
+                        break
+                    rows_read += len(chunk)
+
+                    if pool:
+                        results = pool.map(_validate, chunk, chunksize=max(1, len(chunk) // workers))
+                    else:
+                        results = map(_validate, chunk)
+
+                    batch = []
+                    for offset, (fields, error) in enumerate(results, start=progress["rows"] + 1):
+                        if error:
+                            progress["invalid"] += 1
+                            if options["verbosity"] > 1:
+                                self.stderr.write(f"Row {offset}: {error}")
+                        elif fields["ISBN"] in seen:
+                            progress["duplicates"] += 1
+                        else:
+                            seen.add(fields["ISBN"])
+                            batch.append(fields)
+
+                    if batch:
+                        progress["inserted"] += insert_books(batch)
+                    progress["rows"] += len(chunk)
+                    self._save_checkpoint(checkpoint_path, progress)
+
+                    if options["verbosity"] > 1:
+                        self.stdout.write(f"{progress['rows']} rows, {progress['inserted']} inserted")
+        finally:
+            if pool:
+                pool.shutdown()
+
+        # Finished: a later run starts from the top again
+        if os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+
+        elapsed = time.monotonic() - started
+        rate = rows_read / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Loaded {csv_path}: {progress['inserted']} books inserted, "
+            f"{progress['duplicates']} duplicate and {progress['invalid']} invalid rows skipped. "
+            f"{rows_read} rows in {elapsed:.1f}s ({rate:.0f} rows/s)"
+        ))
+
+    def _save_checkpoint(self, path, progress):
+        # Write-then-rename so a crash never leaves a half-written checkpoint
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(progress, f)
+        os.replace(tmp_path, path)
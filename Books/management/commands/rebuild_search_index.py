@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from Books.search import install_sqlite_triggers, rebuild_sqlite_index
+
+
+class Command(BaseCommand):
+    help = (
+        "Refill the SQLite FTS5 catalog index and recreate its triggers. "
+        "MySQL FULLTEXT indexes are maintained by the database and need no rebuild."
+    )
+
+    def handle(self, *args, **options):
+        if connection.vendor != "sqlite":
+            self.stdout.write(f"Nothing to rebuild on {connection.vendor}.")
+            return
+
+        with connection.schema_editor() as schema_editor:
+            install_sqlite_triggers(schema_editor)
+            rebuild_sqlite_index(schema_editor)
+        self.stdout.write(self.style.SUCCESS("Search index rebuilt"))
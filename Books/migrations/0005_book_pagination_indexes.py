@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("Books", "0004_alter_book_name_alter_book_year"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="book",
+            index=models.Index(fields=["name", "ISBN"], name="book_name_isbn_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="book",
+            index=models.Index(fields=["year", "ISBN"], name="book_year_isbn_idx"),
+        ),
+    ]
@@ -0,0 +1,88 @@
+import unicodedata
+
+from django.db import migrations
+
+# The full-text index as first created: it covers the raw searchable columns.
+# The DDL and the fold function are frozen copies, so later changes to
+# Books/search.py or library_management/text.py do not change this migration.
+TABLE = "Books_book"
+FTS_TABLE = "books_book_fts"
+FIELDS = ["name", "author", "type", "publisher"]
+
+_TURKISH_I = str.maketrans({"İ": "i", "I": "i", "ı": "i"})
+
+
+def fold(text):
+    if not text:
+        return ""
+    text = text.translate(_TURKISH_I).lower()
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def _fts_row(prefix):
+    values = ", ".join(f"tr_fold({prefix}.{field})" for field in FIELDS)
+    return f"({prefix}.rowid, {prefix}.ISBN, {values})"
+
+
+def install(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+
+    if vendor == "mysql":
+        # InnoDB adds one FULLTEXT index per ALTER TABLE
+        schema_editor.execute(f"ALTER TABLE {TABLE} ADD FULLTEXT INDEX book_ft_all ({', '.join(FIELDS)})")
+        for field in FIELDS:
+            schema_editor.execute(f"ALTER TABLE {TABLE} ADD FULLTEXT INDEX book_ft_{field} ({field})")
+
+    elif vendor == "sqlite":
+        # The triggers fold through tr_fold(); register it on this connection
+        schema_editor.connection.ensure_connection()
+        schema_editor.connection.connection.create_function("tr_fold", 1, fold, deterministic=True)
+
+        columns = ", ".join(["rowid", "isbn"] + FIELDS)
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+            f"isbn UNINDEXED, {', '.join(FIELDS)}, tokenize='unicode61 remove_diacritics 2')"
+        )
+        for suffix in ("ai", "ad", "au"):
+            schema_editor.execute(f"DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffix}")
+        schema_editor.execute(
+            f"CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON {TABLE} BEGIN "
+            f"INSERT INTO {FTS_TABLE}({columns}) VALUES {_fts_row('new')}; END"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON {TABLE} BEGIN "
+            f"DELETE FROM {FTS_TABLE} WHERE rowid = old.rowid; END"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE OF {', '.join(['ISBN'] + FIELDS)} ON {TABLE} BEGIN "
+            f"DELETE FROM {FTS_TABLE} WHERE rowid = old.rowid; "
+            f"INSERT INTO {FTS_TABLE}({columns}) VALUES {_fts_row('new')}; END"
+        )
+        values = ", ".join(["rowid", "ISBN"] + [f"tr_fold({field})" for field in FIELDS])
+        schema_editor.execute(f"DELETE FROM {FTS_TABLE}")
+        schema_editor.execute(f"INSERT INTO {FTS_TABLE}({columns}) SELECT {values} FROM {TABLE}")
+
+
+def drop(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+
+    if vendor == "mysql":
+        for name in ["all"] + FIELDS:
+            schema_editor.execute(f"ALTER TABLE {TABLE} DROP INDEX book_ft_{name}")
+
+    elif vendor == "sqlite":
+        for suffix in ("ai", "ad", "au"):
+            schema_editor.execute(f"DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffix}")
+        schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("Books", "0005_book_pagination_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(install, drop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("Books", "0006_book_fulltext_search"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="BookTrigram",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("trigram", models.CharField(max_length=3)),
+                ("book", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="trigrams", to="Books.book")),
+            ],
+            options={
+                "indexes": [models.Index(fields=["trigram", "book"], name="booktrigram_trigram_book_idx")],
+                "constraints": [models.UniqueConstraint(fields=("book", "trigram"), name="booktrigram_book_trigram_uniq")],
+            },
+        ),
+    ]
@@ -0,0 +1,140 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:27
+
+import unicodedata
+
+from django.db import migrations, models
+
+# The DDL and the fold function are frozen copies, so later changes to
+# Books/search.py or library_management/text.py do not change this migration.
+TABLE = "Books_book"
+FTS_TABLE = "books_book_fts"
+FTS_FIELDS = ["name", "author", "type", "publisher"]
+OLD_COLUMNS = ["name", "author", "type", "publisher"]
+NEW_COLUMNS = ["search_name", "search_author", "search_type", "search_publisher"]
+BATCH_SIZE = 1000
+
+_TURKISH_I = str.maketrans({"İ": "i", "I": "i", "ı": "i"})
+
+
+def fold(text):
+    if not text:
+        return ""
+    text = text.translate(_TURKISH_I).lower()
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def _install(schema_editor, columns, folded):
+    """The index over ``columns``; ``folded`` wraps them in tr_fold() on SQLite."""
+    vendor = schema_editor.connection.vendor
+
+    if vendor == "mysql":
+        # InnoDB adds one FULLTEXT index per ALTER TABLE
+        schema_editor.execute(f"ALTER TABLE {TABLE} ADD FULLTEXT INDEX book_ft_all ({', '.join(columns)})")
+        for field, column in zip(FTS_FIELDS, columns):
+            schema_editor.execute(f"ALTER TABLE {TABLE} ADD FULLTEXT INDEX book_ft_{field} ({column})")
+
+    elif vendor == "sqlite":
+        if folded:
+            schema_editor.connection.ensure_connection()
+            schema_editor.connection.connection.create_function("tr_fold", 1, fold, deterministic=True)
+
+        def values(prefix):
+            source = [f"{prefix}{column}" for column in columns]
+            if folded:
+                source = [f"tr_fold({column})" for column in source]
+            return ", ".join([f"{prefix}rowid", f"{prefix}ISBN"] + source)
+
+        fts_columns = ", ".join(["rowid", "isbn"] + FTS_FIELDS)
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+            f"isbn UNINDEXED, {', '.join(FTS_FIELDS)}, tokenize='unicode61 remove_diacritics 2')"
+        )
+        for suffix in ("ai", "ad", "au"):
+            schema_editor.execute(f"DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffix}")
+        schema_editor.execute(
+            f"CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON {TABLE} BEGIN "
+            f"INSERT INTO {FTS_TABLE}({fts_columns}) VALUES ({values('new.')}); END"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON {TABLE} BEGIN "
+            f"DELETE FROM {FTS_TABLE} WHERE rowid = old.rowid; END"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE OF {', '.join(['ISBN'] + columns)} ON {TABLE} BEGIN "
+            f"DELETE FROM {FTS_TABLE} WHERE rowid = old.rowid; "
+            f"INSERT INTO {FTS_TABLE}({fts_columns}) VALUES ({values('new.')}); END"
+        )
+        schema_editor.execute(f"DELETE FROM {FTS_TABLE}")
+        schema_editor.execute(f"INSERT INTO {FTS_TABLE}({fts_columns}) SELECT {values('')} FROM {TABLE}")
+
+
+def drop_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+
+    if vendor == "mysql":
+        for name in ["all"] + FTS_FIELDS:
+            schema_editor.execute(f"ALTER TABLE {TABLE} DROP INDEX book_ft_{name}")
+
+    elif vendor == "sqlite":
+        for suffix in ("ai", "ad", "au"):
+            schema_editor.execute(f"DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffix}")
+        schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+def restore_old_index(apps, schema_editor):
+    # The index of 0006: the raw columns, folded by the SQLite triggers
+    _install(schema_editor, OLD_COLUMNS, folded=True)
+
+
+def fill_search_columns(apps, schema_editor):
+    Book = apps.get_model("Books", "Book")
+    last_isbn = ""
+    while True:
+        books = list(Book.objects.filter(ISBN__gt=last_isbn).order_by("ISBN")[:BATCH_SIZE])
+        if not books:
+            break
+        for book in books:
+            for source, column in zip(OLD_COLUMNS, NEW_COLUMNS):
+                max_length = Book._meta.get_field(column).max_length
+                setattr(book, column, fold(getattr(book, source))[:max_length])
+        Book.objects.bulk_update(books, NEW_COLUMNS)
+        last_isbn = books[-1].ISBN
+
+
+def install_new_index(apps, schema_editor):
+    _install(schema_editor, NEW_COLUMNS, folded=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("Books", "0007_booktrigram"),
+    ]
+
+    operations = [
+        # Move the full-text index from the raw columns to the folded ones
+        migrations.RunPython(drop_index, restore_old_index),
+        migrations.AddField(
+            model_name="book",
+            name="search_author",
+            field=models.CharField(blank=True, default="", editable=False, max_length=50),
+        ),
+        migrations.AddField(
+            model_name="book",
+            name="search_name",
+            field=models.CharField(blank=True, default="", editable=False, max_length=100),
+        ),
+        migrations.AddField(
+            model_name="book",
+            name="search_publisher",
+            field=models.CharField(blank=True, default="", editable=False, max_length=50),
+        ),
+        migrations.AddField(
+            model_name="book",
+            name="search_type",
+            field=models.CharField(blank=True, default="", editable=False, max_length=50),
+        ),
+        migrations.RunPython(fill_search_columns, migrations.RunPython.noop),
+        migrations.RunPython(install_new_index, drop_index),
+    ]
@@ -1,5 +1,7 @@
 from django.db import models
 
+from library_management.text import fold_turkish
+
 # Create your models here.
 class Book(models.Model):
     ISBN = models.CharField(max_length=20, primary_key=True)  # int PK
@@ -16,3 +18,71 @@ class Book(models.Model):
         ('late', 'Late'),
     )
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='available')
+
+    # Turkish-folded copies of the searchable fields, indexed for full-text
+    # search (see Books/search.py) and kept in sync by save()
+    search_name = models.CharField(max_length=100, blank=True, default='', editable=False)
+    search_author = models.CharField(max_length=50, blank=True, default='', editable=False)
+    search_type = models.CharField(max_length=50, blank=True, default='', editable=False)
+    search_publisher = models.CharField(max_length=50, blank=True, default='', editable=False)
+
+    SEARCH_SOURCES = {
+        'search_name': 'name',
+        'search_author': 'author',
+        'search_type': 'type',
+        'search_publisher': 'publisher',
+    }
+
+    def refresh_search_fields(self):
+        """Recompute the folded search columns; bulk writers call this before bulk_create."""
+        for column, source in self.SEARCH_SOURCES.items():
+            max_length = self._meta.get_field(column).max_length
+            setattr(self, column, fold_turkish(getattr(self, source))[:max_length])
+
+    def save(self, *args, **kwargs):
+        self.refresh_search_fields()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and set(update_fields) & set(self.SEARCH_SOURCES.values()):
+            kwargs['update_fields'] = set(update_fields) | set(self.SEARCH_SOURCES)
+        super().save(*args, **kwargs)
+
+    class Meta:
+        indexes = [
+            # Keyset pagination sort orders, ISBN breaks ties
+            models.Index(fields=['name', 'ISBN'], name='book_name_isbn_idx'),
+            models.Index(fields=['year', 'ISBN'], name='book_year_isbn_idx'),
+            # Facet filters and their grouped counts (see Books/facets.py)
+            models.Index(fields=['type', 'ISBN'], name='book_type_isbn_idx'),
+            models.Index(fields=['publisher', 'ISBN'], name='book_publisher_isbn_idx'),
+            models.Index(fields=['author', 'ISBN'], name='book_author_isbn_idx'),
+        ]
+
+
+class BookTrigram(models.Model):
+    """
+    One row per trigram of a book's Turkish-folded name and author.
+    Serves the fuzzy (typo-tolerant) catalog search, see Books/fuzzy.py.
+    """
+    book = models.ForeignKey(Book, to_field='ISBN', on_delete=models.CASCADE, related_name='trigrams')
+    trigram = models.CharField(max_length=3)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['book', 'trigram'], name='booktrigram_book_trigram_uniq'),
+        ]
+        indexes = [
+            # Lookup by trigram, grouped by book, answered from the index alone
+            models.Index(fields=['trigram', 'book'], name='booktrigram_trigram_book_idx'),
+        ]
+
+
+class CatalogVersion(models.Model):
+    """
+    Counter bumped after every change that shows in the catalog endpoints.
+    Cached catalog responses are keyed by it (see Books/cache.py).
+    """
+    name = models.CharField(max_length=50, primary_key=True)
+    version = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name}: v{self.version}"
@@ -0,0 +1,124 @@
+"""
+Keyset (cursor) pagination for catalog endpoints.
+
+Pages are ordered by a stable, index-backed sort key with ISBN as the
+tie-breaker, and the next page starts after the last row of the previous
+one, so page 5000 costs the same as page 1. Cursors are opaque to clients.
+
+Relevance-ranked search results resume the same way on (score, ISBN), the
+score being the one the search backend ranked by.
+"""
+from datetime import date
+
+from django.db.models import Q
+
+from library_management.listing import CursorError, pack_cursor, unpack_cursor
+from .models import Book
+
+# sort parameter -> Book field; ISBN always breaks ties
+SORT_FIELDS = {
+    'isbn': 'ISBN',
+    'name': 'name',
+    'year': 'year',
+}
+DEFAULT_SORT = 'isbn'
+RELEVANCE = 'relevance'
+
+
+class PaginationError(ValueError):
+    """Raised for an unknown sort or a cursor that cannot be used."""
+
+
+def _unpack(sort, cursor):
+    try:
+        return unpack_cursor(sort, cursor)
+    except CursorError as e:
+        raise PaginationError(str(e))
+
+
+def encode_cursor(sort, book):
+    """Build the opaque cursor that resumes after ``book``."""
+    value = getattr(book, SORT_FIELDS[sort])
+    if isinstance(value, date):
+        value = value.isoformat()
+    return pack_cursor(sort, value, book.ISBN)
+
+
+def decode_cursor(sort, cursor):
+    """Return the (value, isbn) pair stored in ``cursor``."""
+    value, isbn = _unpack(sort, cursor)
+    if sort == 'year' and value is not None:
+        try:
+            value = date.fromisoformat(value)
+        except (ValueError, TypeError):
+            raise PaginationError('Invalid cursor')
+    return value, isbn
+
+
+def after_cursor(sort, value, isbn):
+    """Filter for the rows that come after (value, isbn) in sort order."""
+    if sort == 'isbn':
+        return Q(ISBN__gt=isbn)
+
+    field = SORT_FIELDS[sort]
+    if value is None:
+        # NULLs sort first on MySQL and SQLite
+        return Q(**{f'{field}__isnull': True, 'ISBN__gt': isbn}) | Q(**{f'{field}__isnull': False})
+    return Q(**{f'{field}__gt': value}) | Q(**{field: value, 'ISBN__gt': isbn})
+
+
+def paginate_books(queryset, sort, limit, cursor=None, offset=0):
+    """
+    Return one page of ``queryset`` in ``sort`` order.
+    Resumes after ``cursor`` when given, otherwise skips ``offset`` rows
+    (kept for older clients). Returns (books, next_cursor); next_cursor
+    is None on the last page.
+    """
+    if sort not in SORT_FIELDS:
+        raise PaginationError(f'Invalid sort. Use one of: {", ".join(SORT_FIELDS)}')
+
+    field = SORT_FIELDS[sort]
+    ordering = ['ISBN'] if field == 'ISBN' else [field, 'ISBN']
+    queryset = queryset.order_by(*ordering)
+
+    if cursor:
+        value, isbn = decode_cursor(sort, cursor)
+        queryset = queryset.filter(after_cursor(sort, value, isbn))
+        offset = 0
+
+    # Fetch one extra row to know whether another page exists
+    books = list(queryset[offset:offset + limit + 1])
+    next_cursor = None
+    if len(books) > limit:
+        books = books[:limit]
+        next_cursor = encode_cursor(sort, books[-1])
+    return books, next_cursor
+
+
+def paginate_ranked(rank, limit, cursor=None, offset=0, queryset=None):
+    """
+    Return one page of a relevance-ranked result.
+    ``rank(limit, offset, after)`` returns (ISBN, score) pairs best match
+    first, starting after the (score, ISBN) pair ``after`` when given. The
+    books are loaded in one query (from ``queryset`` if given, e.g. to
+    defer columns) and returned in that order with the next cursor.
+    """
+    after = None
+    if cursor:
+        score, isbn = _unpack(RELEVANCE, cursor)
+        if not isinstance(score, (int, float)) or not isinstance(isbn, str):
+            raise PaginationError('Invalid cursor')
+        after = (score, isbn)
+        offset = 0
+
+    ranked = list(rank(limit + 1, offset, after))
+    next_cursor = None
+    if len(ranked) > limit:
+        ranked = ranked[:limit]
+        isbn, score = ranked[-1]
+        next_cursor = pack_cursor(RELEVANCE, score, isbn)
+
+    isbns = [isbn for isbn, _ in ranked]
+    books_by_isbn = (Book.objects.all() if queryset is None else queryset).in_bulk(isbns)
+    books = [books_by_isbn[isbn] for isbn in isbns if isbn in books_by_isbn]
+    return books, next_cursor
@@ -0,0 +1,268 @@
+"""
+Full-text search backends for the book catalog.
+
+MySQL (production) uses FULLTEXT indexes; SQLite (local development and
+tests) uses an FTS5 table kept in sync by triggers. Both index the
+Turkish-folded shadow columns (Book.search_*) and rank matches so a hit in
+the title weighs more than one in the publisher. Other databases fall back
+to substring matching on the same shadow columns.
+"""
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from library_management.text import fold_turkish
+from .models import Book
+
+# Searchable fields and their relevance weight, title first
+SEARCH_FIELDS = (
+    ('name', 4.0),
+    ('author', 3.0),
+    ('type', 2.0),
+    ('publisher', 1.0),
+)
+# Folded shadow column indexed for each searchable field
+SEARCH_COLUMNS = [f'search_{field}' for field, _ in SEARCH_FIELDS]
+
+# MySQL does not index words shorter than innodb_ft_min_token_size
+MYSQL_MIN_TOKEN_SIZE = 3
+
+FTS_TABLE = 'books_book_fts'
+
+
+def _within_sql(column, within):
+    """SQL condition (and params) limiting ``column`` to the ISBNs of ``within``."""
+    if within is None:
+        return '', []
+    sql, params = within.order_by().values('ISBN').query.sql_with_params()
+    return f" AND {column} IN ({sql})", list(params)
+
+
+def _resume_sql(isbn, op, after):
+    """
+    WHERE clause (and params) over the "ranked" CTE for the rows after the
+    (score, ISBN) pair ``after``; ``op`` is the comparison for "ranked
+    lower". The anchor book's current score is used while it still matches,
+    since corpus statistics shift every score as the catalog changes.
+    """
+    if after is None:
+        return '', []
+    score, last_isbn = after
+    anchor = f"COALESCE((SELECT score FROM ranked WHERE {isbn} = %s), %s)"
+    return (
+        f" WHERE score {op} {anchor} OR (score = {anchor} AND {isbn} > %s)",
+        [last_isbn, score, last_isbn, score, last_isbn]
+    )
+
+
+class LikeSearch:
+    """Fallback without a full-text index: substring match on the folded columns."""
+    name = 'like'
+    ranked = False
+
+    def filter(self, queryset, query):
+        folded = fold_turkish(query)
+        condition = Q()
+        for column in SEARCH_COLUMNS:
+            condition |= Q(**{f'{column}__contains': folded})
+        return queryset.filter(condition)
+
+
+class SQLiteSearch:
+    """FTS5 table holding copies of the folded searchable columns."""
+    name = 'fts5'
+    ranked = True
+
+    def match(self, query):
+        # Every word must match, as a prefix so "pamu" finds "Pamuk"
+        return ' '.join(f'"{term}"*' for term in re.findall(r'\w+', fold_turkish(query)))
+
+    def filter(self, queryset, query):
+        match = self.match(query)
+        if not match:
+            return queryset.none()
+        return queryset.filter(ISBN__in=RawSQL(
+            f"SELECT isbn FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [match]
+        ))
+
+    def rank(self, query, limit, offset=0, after=None, within=None):
+        """
+        (ISBN, score) of the matching books, best match first, starting
+        after the (score, ISBN) pair ``after`` or else skipping ``offset``.
+        ``within`` is an optional Book queryset the matches must belong to.
+        """
+        match = self.match(query)
+        if not match:
+            return []
+        # bm25() takes one weight per column, isbn included; lower is better
+        weights = ', '.join(['0'] + [str(weight) for _, weight in SEARCH_FIELDS])
+        restrict, restrict_params = _within_sql('isbn', within)
+        resume, resume_params = _resume_sql('isbn', '>', after)
+        if after is not None:
+            offset = 0
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"WITH ranked AS ("
+                f"SELECT isbn, bm25({FTS_TABLE}, {weights}) AS score FROM {FTS_TABLE} "
+                f"WHERE {FTS_TABLE} MATCH %s{restrict}) "
+                f"SELECT isbn, score FROM ranked{resume} "
+                f"ORDER BY score, isbn LIMIT %s OFFSET %s",
+                [match] + restrict_params + resume_params + [limit, offset]
+            )
+            return cursor.fetchall()
+
+
+class MySQLSearch:
+    """InnoDB FULLTEXT indexes, one over all columns plus one per column for weighting."""
+    name = 'fulltext'
+    ranked = True
+
+    def match(self, query):
+        # Boolean mode: every word required, matched as a prefix
+        terms = [
+            term for term in re.findall(r'\w+', fold_turkish(query))
+            if len(term) >= MYSQL_MIN_TOKEN_SIZE
+        ]
+        return ' '.join(f'+{term}*' for term in terms)
+
+    def _against(self, columns):
+        return f"MATCH({', '.join(columns)}) AGAINST (%s IN BOOLEAN MODE)"
+
+    def filter(self, queryset, query):
+        match = self.match(query)
+        if not match:
+            # Only short words: the index cannot answer, scan instead
+            return LikeSearch().filter(queryset, query)
+        return queryset.extra(where=[self._against(SEARCH_COLUMNS)], params=[match])
+
+    def rank(self, query, limit, offset=0, after=None, within=None):
+        """
+        (ISBN, score) of the matching books, best match first, starting
+        after the (score, ISBN) pair ``after`` or else skipping ``offset``.
+        ``within`` is an optional Book queryset the matches must belong to.
+        """
+        match = self.match(query)
+        if after is not None:
+            offset = 0
+        if not match:
+            # Only short words: unranked, in ISBN order
+            books = self.filter(Book.objects.all() if within is None else within, query).order_by('ISBN')
+            if after is not None:
+                books = books.filter(ISBN__gt=after[1])
+            return [(isbn, 0.0) for isbn in books.values_list('ISBN', flat=True)[offset:offset + limit]]
+        score = ' + '.join(
+            f"{weight} * {self._against([column])}"
+            for column, (_, weight) in zip(SEARCH_COLUMNS, SEARCH_FIELDS)
+        )
+        restrict, restrict_params = _within_sql('ISBN', within)
+        resume, resume_params = _resume_sql('ISBN', '<', after)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"WITH ranked AS ("
+                f"SELECT ISBN, {score} AS score FROM {Book._meta.db_table} "
+                f"WHERE {self._against(SEARCH_COLUMNS)}{restrict}) "
+                f"SELECT ISBN, score FROM ranked{resume} "
+                f"ORDER BY score DESC, ISBN LIMIT %s OFFSET %s",
+                [match] * len(SEARCH_FIELDS) + [match] + restrict_params + resume_params + [limit, offset]
+            )
+            return cursor.fetchall()
+
+
+BACKENDS = {
+    'sqlite': SQLiteSearch,
+    'mysql': MySQLSearch,
+}
+
+
+def get_search_backend():
+    """
+    Pick the search backend for the current database.
+    BOOK_SEARCH_BACKEND='like' forces the substring fallback.
+    """
+    if settings.BOOK_SEARCH_BACKEND == 'like':
+        return LikeSearch()
+    return BACKENDS.get(connection.vendor, LikeSearch)()
+
+
+# Index maintenance, used by the rebuild_search_index command. The
+# migrations keep frozen copies of the DDL of their time.
+
+def _fts_columns():
+    return ', '.join(['rowid', 'isbn'] + [field for field, _ in SEARCH_FIELDS])
+
+
+def _fts_values(prefix=None):
+    source = [f'{prefix}.{column}' if prefix else column for column in SEARCH_COLUMNS]
+    rowid, isbn = (f'{prefix}.rowid', f'{prefix}.ISBN') if prefix else ('rowid', 'ISBN')
+    return ', '.join([rowid, isbn] + source)
+
+
+def install_search_index(schema_editor):
+    """Create the full-text index for the current database and fill it."""
+    vendor = schema_editor.connection.vendor
+    table = Book._meta.db_table
+
+    if vendor == 'mysql':
+        # InnoDB adds one FULLTEXT index per ALTER TABLE
+        schema_editor.execute(f"ALTER TABLE {table} ADD FULLTEXT INDEX book_ft_all ({', '.join(SEARCH_COLUMNS)})")
+        for (field, _), column in zip(SEARCH_FIELDS, SEARCH_COLUMNS):
+            schema_editor.execute(f"ALTER TABLE {table} ADD FULLTEXT INDEX book_ft_{field} ({column})")
+
+    elif vendor == 'sqlite':
+        fields = ', '.join(field for field, _ in SEARCH_FIELDS)
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+            f"isbn UNINDEXED, {fields}, tokenize='unicode61 remove_diacritics 2')"
+        )
+        install_sqlite_triggers(schema_editor)
+        rebuild_sqlite_index(schema_editor)
+
+
+def install_sqlite_triggers(schema_editor):
+    """(Re)create the triggers that keep the FTS5 table in sync with Books_book."""
+    table = Book._meta.db_table
+    watched = ', '.join(['ISBN'] + SEARCH_COLUMNS)
+
+    for suffix in ('ai', 'ad', 'au'):
+        schema_editor.execute(f"DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffix}")
+
+    schema_editor.execute(
+        f"CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {FTS_TABLE}({_fts_columns()}) VALUES ({_fts_values('new')}); END"
+    )
+    schema_editor.execute(
+        f"CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON {table} BEGIN "
+        f"DELETE FROM {FTS_TABLE} WHERE rowid = old.rowid; END"
+    )
+    schema_editor.execute(
+        f"CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE OF {watched} ON {table} BEGIN "
+        f"DELETE FROM {FTS_TABLE} WHERE rowid = old.rowid; "
+        f"INSERT INTO {FTS_TABLE}({_fts_columns()}) VALUES ({_fts_values('new')}); END"
+    )
+
+
+def rebuild_sqlite_index(schema_editor):
+    """Refill the FTS5 table from Books_book."""
+    table = Book._meta.db_table
+    schema_editor.execute(f"DELETE FROM {FTS_TABLE}")
+    schema_editor.execute(
+        f"INSERT INTO {FTS_TABLE}({_fts_columns()}) SELECT {_fts_values()} FROM {table}"
+    )
+
+
+def drop_search_index(schema_editor):
+    """Remove the full-text index created by install_search_index()."""
+    vendor = schema_editor.connection.vendor
+    table = Book._meta.db_table
+
+    if vendor == 'mysql':
+        for name in ['all'] + [field for field, _ in SEARCH_FIELDS]:
+            schema_editor.execute(f"ALTER TABLE {table} DROP INDEX book_ft_{name}")
+
+    elif vendor == 'sqlite':
+        for suffix in ('ai', 'ad', 'au'):
+            schema_editor.execute(f"DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffix}")
+        schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
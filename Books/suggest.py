@@ -0,0 +1,222 @@
+"""
+In-memory prefix index for search-box autocomplete.
+
+Titles and authors are Turkish-folded and kept in sorted arrays, so the
+completions for a prefix are found with one bisect and a short forward
+scan, without touching the database. Authors are also indexed from each
+word, so "pam" completes "Orhan Pamuk".
+
+Each process loads the index from the Book table on first use and keeps it
+current for the books it adds or deletes itself. Writes made by other
+processes (or by the admin and loaders) are picked up by a background
+reload every BOOK_SUGGEST_REFRESH seconds.
+"""
+import logging
+import threading
+import time
+from bisect import bisect_left, insort
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from library_management.text import fold_turkish
+from .models import Book
+
+logger = logging.getLogger(__name__)
+
+# Author entries scanned per prefix before ranking them by book count
+AUTHOR_SCAN_LIMIT = 200
+LOAD_CHUNK_SIZE = 2000
+
+
+def normalize(text):
+    """Turkish-folded ``text`` with whitespace collapsed, as stored in the index."""
+    return ' '.join(fold_turkish(text or '').split())
+
+
+def word_starts(key):
+    """Every tail of ``key`` starting at a word: 'orhan pamuk' -> ['orhan pamuk', 'pamuk']."""
+    words = key.split(' ')
+    return [' '.join(words[i:]) for i in range(len(words))]
+
+
+class SuggestIndex:
+    """Sorted title and author arrays with incremental add/remove."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._init_lock = threading.Lock()
+        self._clear()
+        self.loaded_at = None
+        self._reloading = False
+        self._pending = []
+
+    def _clear(self):
+        self._titles = []        # sorted (title key, isbn)
+        self._books = {}         # isbn -> (name, title key, author key)
+        self._authors = []       # sorted (word-start key, author key)
+        self._author_names = {}  # author key -> [author, number of books]
+
+    # Incremental maintenance; callers hold self._lock
+
+    def _add(self, isbn, name, author):
+        self._remove(isbn)
+        title_key, author_key = normalize(name), normalize(author)
+        self._books[isbn] = (name, title_key, author_key)
+        if title_key:
+            insort(self._titles, (title_key, isbn))
+        if author_key:
+            if author_key in self._author_names:
+                self._author_names[author_key][1] += 1
+            else:
+                self._author_names[author_key] = [author, 1]
+                for start in word_starts(author_key):
+                    insort(self._authors, (start, author_key))
+
+    def _remove(self, isbn):
+        entry = self._books.pop(isbn, None)
+        if entry is None:
+            return
+        _, title_key, author_key = entry
+        self._delete(self._titles, (title_key, isbn))
+        if author_key in self._author_names:
+            self._author_names[author_key][1] -= 1
+            if self._author_names[author_key][1] == 0:
+                del self._author_names[author_key]
+                for start in word_starts(author_key):
+                    self._delete(self._authors, (start, author_key))
+
+    @staticmethod
+    def _delete(entries, item):
+        i = bisect_left(entries, item)
+        if i < len(entries) and entries[i] == item:
+            del entries[i]
+
+    def add(self, isbn, name, author):
+        """Add or replace one book."""
+        with self._lock:
+            if self._reloading:
+                self._pending.append(('add', isbn, name, author))
+            self._add(isbn, name, author)
+
+    def remove(self, isbn):
+        """Drop one book."""
+        with self._lock:
+            if self._reloading:
+                self._pending.append(('remove', isbn))
+            self._remove(isbn)
+
+    # Loading
+
+    def load(self):
+        """(Re)build the index from the Book table."""
+        with self._load_lock:
+            with self._lock:
+                self._reloading = True
+                self._pending = []
+
+            fresh = SuggestIndex()
+            try:
+                rows = Book.objects.values_list('ISBN', 'name', 'author').iterator(chunk_size=LOAD_CHUNK_SIZE)
+                for isbn, name, author in rows:
+                    title_key, author_key = normalize(name), normalize(author)
+                    fresh._books[isbn] = (name, title_key, author_key)
+                    if title_key:
+                        fresh._titles.append((title_key, isbn))
+                    if author_key:
+                        if author_key in fresh._author_names:
+                            fresh._author_names[author_key][1] += 1
+                        else:
+                            fresh._author_names[author_key] = [author, 1]
+                            fresh._authors.extend((start, author_key) for start in word_starts(author_key))
+                fresh._titles.sort()
+                fresh._authors.sort()
+            except Exception:
+                with self._lock:
+                    self._reloading = False
+                raise
+
+            with self._lock:
+                self._titles, self._books = fresh._titles, fresh._books
+                self._authors, self._author_names = fresh._authors, fresh._author_names
+                # Replay changes made while the snapshot was being read
+                for change in self._pending:
+                    if change[0] == 'add':
+                        self._add(*change[1:])
+                    else:
+                        self._remove(*change[1:])
+                self._pending = []
+                self._reloading = False
+                self.loaded_at = time.monotonic()
+
+        logger.info("Suggest index loaded: %d titles, %d authors", len(self._titles), len(self._author_names))
+
+    def _reload_in_background(self):
+        try:
+            self.load()
+        except Exception:
+            logger.exception("Suggest index reload failed")
+        finally:
+            connection.close()
+
+    def ensure_fresh(self):
+        """Load on first use; afterwards reload in the background once stale."""
+        if self.loaded_at is None:
+            with self._init_lock:
+                if self.loaded_at is None:
+                    self.load()
+            return
+
+        refresh = settings.BOOK_SUGGEST_REFRESH
+        if refresh and time.monotonic() - self.loaded_at > refresh and not self._load_lock.locked():
+            # Serve the current arrays while the new ones are built
+            self.loaded_at = time.monotonic()
+            threading.Thread(target=self._reload_in_background, daemon=True).start()
+
+    # Lookups
+
+    def suggest(self, prefix, limit):
+        """
+        Completions for ``prefix``: up to ``limit`` titles in alphabetical
+        order and up to ``limit`` authors, most books first.
+        Returns (titles, authors) as lists of dicts.
+        """
+        key = normalize(prefix)
+        if not key:
+            return [], []
+        self.ensure_fresh()
+
+        with self._lock:
+            titles = []
+            i = bisect_left(self._titles, (key,))
+            while i < len(self._titles) and len(titles) < limit and self._titles[i][0].startswith(key):
+                isbn = self._titles[i][1]
+                titles.append({'isbn': isbn, 'name': self._books[isbn][0]})
+                i += 1
+
+            author_keys = {}
+            i = bisect_left(self._authors, (key,))
+            end = min(i + AUTHOR_SCAN_LIMIT, len(self._authors))
+            while i < end and self._authors[i][0].startswith(key):
+                author_keys[self._authors[i][1]] = True
+                i += 1
+            authors = sorted(
+                ({'name': self._author_names[k][0], 'books': self._author_names[k][1]} for k in author_keys),
+                key=lambda author: (-author['books'], author['name'])
+            )[:limit]
+
+        return titles, authors
+
+
+suggest_index = SuggestIndex()
+
+
+def track_book_added(book):
+    """Add ``book`` to this process's suggest index once the transaction commits."""
+    transaction.on_commit(lambda: suggest_index.add(book.ISBN, book.name, book.author))
+
+
+def track_book_deleted(isbn):
+    """Drop ``isbn`` from this process's suggest index once the transaction commits."""
+    transaction.on_commit(lambda: suggest_index.remove(isbn))
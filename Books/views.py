@@ -1,66 +1,83 @@
 from django.shortcuts import render
 from django.http import JsonResponse
-from django.db.models import Q
+from django.db import IntegrityError, transaction
+from django.db.models import Max
+from django.db.models.functions import Substr
 from .models import Book
+from .pagination import DEFAULT_SORT, RELEVANCE, SORT_FIELDS, PaginationError, paginate_books, paginate_ranked
+from .search import get_search_backend
+from .fuzzy import fuzzy_search, index_book, unindex_book
+from .cache import bump_catalog_version, cache_catalog_response, cache_stats
+from .facets import FilterError, apply_filters, facet_counts, has_filters, wants_facets
+from .ingest import RowError, insert_new_books, upsert_books, validate_record
+from .suggest import suggest_index, track_book_added, track_book_deleted
 from Barrow.models import Borrow
-from datetime import date
-import logging
+from library_management.fields import FieldsError, lookups_for, requested_fields
+from library_management.querybudget import query_budget
+from library_management.listing import wants_total
+from library_management.tracing import span
+import codecs
+import csv
 import json
 
 # Create your views here.
 
-logger = logging.getLogger(__name__)
-
-def update_late_borrows():
-    """Check and update overdue borrows to late status and create/update fines."""
-    from fine.models import Fine
-    from user.models import Staff
-    today = date.today()
-    
-    # Get ALL overdue borrows (both active and already late status)
-    late_borrows = Borrow.objects.filter(
-        status__in=['active', 'late'],
-        last_date__lt=today
-    ).select_related('book', 'student')
-    
-    for borrow in late_borrows:
-        # Update status to late if it's still active
-        if borrow.status == 'active':
-            borrow.status = 'late'
-            borrow.save()
-        
-        # Update book status to late if not already
-        if borrow.book.status != 'late':
-            borrow.book.status = 'late'
-            borrow.book.save()
-        
-        # Calculate current fine amount
-        days_late = (today - borrow.last_date).days
-        fine_amount = days_late * 5.0  # 5 TL per day
-        
-        # Find existing unpaid fine for this borrow
-        existing_fine = Fine.objects.filter(Borrow_ID=borrow, Status='unpaid').first()
-        
-        if existing_fine:
-            # Update existing fine amount and date
-            existing_fine.Amount = fine_amount
-            existing_fine.Date = today
-            existing_fine.save()
+# fields= keys of book list results -> the Book column each one needs;
+# summary and the availability keys are computed
+BOOK_FIELDS = {
+    'isbn': 'ISBN',
+    'name': 'name',
+    'author': 'author',
+    'publisher': 'publisher',
+    'type': 'type',
+    'year': 'year',
+    'explanation': 'explanation',
+    'summary': None,
+    'image': 'image',
+    'status': 'status',
+    'available': None,
+    'expected_return_date': None,
+}
+# Lists carry a short summary; the full explanation only when asked for
+DEFAULT_BOOK_FIELDS = [field for field in BOOK_FIELDS if field != 'explanation']
+SUMMARY_LENGTH = 200
+
+
+def book_columns(queryset, fields, sort=None):
+    """
+    Load only the Book columns ``fields`` need, plus the ``sort`` key.
+    The summary is cut from the explanation by the database.
+    """
+    columns = {'ISBN'} | set(lookups_for(fields, BOOK_FIELDS))
+    if sort in SORT_FIELDS:
+        columns.add(SORT_FIELDS[sort])
+    queryset = queryset.only(*columns)
+    if 'summary' in fields:
+        queryset = queryset.annotate(summary=Substr('explanation', 1, SUMMARY_LENGTH))
+    return queryset
+
+
+def serialize_book(book, fields, availability=None):
+    """Result dict with the requested ``fields`` of ``book``."""
+    result = {}
+    for field in fields:
+        if field == 'year':
+            value = book.year.strftime('%Y') if book.year else None
+        elif field == 'summary':
+            summary = getattr(book, 'summary', None)
+            value = summary if summary is not None else book.explanation[:SUMMARY_LENGTH]
+        elif field in ('available', 'expected_return_date'):
+            value = availability[book.ISBN][field]
         else:
-            # Create new fine if it doesn't exist
-            try:
-                staff = Staff.objects.first()
-                if staff and borrow.student:
-                    Fine.objects.create(
-                        Staff_ID=staff,
-                        Student_ID=borrow.student,
-                        Borrow_ID=borrow,
-                        Date=today,
-                        Status='unpaid',
-                        Amount=fine_amount
-                    )
-            except Exception:
-                pass  # If no staff exists, skip fine creation
+            value = getattr(book, BOOK_FIELDS[field])
+        result[field] = value
+    return result
+
+
+def wants_availability(fields):
+    """Availability costs a query; only resolve it when it is returned."""
+    return 'available' in fields or 'expected_return_date' in fields
+
 
 def add_cors_headers(response):
     """Add CORS headers to response"""
@@ -70,126 +87,196 @@ def add_cors_headers(response):
     response['Access-Control-Allow-Credentials'] = 'true'
     return response
 
+@query_budget(12)
 def search_books(request):
     """
     Search books by name, author, type, or publisher.
+    Uses the full-text index, best matches first (sort=relevance),
+    unless another sort is requested. mode=fuzzy tolerates typos in the
+    name and author instead, returning the most similar books.
     Returns book details with availability status.
-    Supports pagination with limit parameter.
+    Supports cursor pagination with limit, cursor and sort parameters;
+    the total count is only computed with include_total=1.
+    Filters: type, publisher, author, year_from, year_to; facets=1 adds
+    facet counts for the matching books. fields= picks the result keys
+    (default: all but the full explanation).
     """
     query = request.GET.get('q', '').strip()
     
-    logger.info(f"[SEARCH] Search request received with query: '{query}'")
-    
     if not query:
-        logger.warning("[SEARCH] Empty query received")
         return JsonResponse({'error': 'Search query is required'}, status=400)
     
     # Get pagination parameters
     try:
         limit = int(request.GET.get('limit', 50))  # Default to 50 results (reduced from 100)
         offset = int(request.GET.get('offset', 0))
-        logger.info(f"[SEARCH] Pagination: limit={limit}, offset={offset}")
     except ValueError:
         limit = 50
         offset = 0
     
     # Limit maximum results to prevent large responses
-    limit = min(limit, 50)  # Cap at 50 instead of 200
+    limit = max(1, min(limit, 50))  # Cap at 50 instead of 200
+    offset = max(offset, 0)
+    cursor = request.GET.get('cursor')
+    backend = get_search_backend()
+    sort = request.GET.get('sort', RELEVANCE if backend.ranked else DEFAULT_SORT)
+    mode = request.GET.get('mode', 'exact')
+    
+    if mode not in ('exact', 'fuzzy'):
+        response = JsonResponse({'error': 'Invalid mode. Use exact or fuzzy.'}, status=400)
+        return add_cors_headers(response)
     
-    logger.info(f"[SEARCH] Querying database for books matching: '{query}'")
+    try:
+        filtered = apply_filters(Book.objects.all(), request)
+        fields = requested_fields(request, BOOK_FIELDS, DEFAULT_BOOK_FIELDS)
+    except (FilterError, FieldsError) as e:
+        response = JsonResponse({'error': str(e)}, status=400)
+        return add_cors_headers(response)
+    within = filtered if has_filters(request) else None
     
     # Search across multiple fields
-    all_books = Book.objects.filter(
-        Q(name__icontains=query) |
-        Q(author__icontains=query) |
-        Q(type__icontains=query) |
-        Q(publisher__icontains=query)
-    )
+    all_books = backend.filter(filtered, query)
+    scores = {}
+    
+    try:
+        if mode == 'fuzzy':
+            # Top matches by similarity, a single page
+            matches = fuzzy_search(query, limit, queryset=within)
+            books = [book for book, _ in matches]
+            scores = {book.ISBN: score for book, score in matches}
+            next_cursor = None
+        elif sort == RELEVANCE and backend.ranked:
+            books, next_cursor = paginate_ranked(
+                lambda count, start, after: backend.rank(query, count, start, after=after, within=within),
+                limit, cursor=cursor, offset=offset,
+                queryset=book_columns(Book.objects.all(), fields)
+            )
+        else:
+            books, next_cursor = paginate_books(
+                book_columns(all_books, fields, sort), sort, limit, cursor=cursor, offset=offset
+            )
+    except PaginationError as e:
+        response = JsonResponse({'error': str(e)}, status=400)
+        return add_cors_headers(response)
     
-    total_count = all_books.count()
-    logger.info(f"[SEARCH] Found {total_count} total matching books")
+    total_count = None
+    if mode == 'fuzzy':
+        total_count = len(books)
+    elif wants_total(request):
+        total_count = all_books.count()
     
-    books = all_books[offset:offset + limit]
-    logger.info(f"[SEARCH] Returning {len(books)} books (from offset {offset})")
+    facets = None
+    if wants_facets(request):
+        # Fuzzy results are a single page: facet what was returned
+        facets = facet_counts(
+            Book.objects.filter(ISBN__in=[book.ISBN for book in books]) if mode == 'fuzzy' else all_books
+        )
     
     results = []
-    logger.info(f"[SEARCH] Processing {len(books)} books to get availability info")
-    
-    for i, book in enumerate(books):
-        if i % 20 == 0:  # Log every 20th book
-            logger.info(f"[SEARCH] Processing book {i+1}/{len(books)}")
+    with span('serialize', books=len(books)):
+        # Resolve availability for the whole page in one query
+        availability = get_books_availability(books) if wants_availability(fields) else None
         
-        # Check availability
-        availability_info = get_book_availability(book.ISBN)
-        
-        results.append({
-            'isbn': book.ISBN,
-            'name': book.name[:100] if book.name else '',  # Truncate long names
-            'author': book.author[:50] if book.author else '',  # Truncate long author names
-            'publisher': book.publisher[:50] if book.publisher else '',
-            'type': book.type[:30] if book.type else '',
-            'year': book.year.strftime('%Y') if book.year else None,
-            'explanation': book.explanation[:200] if book.explanation else '',  # Truncate explanation
-            'image': book.image[:100] if book.image else '',
-            'status': book.status,
-            'available': availability_info['available'],
-            'expected_return_date': availability_info['expected_return_date']
-        })
-    
-    logger.info(f"[SEARCH] Completed processing all books. Returning {len(results)} results")
+        for book in books:
+            result = serialize_book(book, fields, availability)
+            if mode == 'fuzzy':
+                result['score'] = scores[book.ISBN]
+            results.append(result)
     
     response_data = {
         'results': results, 
         'count': len(results),
         'total': total_count,
         'offset': offset,
-        'has_more': (offset + limit) < total_count
+        'has_more': next_cursor is not None,
+        'next_cursor': next_cursor,
+        'mode': mode,
+        'facets': facets
     }
     
-    logger.info(f"[SEARCH] Response data size: {len(str(response_data))} characters")
+    with span('json'):
+        response = JsonResponse(response_data)
+    return add_cors_headers(response)
+
+
+@query_budget(3)
+def suggest_books(request):
+    """
+    Autocomplete for the search box: title and author completions for the
+    prefix in q, served from memory without a database query.
+    """
+    query = request.GET.get('q', '').strip()
+    try:
+        limit = int(request.GET.get('limit', 10))
+    except ValueError:
+        limit = 10
+    limit = max(1, min(limit, 20))
+    
+    titles, authors = suggest_index.suggest(query, limit)
     
-    response = JsonResponse(response_data)
+    response = JsonResponse({
+        'query': query,
+        'titles': titles,
+        'authors': authors
+    })
     return add_cors_headers(response)
 
 
+def get_books_availability(books):
+    """
+    Get availability status and expected return date for a page of books.
+    Resolves every book with a single grouped query over open borrows.
+    Returns a dict keyed by ISBN.
+    """
+    isbns = [book.ISBN for book in books]
+    
+    due_dates = {}
+    if isbns:
+        # Latest due date of the active or late borrows, per book
+        due_dates = dict(
+            Borrow.objects.filter(
+                book_id__in=isbns,
+                status__in=['active', 'late']
+            ).values('book_id').annotate(
+                due_date=Max('last_date')
+            ).values_list('book_id', 'due_date')
+        )
+    
+    availability = {}
+    for isbn in isbns:
+        due_date = due_dates.get(isbn)
+        availability[isbn] = {
+            'available': due_date is None,
+            'expected_return_date': due_date.strftime('%Y-%m-%d') if due_date else None
+        }
+    return availability
+
+
 def get_book_availability(isbn):
     """
     Get book availability status and expected return date if borrowed.
     """
     try:
-        book = Book.objects.get(ISBN=isbn)
-        
-        # Check if there's an active or late borrow
-        active_borrow = Borrow.objects.filter(
-            book=book,
-            status__in=['active', 'late']
-        ).order_by('-last_date').first()
-        
-        if active_borrow:
-            return {
-                'available': False,
-                'expected_return_date': active_borrow.last_date.strftime('%Y-%m-%d')
-            }
-        else:
-            return {
-                'available': True,
-                'expected_return_date': None
-            }
+        book = Book.objects.only('ISBN').get(ISBN=isbn)
     except Book.DoesNotExist:
         return {
             'available': False,
             'expected_return_date': None
         }
+    return get_books_availability([book])[book.ISBN]
 
 
+@query_budget(10)
+@cache_catalog_response
 def book_list(request):
     """
     Get all books with their availability status.
-    Supports pagination with limit parameter.
+    Supports cursor pagination with limit, cursor and sort parameters;
+    the total count is only computed with include_total=1.
+    Filters: type, publisher, author, year_from, year_to; facets=1 adds
+    facet counts for the filtered catalog. fields= picks the result keys
+    (default: all but the full explanation).
     """
-    # Update late borrows when listing books
-    update_late_borrows()
-    
     # Get pagination parameters
     try:
         limit = int(request.GET.get('limit', 50))  # Default to 50 books
@@ -199,37 +286,48 @@ def book_list(request):
         offset = 0
     
     # Limit maximum results to prevent large responses
-    limit = min(limit, 100)
+    limit = max(1, min(limit, 100))
+    offset = max(offset, 0)
     
-    # Get books with pagination
-    books = Book.objects.all()[offset:offset + limit]
-    total_count = Book.objects.count()
+    try:
+        all_books = apply_filters(Book.objects.all(), request)
+        fields = requested_fields(request, BOOK_FIELDS, DEFAULT_BOOK_FIELDS)
+    except (FilterError, FieldsError) as e:
+        response = JsonResponse({'error': str(e)}, status=400)
+        return add_cors_headers(response)
     
-    results = []
-    for book in books:
-        availability_info = get_book_availability(book.ISBN)
+    # Get books with keyset pagination
+    sort = request.GET.get('sort', DEFAULT_SORT)
+    try:
+        books, next_cursor = paginate_books(
+            book_columns(all_books, fields, sort),
+            sort,
+            limit,
+            cursor=request.GET.get('cursor'),
+            offset=offset
+        )
+    except PaginationError as e:
+        response = JsonResponse({'error': str(e)}, status=400)
+        return add_cors_headers(response)
+    
+    total_count = all_books.count() if wants_total(request) else None
+    facets = facet_counts(all_books) if wants_facets(request) else None
+    
+    with span('serialize', books=len(books)):
+        availability = get_books_availability(books) if wants_availability(fields) else None
         
-        results.append({
-            'isbn': book.ISBN,
-            'name': book.name,
-            'author': book.author,
-            'publisher': book.publisher,
-            'type': book.type,
-            'year': book.year.strftime('%Y') if book.year else None,
-            'explanation': book.explanation,
-            'image': book.image,
-            'status': book.status,
-            'available': availability_info['available'],
-            'expected_return_date': availability_info['expected_return_date']
-        })
+        results = [serialize_book(book, fields, availability) for book in books]
     
-    response = JsonResponse({
-        'results': results, 
-        'count': len(results),
-        'total': total_count,
-        'offset': offset,
-        'has_more': (offset + limit) < total_count
-    })
+    with span('json'):
+        response = JsonResponse({
+            'results': results, 
+            'count': len(results),
+            'total': total_count,
+            'offset': offset,
+            'has_more': next_cursor is not None,
+            'next_cursor': next_cursor,
+            'facets': facets
+        })
     return add_cors_headers(response)
 
 
@@ -247,6 +345,7 @@ def check_staff_permission(request):
 
 from django.views.decorators.csrf import csrf_exempt
 
+@query_budget(12)
 @csrf_exempt
 def add_book(request):
     """
@@ -286,18 +385,22 @@ def add_book(request):
                     response = JsonResponse({'error': 'Invalid year format. Use YYYY.'}, status=400)
                     return add_cors_headers(response)
             
-            # Create new book
-            book = Book.objects.create(
-                ISBN=data['isbn'],
-                name=data['name'],
-                author=data['author'],
-                publisher=data['publisher'],
-                type=data['type'],
-                year=year_obj,
-                explanation=data.get('explanation', ''),
-                image=data.get('image', ''),
-                status='available'
-            )
+            # Create new book and add it to the fuzzy search and suggest indexes
+            with transaction.atomic():
+                book = Book.objects.create(
+                    ISBN=data['isbn'],
+                    name=data['name'],
+                    author=data['author'],
+                    publisher=data['publisher'],
+                    type=data['type'],
+                    year=year_obj,
+                    explanation=data.get('explanation', ''),
+                    image=data.get('image', ''),
+                    status='available'
+                )
+                index_book(book)
+                track_book_added(book)
+                bump_catalog_version()
             
             response = JsonResponse({
                 'success': True,
@@ -327,6 +430,7 @@ def add_book(request):
     return add_cors_headers(response)
 
 
+@query_budget(12)
 @csrf_exempt
 def delete_book(request, isbn):
     """
@@ -357,7 +461,11 @@ def delete_book(request, isbn):
                 }, status=400)
                 return add_cors_headers(response)
             
-            book.delete()
+            with transaction.atomic():
+                unindex_book(book.ISBN)
+                track_book_deleted(book.ISBN)
+                book.delete()
+                bump_catalog_version()
             
             response = JsonResponse({
                 'success': True,
@@ -376,6 +484,156 @@ def delete_book(request, isbn):
     return add_cors_headers(response)
 
 
+# Bulk ingestion: books written per transaction, errors listed in the report
+BULK_BATCH_SIZE = 500
+BULK_MAX_ERRORS = 1000
+
+
+def read_bulk_records(request):
+    """
+    Stream the records of a bulk upload as (row number, record, error).
+    Accepts NDJSON (one JSON object per line) or CSV with a header row, as
+    the request body or as a multipart "file" upload; the format comes from
+    format=, the file extension or the Content-Type.
+    Raises ValueError when the format cannot be determined.
+    """
+    if request.content_type == 'multipart/form-data':
+        upload = request.FILES.get('file')
+        if upload is None:
+            raise ValueError('Upload the data as the "file" field')
+        stream, hint = upload, upload.name.lower()
+    else:
+        stream, hint = request, request.content_type
+
+    data_format = request.GET.get('format')
+    if not data_format:
+        if 'csv' in hint:
+            data_format = 'csv'
+        elif 'json' in hint:
+            data_format = 'ndjson'
+    if data_format not in ('csv', 'ndjson'):
+        raise ValueError('Send NDJSON or CSV (format=ndjson or format=csv)')
+
+    lines = codecs.iterdecode(stream, 'utf-8-sig')
+    if data_format == 'csv':
+        for number, row in enumerate(csv.DictReader(lines), start=1):
+            yield number, row, None
+        return
+
+    for number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            yield number, None, 'Invalid JSON'
+            continue
+        yield number, record, None
+
+
+@csrf_exempt
+def bulk_add_books(request):
+    """
+    Add many books from an NDJSON or CSV upload. Staff only.
+    Records use add_book's keys. Rows are validated as they are read and
+    written in batches; invalid rows are reported and skipped.
+    mode=upsert updates the metadata of existing books instead of
+    reporting them, without touching their status.
+    """
+    if request.method == 'OPTIONS':
+        response = JsonResponse({})
+        return add_cors_headers(response)
+    
+    if not check_staff_permission(request):
+        response = JsonResponse({'error': 'Permission denied. Staff only.'}, status=403)
+        return add_cors_headers(response)
+    
+    if request.method != 'POST':
+        response = JsonResponse({'error': 'POST method required'}, status=405)
+        return add_cors_headers(response)
+    
+    mode = request.GET.get('mode', 'insert')
+    if mode not in ('insert', 'upsert'):
+        response = JsonResponse({'error': 'Invalid mode. Use insert or upsert.'}, status=400)
+        return add_cors_headers(response)
+    
+    report = {'mode': mode, 'rows': 0, 'inserted': 0, 'updated': 0, 'unchanged': 0, 'failed': 0}
+    errors = []
+    seen = {}
+    
+    def fail(number, isbn, message):
+        report['failed'] += 1
+        if len(errors) < BULK_MAX_ERRORS:
+            errors.append({'row': number, 'isbn': isbn, 'error': message})
+    
+    def flush(batch):
+        try:
+            if mode == 'upsert':
+                inserted, updated = upsert_books([fields for fields, _ in batch])
+                report['inserted'] += len(inserted)
+                report['updated'] += len(updated)
+                report['unchanged'] += len(batch) - len(inserted) - len(updated)
+                changed = inserted + updated
+            else:
+                new_rows, existing = insert_new_books([fields for fields, _ in batch])
+                for fields, number in batch:
+                    if fields['ISBN'] in existing:
+                        fail(number, fields['ISBN'], 'Book with this ISBN already exists')
+                report['inserted'] += len(new_rows)
+                changed = [Book(**fields) for fields in new_rows]
+        except IntegrityError:
+            # Kept clashing with concurrent writes: nothing of it was written
+            for fields, number in batch:
+                fail(number, fields['ISBN'], 'Conflicting concurrent change, send the row again')
+            return
+        for book in changed:
+            track_book_added(book)
+    
+    try:
+        batch = []
+        for number, record, error in read_bulk_records(request):
+            report['rows'] += 1
+            if error:
+                fail(number, None, error)
+                continue
+            try:
+                fields = validate_record(record)
+            except RowError as e:
+                isbn = record.get('isbn') if isinstance(record, dict) else None
+                fail(number, isbn, str(e))
+                continue
+            
+            if fields['ISBN'] in seen:
+                fail(number, fields['ISBN'], f'Duplicate ISBN, also in row {seen[fields["ISBN"]]}')
+                continue
+            seen[fields['ISBN']] = number
+            
+            batch.append((fields, number))
+            if len(batch) >= BULK_BATCH_SIZE:
+                flush(batch)
+                batch = []
+        if batch:
+            flush(batch)
+    except (ValueError, UnicodeDecodeError) as e:
+        # Unreadable upload; batches already written stay written
+        report['error'] = str(e)
+        report['errors'] = errors
+        response = JsonResponse(report, status=400)
+        return add_cors_headers(response)
+    except Exception as e:
+        response = JsonResponse({'error': str(e)}, status=500)
+        return add_cors_headers(response)
+    
+    report['success'] = report['failed'] == 0
+    # Existing ISBNs are only found when their batch is written
+    report['errors'] = sorted(errors, key=lambda error: error['row'])
+    report['errors_truncated'] = report['failed'] > len(errors)
+    response = JsonResponse(report)
+    return add_cors_headers(response)
+
+
+@query_budget(5)
+@cache_catalog_response
 def get_book_detail(request, isbn):
     """
     Get detailed information about a specific book including full explanation and image.
@@ -383,24 +641,26 @@ def get_book_detail(request, isbn):
     try:
         book = Book.objects.get(ISBN=isbn)
         
-        # Get availability information
-        availability_info = get_book_availability(book.ISBN)
-        
-        book_data = {
-            'isbn': book.ISBN,
-            'name': book.name,
-            'author': book.author,
-            'publisher': book.publisher,
-            'type': book.type,
-            'year': book.year.strftime('%Y') if book.year else None,
-            'explanation': book.explanation,  # Full explanation
-            'image': book.image,
-            'status': book.status,
-            'available': availability_info['available'],
-            'expected_return_date': availability_info['expected_return_date']
-        }
+        with span('serialize', books=1):
+            # Get availability information
+            availability_info = get_books_availability([book])[book.ISBN]
+            
+            book_data = {
+                'isbn': book.ISBN,
+                'name': book.name,
+                'author': book.author,
+                'publisher': book.publisher,
+                'type': book.type,
+                'year': book.year.strftime('%Y') if book.year else None,
+                'explanation': book.explanation,  # Full explanation
+                'image': book.image,
+                'status': book.status,
+                'available': availability_info['available'],
+                'expected_return_date': availability_info['expected_return_date']
+            }
         
-        response = JsonResponse(book_data)
+        with span('json'):
+            response = JsonResponse(book_data)
         return add_cors_headers(response)
         
     except Book.DoesNotExist:
@@ -409,3 +669,16 @@ def get_book_detail(request, isbn):
     except Exception as e:
         response = JsonResponse({'error': str(e)}, status=500)
         return add_cors_headers(response)
+
+
+@query_budget(2)
+def catalog_cache_stats(request):
+    """
+    Hit/miss counters of the catalog response cache in this process. Staff only.
+    """
+    if not check_staff_permission(request):
+        response = JsonResponse({'error': 'Permission denied. Staff only.'}, status=403)
+        return add_cors_headers(response)
+    
+    response = JsonResponse(cache_stats())
+    return add_cors_headers(response)
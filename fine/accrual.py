@@ -0,0 +1,161 @@
+"""
+Set-based fine accrual engine.
+
+Moves overdue borrows to late status, marks their books late and upserts
+the unpaid fine of every overdue borrow with a handful of bulk statements
+in one transaction, instead of several round-trips per overdue row.
+
+Given the date of the previous run (the sweep watermark) it works
+incrementally: only borrows that fell due since then are scanned, and fines
+already accrued up to the watermark are advanced with one arithmetic UPDATE.
+A full run recomputes every unpaid fine from its borrow's due date, also in
+one UPDATE. Either way the statement count does not grow with the backlog,
+and only the students whose fines changed get their counters rebuilt.
+"""
+import logging
+import time
+from datetime import date
+
+from django.db import transaction
+from django.db.models import F, FloatField, Func, OuterRef, Q, Subquery, Value
+
+from Barrow.models import Borrow
+from Books.models import Book
+from user.models import Staff
+from user.stats import reconcile, touch_history
+from .models import Fine
+
+logger = logging.getLogger(__name__)
+
+FINE_PER_DAY = 5.0  # 5 TL per day
+INSERT_BATCH_SIZE = 1000
+
+
+def fine_amount(last_date, today):
+    """Fine owed for a borrow due on ``last_date`` as of ``today``."""
+    return (today - last_date).days * FINE_PER_DAY
+
+
+class DaysBetween(Func):
+    """Whole days from the date expression ``start`` to ``end``."""
+    output_field = FloatField()
+
+    def __init__(self, end, start, **extra):
+        super().__init__(end, start, **extra)
+
+    def as_sql(self, compiler, connection, **extra_context):
+        # PostgreSQL: date - date is a number of days
+        return super().as_sql(compiler, connection, template='(%(expressions)s)', arg_joiner=' - ', **extra_context)
+
+    def as_mysql(self, compiler, connection, **extra_context):
+        return super().as_sql(compiler, connection, function='DATEDIFF', **extra_context)
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return super().as_sql(
+            compiler, connection,
+            template='CAST(julianday(%(expressions)s) AS INTEGER)', arg_joiner=') - julianday(',
+            **extra_context
+        )
+
+
+def owed(today):
+    """Expression for fine_amount() of a Fine row's borrow as of ``today``."""
+    due = Subquery(Borrow.objects.filter(Borrow_ID=OuterRef('Borrow_ID')).values('last_date')[:1])
+    return DaysBetween(Value(today), due) * FINE_PER_DAY
+
+
+def accrue_fines(today=None, since=None):
+    """
+    Bring every overdue borrow, its book and its fine up to date.
+    With ``since`` only borrows due on or after that date are scanned;
+    without it the whole overdue backlog is rescanned.
+    Returns a report dict with the number of rows touched per table
+    and the time the run took in seconds.
+    """
+    today = today or date.today()
+    started = time.monotonic()
+
+    overdue = Borrow.objects.filter(status='late', last_date__lt=today)
+    newly_due = Borrow.objects.filter(last_date__lt=today)
+    if since is not None:
+        newly_due = newly_due.filter(last_date__gte=since)
+
+    with transaction.atomic():
+        # 1. Overdue active borrows become late
+        marked_students = set(
+            newly_due.filter(status='active').values_list('student_id', flat=True).distinct()
+        )
+        borrows_marked_late = newly_due.filter(status='active').update(status='late')
+
+        new_overdue = newly_due.filter(status='late')
+
+        # 2. Books of overdue borrows become late
+        books_marked_late = Book.objects.filter(
+            ISBN__in=new_overdue.values('book_id')
+        ).exclude(status='late').update(status='late')
+
+        unpaid = Fine.objects.filter(Status='unpaid', Borrow_ID__in=overdue.values('Borrow_ID'))
+        if since is None:
+            # 3. Recompute unpaid fines from their due dates; rows already
+            #    up to date are left alone
+            stale = unpaid.exclude(Q(Date=today) & Q(Amount=owed(today)))
+            fined_students = set(stale.values_list('Student_ID', flat=True).distinct())
+            fines_updated = stale.update(Amount=owed(today), Date=today)
+        elif today > since:
+            # 3. Fines accrued up to the watermark owe the same extra days;
+            #    matching on their Date keeps a rerun from counting twice
+            stale = unpaid.filter(Date=since)
+            fined_students = set(stale.values_list('Student_ID', flat=True).distinct())
+            fines_updated = stale.update(
+                Amount=F('Amount') + (today - since).days * FINE_PER_DAY,
+                Date=today
+            )
+        else:
+            fined_students = set()
+            fines_updated = 0
+
+        # 4. Insert fines for overdue borrows that have none yet
+        fines_created = 0
+        staff = Staff.objects.first()
+        if staff:
+            # Materialized before inserting, so the scan never sees its own writes
+            missing = list(new_overdue.filter(
+                fine__isnull=True,
+                student__isnull=False
+            ).values_list('Borrow_ID', 'student_id', 'last_date'))
+
+            for start in range(0, len(missing), INSERT_BATCH_SIZE):
+                batch = [
+                    Fine(
+                        Staff_ID=staff,
+                        Student_ID_id=student_id,
+                        Borrow_ID_id=borrow_id,
+                        Date=today,
+                        Status='unpaid',
+                        Amount=fine_amount(last_date, today)
+                    )
+                    for borrow_id, student_id, last_date in missing[start:start + INSERT_BATCH_SIZE]
+                ]
+                Fine.objects.bulk_create(batch)
+                fines_created += len(batch)
+            fined_students.update(student_id for _, student_id, _ in missing)
+
+        # 5. Unpaid fine totals of the students whose fines were created or
+        #    changed, and history stamps of those and the newly late ones
+        fined_students.discard(None)
+        marked_students.discard(None)
+        if fined_students:
+            reconcile(fined_students)
+        if fined_students | marked_students:
+            touch_history(fined_students | marked_students)
+
+    report = {
+        'mode': 'full' if since is None else 'incremental',
+        'borrows_marked_late': borrows_marked_late,
+        'books_marked_late': books_marked_late,
+        'fines_updated': fines_updated,
+        'fines_created': fines_created,
+        'duration': round(time.monotonic() - started, 3),
+    }
+    logger.info("Fine accrual finished: %s", report)
+    return report
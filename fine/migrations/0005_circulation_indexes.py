@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("fine", "0004_alter_fine_borrow_id"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="fine",
+            index=models.Index(fields=["Student_ID", "Status"], name="fine_student_status_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="fine",
+            index=models.Index(fields=["Status", "Date"], name="fine_status_date_idx"),
+        ),
+    ]
@@ -21,3 +21,11 @@ class Fine(models.Model):
     Payment_Date = models.DateField(null=True, blank=True)
 
     Amount = models.FloatField()
+
+    class Meta:
+        indexes = [
+            # A student's unpaid fines (counters, student filter)
+            models.Index(fields=['Student_ID', 'Status'], name='fine_student_status_idx'),
+            # Fine list by status with a date range or date order
+            models.Index(fields=['Status', 'Date'], name='fine_status_date_idx'),
+        ]
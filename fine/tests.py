@@ -1,3 +1,119 @@
+from datetime import date, timedelta
+
 from django.test import TestCase
 
-# Create your tests here.
+from Barrow.models import Borrow
+from Books.models import Book
+from user.models import Staff, Student, StudentStats, User
+from user.stats import reconcile
+from .accrual import FINE_PER_DAY, accrue_fines
+from .models import Fine
+
+TODAY = date(2025, 3, 20)
+
+
+class AccrualTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create(
+            Name='Desk', Email='desk@example.com', Phone='5000000000', Username='desk',
+            Password='x', Type='staff'
+        )
+        cls.staff = Staff.objects.create(user=user)
+        user = User.objects.create(
+            Name='Öğrenci', Email='student@example.com', Phone='5100000000', Username='student',
+            Password='x', Type='student'
+        )
+        cls.student = Student.objects.create(user=user)
+        reconcile()
+
+    def borrow(self, i, due, status='active'):
+        book = Book.objects.create(
+            ISBN=f'97800000{i:02d}', name=f'Kitap {i}', explanation='', publisher='Yapı Kredi',
+            author='Orhan Pamuk', type='Roman', image='', status='borrowed'
+        )
+        return Borrow.objects.create(
+            staff=self.staff, student=self.student, book=book, status=status,
+            date=due - timedelta(days=15), last_date=due
+        )
+
+    def fine(self, borrow, amount, fined_on):
+        return Fine.objects.create(
+            Staff_ID=self.staff, Student_ID=self.student, Borrow_ID=borrow,
+            Date=fined_on, Status='unpaid', Amount=amount
+        )
+
+    def unpaid_fines(self):
+        return StudentStats.objects.get(student=self.student).unpaid_fines
+
+    def test_new_overdue_borrow(self):
+        borrow = self.borrow(1, TODAY - timedelta(days=4))
+        on_time = self.borrow(2, TODAY + timedelta(days=1))
+
+        report = accrue_fines(today=TODAY, since=TODAY - timedelta(days=7))
+
+        self.assertEqual((report['borrows_marked_late'], report['fines_created']), (1, 1))
+        self.assertEqual(Borrow.objects.get(pk=borrow.pk).status, 'late')
+        self.assertEqual(Book.objects.get(ISBN=borrow.book_id).status, 'late')
+        self.assertEqual(Borrow.objects.get(pk=on_time.pk).status, 'active')
+        fine = Fine.objects.get()
+        self.assertEqual((fine.Borrow_ID_id, fine.Amount, fine.Date), (borrow.pk, 4 * FINE_PER_DAY, TODAY))
+        self.assertEqual(self.unpaid_fines(), 4 * FINE_PER_DAY)
+
+    def test_incremental_advances_fines_from_watermark(self):
+        since = TODAY - timedelta(days=3)
+        borrow = self.borrow(1, TODAY - timedelta(days=10), status='late')
+        fine = self.fine(borrow, 7 * FINE_PER_DAY, since)
+        # Accrued on another day: not the watermark's, so left alone
+        other = self.fine(self.borrow(2, TODAY - timedelta(days=10), status='late'), 1.0, since - timedelta(days=1))
+        reconcile()
+
+        report = accrue_fines(today=TODAY, since=since)
+
+        self.assertEqual(report['mode'], 'incremental')
+        self.assertEqual(report['fines_updated'], 1)
+        fine.refresh_from_db()
+        self.assertEqual((fine.Amount, fine.Date), (10 * FINE_PER_DAY, TODAY))
+        other.refresh_from_db()
+        self.assertEqual(other.Amount, 1.0)
+        self.assertEqual(self.unpaid_fines(), 10 * FINE_PER_DAY + 1.0)
+
+    def test_second_run_same_day_adds_nothing(self):
+        since = TODAY - timedelta(days=3)
+        borrow = self.borrow(1, TODAY - timedelta(days=10), status='late')
+        self.fine(borrow, 7 * FINE_PER_DAY, since)
+        self.borrow(2, TODAY - timedelta(days=2))
+
+        accrue_fines(today=TODAY, since=since)
+        amounts = sorted(Fine.objects.values_list('Amount', flat=True))
+        # A rerun from the same watermark, and the next sweep on the same day
+        for rerun_since in (since, TODAY):
+            report = accrue_fines(today=TODAY, since=rerun_since)
+            self.assertEqual(
+                (report['borrows_marked_late'], report['fines_updated'], report['fines_created']),
+                (0, 0, 0)
+            )
+
+        self.assertEqual(sorted(Fine.objects.values_list('Amount', flat=True)), amounts)
+        self.assertEqual(self.unpaid_fines(), sum(amounts))
+
+    def test_full_run_recomputes_from_due_dates(self):
+        due_dates = [TODAY - timedelta(days=days) for days in (2, 5, 9)]
+        for i, due in enumerate(due_dates):
+            self.fine(self.borrow(i, due, status='late'), 1.0, TODAY - timedelta(days=20))
+        paid = self.fine(self.borrow(9, TODAY - timedelta(days=6), status='late'), 3.0, TODAY)
+        Fine.objects.filter(pk=paid.pk).update(Status='paid')
+        reconcile()
+
+        report = accrue_fines(today=TODAY)
+        again = accrue_fines(today=TODAY)
+
+        self.assertEqual((report['mode'], report['fines_updated']), ('full', 3))
+        self.assertEqual(again['fines_updated'], 0)
+        self.assertEqual(
+            sorted(Fine.objects.filter(Status='unpaid').values_list('Amount', flat=True)),
+            [2 * FINE_PER_DAY, 5 * FINE_PER_DAY, 9 * FINE_PER_DAY]
+        )
+        self.assertEqual(Fine.objects.get(pk=paid.pk).Amount, 3.0)
+        self.assertEqual(self.unpaid_fines(), 16 * FINE_PER_DAY)
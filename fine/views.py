@@ -1,18 +1,49 @@
 from django.shortcuts import render
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
+from django.db import transaction
 from .models import Fine
+from Barrow.idempotency import idempotent
 from user.models import Student, Staff
+from user.stats import record_payment
+from library_management.fields import FieldsError, lookups_for, requested_fields, serialize_row
+from library_management.querybudget import query_budget
+from library_management.tracing import span
+from library_management.listing import (
+    filter_date_range, ordered, paginate_rows, parse_limit, parse_sort, stream_rows, wants_stream
+)
 from datetime import date
 import json
 
 # Create your views here.
 
+# fields= keys of fine list results -> the lookup each one is read from
+FINE_FIELDS = {
+    'fine_id': 'Fine_ID',
+    'student_id': 'Student_ID__user__User_ID',
+    'student_name': 'Student_ID__user__Name',
+    'staff_name': 'Staff_ID__user__Name',
+    'borrow_id': 'Borrow_ID_id',
+    'book_name': 'Borrow_ID__book__name',
+    'date': 'Date',
+    'amount': 'Amount',
+    'status': 'Status',
+    'payment_date': 'Payment_Date',
+}
+# sort= options of the fine list -> the column ordered on ("-" prefix
+# for descending); Fine_ID breaks ties
+FINE_SORTS = {
+    'fine_id': 'Fine_ID',
+    'date': 'Date',
+    'amount': 'Amount',
+}
+DEFAULT_FINE_SORT = '-fine_id'
+
 def add_cors_headers(response):
     """Add CORS headers to response"""
     response['Access-Control-Allow-Origin'] = 'http://localhost:8080'
     response['Access-Control-Allow-Methods'] = 'GET, POST, PUT, PATCH, DELETE, OPTIONS'
-    response['Access-Control-Allow-Headers'] = 'Content-Type, Authorization'
+    response['Access-Control-Allow-Headers'] = 'Content-Type, Authorization, Idempotency-Key'
     response['Access-Control-Allow-Credentials'] = 'true'
     return response
 
@@ -25,49 +56,79 @@ def check_staff_permission(request):
     return user_type == 'staff'
 
 
+@query_budget(4)
 def get_all_fines(request):
     """
     Get all fines with filtering options. Staff only.
+    Filters: status, student_id, staff_id, isbn and from/to on the fine date.
+    fields= picks the result keys; only their columns are read.
+    Paginated with limit and cursor (newest first by default, see sort=);
+    stream=1 returns every matching record in one streamed response.
     """
     if not check_staff_permission(request):
         response = JsonResponse({'error': 'Permission denied. Staff only.'}, status=403)
         return add_cors_headers(response)
     
+    try:
+        fields = requested_fields(request, FINE_FIELDS, FINE_FIELDS)
+    except FieldsError as e:
+        response = JsonResponse({'error': str(e)}, status=400)
+        return add_cors_headers(response)
+    
     # Get filter parameters
     status_filter = request.GET.get('status', None)
     student_id = request.GET.get('student_id', None)
+    staff_id = request.GET.get('staff_id', None)
+    isbn = request.GET.get('isbn', '').strip()
     
-    fines = Fine.objects.all().select_related('Student_ID__user', 'Staff_ID__user', 'Borrow_ID')
+    fines = Fine.objects.all()
     
     if status_filter:
         fines = fines.filter(Status=status_filter)
     
-    if student_id:
-        fines = fines.filter(Student_ID__user__User_ID=student_id)
+    try:
+        # Student and staff primary keys are their User_IDs, so no join is needed
+        if student_id:
+            fines = fines.filter(Student_ID_id=student_id)
+        
+        if staff_id:
+            fines = fines.filter(Staff_ID_id=staff_id)
+        
+        if isbn:
+            fines = fines.filter(Borrow_ID__book_id=isbn)
+        
+        fines = filter_date_range(fines, request, 'Date')
+        lookup, descending = parse_sort(request, FINE_SORTS, DEFAULT_FINE_SORT)
+        fines = ordered(fines, lookup, descending, cursor=request.GET.get('cursor'))
+    except ValueError as e:
+        response = JsonResponse({'error': str(e)}, status=400)
+        return add_cors_headers(response)
     
-    results = []
-    for fine in fines:
-        results.append({
-            'fine_id': fine.Fine_ID,
-            'student_id': fine.Student_ID.user.User_ID,
-            'student_name': fine.Student_ID.user.Name,
-            'staff_name': fine.Staff_ID.user.Name,
-            'borrow_id': fine.Borrow_ID.Borrow_ID if fine.Borrow_ID else None,
-            'book_name': fine.Borrow_ID.book.name if fine.Borrow_ID else None,
-            'date': fine.Date.strftime('%Y-%m-%d'),
-            'amount': fine.Amount,
-            'status': fine.Status,
-            'payment_date': fine.Payment_Date.strftime('%Y-%m-%d') if fine.Payment_Date else None
-        })
+    # Joined columns come from the same query, without loading whole rows
+    columns = dict.fromkeys([*lookups_for(fields, FINE_FIELDS), 'Fine_ID', lookup])
+    rows = fines.values(*columns)
     
-    response = JsonResponse({
-        'results': results,
-        'count': len(results)
-    })
+    if wants_stream(request):
+        response = stream_rows(rows, lambda row: serialize_row(row, fields, FINE_FIELDS))
+        return add_cors_headers(response)
+    
+    rows, next_cursor = paginate_rows(rows, lookup, parse_limit(request))
+    with span('serialize', fines=len(rows)):
+        results = [serialize_row(row, fields, FINE_FIELDS) for row in rows]
+    
+    with span('json'):
+        response = JsonResponse({
+            'results': results,
+            'count': len(results),
+            'has_more': next_cursor is not None,
+            'next_cursor': next_cursor
+        })
     return add_cors_headers(response)
 
 
+@query_budget(17)
 @csrf_exempt
+@idempotent(add_cors_headers, check_staff_permission)
 def mark_fine_paid(request, fine_id):
     """
     Mark a fine as paid. Staff only.
@@ -82,16 +143,20 @@ def mark_fine_paid(request, fine_id):
     
     if request.method == 'PUT':
         try:
-            fine = Fine.objects.get(Fine_ID=fine_id)
-            
-            if fine.Status == 'paid':
-                response = JsonResponse({'error': 'Fine already marked as paid'}, status=400)
-                return add_cors_headers(response)
-            
-            # Update fine status
-            fine.Status = 'paid'
-            fine.Payment_Date = date.today()
-            fine.save()
+            with transaction.atomic():
+                # Locked, so a concurrent payment or sweep waits for us and
+                # the amount taken off the student is the one being paid
+                fine = Fine.objects.select_for_update().only(
+                    'Fine_ID', 'Student_ID', 'Status', 'Amount'
+                ).get(Fine_ID=fine_id)
+                
+                if fine.Status == 'paid':
+                    response = JsonResponse({'error': 'Fine already marked as paid'}, status=400)
+                    return add_cors_headers(response)
+                
+                # Only the payment columns: Amount stays the sweep's
+                Fine.objects.filter(Fine_ID=fine_id).update(Status='paid', Payment_Date=date.today())
+                record_payment(fine.Student_ID_id, fine.Amount)
             
             response = JsonResponse({
                 'success': True,
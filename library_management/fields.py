@@ -0,0 +1,54 @@
+"""
+Sparse fieldsets for the list endpoints.
+
+Clients pick the keys of each result with fields=a,b,c. Endpoints map every
+key to the columns it needs and load only those (``only()``/``values()``),
+so unrequested columns are neither read, transferred nor serialized.
+"""
+from datetime import date
+
+
+class FieldsError(ValueError):
+    """Raised for a fields= parameter naming unknown fields."""
+
+
+def requested_fields(request, available, default):
+    """
+    Fields asked for in the fields= parameter, in the order given, or
+    ``default`` without one. Every field must be one of ``available``.
+    """
+    raw = request.GET.get('fields', '').strip()
+    if not raw:
+        return list(default)
+
+    fields = []
+    for field in raw.split(','):
+        field = field.strip()
+        if field and field not in fields:
+            fields.append(field)
+
+    unknown = [field for field in fields if field not in available]
+    if unknown:
+        raise FieldsError(
+            f'Unknown fields: {", ".join(unknown)}. Use: {", ".join(available)}'
+        )
+    return fields
+
+
+def lookups_for(fields, lookups):
+    """
+    ORM lookups needed for ``fields`` given a field -> lookup mapping;
+    fields mapped to None are computed by the view and need none.
+    """
+    return [lookups[field] for field in fields if lookups.get(field)]
+
+
+def serialize_row(row, fields, lookups):
+    """Result dict for a ``values()`` row, dates as YYYY-MM-DD."""
+    result = {}
+    for field in fields:
+        value = row[lookups[field]]
+        if isinstance(value, date):
+            value = value.strftime('%Y-%m-%d')
+        result[field] = value
+    return result
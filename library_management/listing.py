@@ -0,0 +1,185 @@
+"""
+Cursor pagination, date-range filters and streaming for the staff record
+listings.
+
+Lists are ordered by one of the endpoint's sort fields with the primary key
+breaking ties ("-" prefix for descending). A page resumes after the last
+row of the previous one through an opaque cursor, so deep pages cost the
+same as the first. With stream=1 the whole list is instead written out as
+one JSON document while the rows are read in chunks, so memory use does not
+grow with the number of records.
+"""
+import base64
+import json
+from datetime import date
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.http import StreamingHttpResponse
+
+STREAM_CHUNK_SIZE = 2000
+
+
+class ListingError(ValueError):
+    """Raised for an unknown sort, a bad date range or an unusable cursor."""
+
+
+class CursorError(ValueError):
+    """Raised by unpack_cursor for a cursor that cannot be used."""
+
+
+def parse_sort(request, sorts, default):
+    """
+    (lookup, descending) for the sort= parameter; ``sorts`` maps the
+    accepted names to lookups.
+    """
+    sort = request.GET.get('sort', default)
+    name = sort.lstrip('-')
+    if name not in sorts:
+        raise ListingError(f'Invalid sort. Use one of: {", ".join(sorts)} (prefix - for descending)')
+    return sorts[name], sort.startswith('-')
+
+
+def parse_limit(request, default=100, maximum=1000):
+    """Page size from the limit= parameter, clamped to 1..``maximum``."""
+    try:
+        limit = int(request.GET.get('limit', default))
+    except ValueError:
+        limit = default
+    return max(1, min(limit, maximum))
+
+
+def date_range(request):
+    """
+    Dates of the from= and to= parameters (YYYY-MM-DD, both inclusive),
+    None for a missing one.
+    """
+    bounds = []
+    for param in ('from', 'to'):
+        value = request.GET.get(param, '').strip()
+        if not value:
+            bounds.append(None)
+            continue
+        try:
+            bounds.append(date.fromisoformat(value))
+        except ValueError:
+            raise ListingError(f'Invalid {param} date. Use YYYY-MM-DD.')
+    if bounds[0] and bounds[1] and bounds[0] > bounds[1]:
+        raise ListingError('from must not be after to')
+    return tuple(bounds)
+
+
+def filter_date_range(queryset, request, lookup):
+    """``queryset`` limited to the from=/to= range on the ``lookup`` date."""
+    start, end = date_range(request)
+    if start:
+        queryset = queryset.filter(**{f'{lookup}__gte': start})
+    if end:
+        queryset = queryset.filter(**{f'{lookup}__lte': end})
+    return queryset
+
+
+def wants_total(request):
+    """Whether the client asked for the exact total count (include_total=1)."""
+    return request.GET.get('include_total', '').lower() in {'1', 'true', 'yes'}
+
+
+def wants_stream(request):
+    """Whether the client asked for the whole list streamed (stream=1)."""
+    return request.GET.get('stream', '').lower() in {'1', 'true', 'yes'}
+
+
+def pack_cursor(key, value, pk):
+    """
+    Opaque cursor resuming after the row with sort ``value`` and ``pk``;
+    ``key`` names the sort, so a cursor is only used with its own order.
+    """
+    payload = json.dumps([key, value, pk], cls=DjangoJSONEncoder, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def unpack_cursor(key, cursor):
+    """The raw (value, pk) pair stored in ``cursor`` by pack_cursor."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        cursor_key, value, pk = json.loads(base64.urlsafe_b64decode(padded))
+    except (ValueError, TypeError):
+        raise CursorError('Invalid cursor')
+    if cursor_key != key:
+        raise CursorError('Cursor does not match sort order')
+    return value, pk
+
+
+def decode_cursor(queryset, lookup, cursor):
+    """The (value, pk) pair stored in ``cursor``, converted to the field types."""
+    try:
+        value, pk = unpack_cursor(lookup, cursor)
+    except CursorError as e:
+        raise ListingError(str(e))
+
+    opts = queryset.model._meta
+    try:
+        value = opts.get_field(lookup).to_python(value)
+        pk = opts.pk.to_python(pk)
+    except Exception:
+        raise ListingError('Invalid cursor')
+    return value, pk
+
+
+def ordered(queryset, lookup, descending, cursor=None):
+    """
+    ``queryset`` in (lookup, pk) order, starting after ``cursor`` if given.
+    Sort lookups must be non-null columns of the model.
+    """
+    pk = queryset.model._meta.pk.name
+    prefix = '-' if descending else ''
+    ordering = [prefix + pk] if lookup == pk else [prefix + lookup, prefix + pk]
+    queryset = queryset.order_by(*ordering)
+
+    if cursor:
+        value, last_pk = decode_cursor(queryset, lookup, cursor)
+        op = 'lt' if descending else 'gt'
+        if lookup == pk:
+            queryset = queryset.filter(**{f'{pk}__{op}': last_pk})
+        else:
+            queryset = queryset.filter(
+                Q(**{f'{lookup}__{op}': value}) | Q(**{lookup: value, f'{pk}__{op}': last_pk})
+            )
+    return queryset
+
+
+def paginate_rows(queryset, lookup, limit):
+    """
+    One page of ``queryset`` (``values()`` rows from ``ordered``, including
+    ``lookup`` and the pk). Returns (rows, next_cursor); next_cursor is None
+    on the last page.
+    """
+    pk = queryset.model._meta.pk.name
+    # Fetch one extra row to know whether another page exists
+    rows = list(queryset[:limit + 1])
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = pack_cursor(lookup, rows[-1][lookup], rows[-1][pk])
+    return rows, next_cursor
+
+
+def stream_rows(rows, serialize):
+    """
+    StreamingHttpResponse with {"results": [...], "count": n} for ``rows``,
+    serialized one by one and written out in chunks as they are read.
+    """
+    def generate():
+        encoder = DjangoJSONEncoder()
+        count = 0
+        chunk = ['{"results": [']
+        for row in rows.iterator(chunk_size=STREAM_CHUNK_SIZE):
+            chunk.append((', ' if count else '') + encoder.encode(serialize(row)))
+            count += 1
+            if len(chunk) >= STREAM_CHUNK_SIZE:
+                yield ''.join(chunk)
+                chunk = []
+        chunk.append(f'], "count": {count}}}')
+        yield ''.join(chunk)
+
+    return StreamingHttpResponse(generate(), content_type='application/json')
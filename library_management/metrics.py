@@ -0,0 +1,402 @@
+"""
+Per-view request metrics, exposed in the Prometheus text format.
+
+MetricsMiddleware records, for every request, the route it resolved to, its
+method and status, its latency, the number and total time of its SQL queries
+and the size of its response. Each thread aggregates into its own shard, so
+recording a request takes no lock; the shards of a process are merged when
+it publishes its numbers.
+
+Every worker process writes its merged numbers to its own file in
+METRICS_DIR, named after its pid and a random id, at most every
+METRICS_FLUSH_INTERVAL seconds. /api/metrics adds up the files of all
+processes, so a scrape sees the whole server no matter which worker
+answers it. A scrape folds the files of processes that have exited into
+retired.json and removes them, so counters do not go backwards when a
+worker is recycled and the directory stays small. Clear the directory
+when the service is redeployed. With METRICS_DIR empty only the
+answering process is reported.
+
+Folding needs POSIX (a pid liveness check and flock); elsewhere the files
+of exited processes are kept and still counted.
+"""
+import atexit
+import hmac
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# Histogram bucket upper bounds; observations above the last go to +Inf
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+HISTOGRAMS = {
+    'duration': DURATION_BUCKETS,
+    'queries': QUERY_BUCKETS,
+    'size': SIZE_BUCKETS,
+}
+
+UNMATCHED = 'unmatched'
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+# Totals of exited processes, and the lock taken while folding into it
+RETIRED_FILE = 'retired.json'
+LOCK_FILE = '.lock'
+
+_local = threading.local()
+_shards = []
+_shards_lock = threading.Lock()
+_flush_lock = threading.Lock()
+_next_flush = 0.0
+_process = None
+
+
+class QueryTimer:
+    """Execute wrapper counting the queries of a request and their time."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - started
+
+
+def _new_view():
+    view = {'requests': {}, 'db_seconds': 0.0, 'over_budget': 0}
+    for name, buckets in HISTOGRAMS.items():
+        # One count per bucket plus +Inf, then the sum of the observations
+        view[name] = [0] * (len(buckets) + 1) + [0.0]
+    return view
+
+
+def _shard():
+    shard = getattr(_local, 'shard', None)
+    if shard is None:
+        shard = _local.shard = {}
+        with _shards_lock:
+            _shards.append(shard)
+    return shard
+
+
+def _observe(histogram, buckets, value):
+    histogram[bisect_left(buckets, value)] += 1
+    histogram[-1] += value
+
+
+def record(view, method, status, seconds, queries, db_seconds, size=None):
+    """Add one request to this thread's shard."""
+    shard = _shard()
+    stats = shard.get(view)
+    if stats is None:
+        stats = shard[view] = _new_view()
+    series = f'{method} {status}'
+    stats['requests'][series] = stats['requests'].get(series, 0) + 1
+    stats['db_seconds'] += db_seconds
+    _observe(stats['duration'], DURATION_BUCKETS, seconds)
+    _observe(stats['queries'], QUERY_BUCKETS, queries)
+    if size is not None:
+        _observe(stats['size'], SIZE_BUCKETS, size)
+
+
+def record_over_budget(view):
+    """Count a request to ``view`` that went over its query budget."""
+    shard = _shard()
+    stats = shard.get(view)
+    if stats is None:
+        stats = shard[view] = _new_view()
+    stats['over_budget'] += 1
+
+
+def _merge(into, views):
+    for view, stats in views.items():
+        total = into.get(view)
+        if total is None:
+            total = into[view] = _new_view()
+        for series, count in stats['requests'].items():
+            total['requests'][series] = total['requests'].get(series, 0) + count
+        total['db_seconds'] += stats['db_seconds']
+        total['over_budget'] += stats.get('over_budget', 0)
+        for name in HISTOGRAMS:
+            total[name] = [a + b for a, b in zip(total[name], stats[name])]
+    return into
+
+
+def snapshot():
+    """Numbers of this process: every thread's shard merged."""
+    with _shards_lock:
+        shards = list(_shards)
+    merged = {}
+    for shard in shards:
+        # Copies are taken under the GIL, so a shard being written is
+        # read either before or after a view's first request
+        _merge(merged, {view: dict(stats, requests=dict(stats['requests'])) for view, stats in list(shard.items())})
+    return merged
+
+
+def _metrics_dir():
+    return getattr(settings, 'METRICS_DIR', '')
+
+
+def _process_file():
+    """
+    This process's file name, '<pid>-<random id>.json'. The random id keeps
+    a process that got a dead worker's pid from overwriting its totals; it
+    is made again after a fork.
+    """
+    global _process
+    pid = os.getpid()
+    if _process is None or _process[0] != pid:
+        _process = (pid, f'{pid}-{uuid.uuid4().hex}.json')
+    return _process[1]
+
+
+def _write(path, data):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    with os.fdopen(fd, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+def _read(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        # Removed, or from an older layout
+        return None
+
+
+def flush():
+    """Write this process's numbers to its file in METRICS_DIR."""
+    directory = _metrics_dir()
+    if not directory:
+        return
+    os.makedirs(directory, exist_ok=True)
+    _write(os.path.join(directory, _process_file()), snapshot())
+
+
+def maybe_flush():
+    """flush() if METRICS_FLUSH_INTERVAL has passed; never waits on another thread."""
+    global _next_flush
+    now = time.monotonic()
+    if now < _next_flush or not _flush_lock.acquire(blocking=False):
+        return
+    try:
+        _next_flush = now + getattr(settings, 'METRICS_FLUSH_INTERVAL', 5)
+        flush()
+    finally:
+        _flush_lock.release()
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Exists, owned by another user
+        return True
+    return True
+
+
+def _pid(name):
+    try:
+        return int(name.split('-', 1)[0])
+    except ValueError:
+        return None
+
+
+@contextmanager
+def _directory_lock(directory):
+    # One scrape folds and reads at a time, across workers
+    if fcntl is None:
+        yield
+        return
+    with open(os.path.join(directory, LOCK_FILE), 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        yield
+
+
+def retire(directory):
+    """
+    Fold the files of exited processes into RETIRED_FILE and remove them;
+    call it holding the directory lock. The names folded last are kept in
+    it, so a file whose removal was interrupted is not added twice.
+    """
+    if fcntl is None:
+        return
+    retired_path = os.path.join(directory, RETIRED_FILE)
+    retired = _read(retired_path) or {'views': {}, 'folded': []}
+    dead = []
+    for name in os.listdir(directory):
+        pid = _pid(name)
+        if name.endswith('.json') and pid is not None and not _alive(pid):
+            dead.append(name)
+    if not dead:
+        return
+
+    new = [name for name in dead if name not in retired['folded']]
+    for name in new:
+        views = _read(os.path.join(directory, name))
+        if views is not None:
+            _merge(retired['views'], views)
+    if new:
+        retired['folded'] = new
+        _write(retired_path, retired)
+    for name in dead:
+        try:
+            os.remove(os.path.join(directory, name))
+        except FileNotFoundError:
+            pass
+
+
+def collect():
+    """(numbers of every process, number of live processes reported)."""
+    directory = _metrics_dir()
+    if not directory:
+        return snapshot(), 1
+
+    with _flush_lock:
+        flush()
+    merged, processes = {}, 0
+    with _directory_lock(directory):
+        retire(directory)
+        retired = _read(os.path.join(directory, RETIRED_FILE))
+        if retired is not None:
+            _merge(merged, retired['views'])
+        for name in os.listdir(directory):
+            if not name.endswith('.json') or _pid(name) is None:
+                continue
+            views = _read(os.path.join(directory, name))
+            if views is None:
+                continue
+            _merge(merged, views)
+            processes += 1
+    return merged, processes
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _histogram(lines, metric, help_text, buckets, views, name):
+    lines.append(f'# HELP {metric} {help_text}')
+    lines.append(f'# TYPE {metric} histogram')
+    for view, stats in views:
+        counts = stats[name]
+        label = f'view="{_label(view)}"'
+        cumulative = 0
+        for bound, count in zip(buckets, counts):
+            cumulative += count
+            lines.append(f'{metric}_bucket{{{label},le="{bound}"}} {cumulative}')
+        cumulative += counts[len(buckets)]
+        lines.append(f'{metric}_bucket{{{label},le="+Inf"}} {cumulative}')
+        lines.append(f'{metric}_sum{{{label}}} {_number(counts[-1])}')
+        lines.append(f'{metric}_count{{{label}}} {cumulative}')
+
+
+def render(views, processes):
+    """``views`` in the Prometheus text exposition format."""
+    views = sorted(views.items())
+    lines = [
+        '# HELP library_metrics_processes Live worker processes whose numbers are included.',
+        '# TYPE library_metrics_processes gauge',
+        f'library_metrics_processes {processes}',
+        '# HELP library_http_requests_total Requests by route, method and status.',
+        '# TYPE library_http_requests_total counter',
+    ]
+    for view, stats in views:
+        for series, count in sorted(stats['requests'].items()):
+            method, status = series.split(' ')
+            lines.append(
+                f'library_http_requests_total{{view="{_label(view)}",method="{method}",status="{status}"}} {count}'
+            )
+    _histogram(lines, 'library_http_request_duration_seconds', 'Request latency in seconds.',
+               DURATION_BUCKETS, views, 'duration')
+    _histogram(lines, 'library_http_db_queries', 'SQL queries per request.',
+               QUERY_BUCKETS, views, 'queries')
+    lines.append('# HELP library_http_db_seconds_total Time spent in SQL queries.')
+    lines.append('# TYPE library_http_db_seconds_total counter')
+    for view, stats in views:
+        lines.append(f'library_http_db_seconds_total{{view="{_label(view)}"}} {_number(stats["db_seconds"])}')
+    lines.append('# HELP library_http_query_budget_exceeded_total Requests over their view\'s query budget.')
+    lines.append('# TYPE library_http_query_budget_exceeded_total counter')
+    for view, stats in views:
+        lines.append(f'library_http_query_budget_exceeded_total{{view="{_label(view)}"}} {stats["over_budget"]}')
+    _histogram(lines, 'library_http_response_size_bytes', 'Response body size in bytes (streamed responses excluded).',
+               SIZE_BUCKETS, views, 'size')
+    return '\n'.join(lines) + '\n'
+
+
+class MetricsMiddleware:
+    """Records every request; keep it first in MIDDLEWARE so the whole stack is timed."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if _metrics_dir():
+            atexit.register(flush)
+
+    def __call__(self, request):
+        timer = QueryTimer()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timer))
+            response = self.get_response(request)
+        seconds = time.perf_counter() - started
+
+        match = getattr(request, 'resolver_match', None)
+        record(
+            match.route if match else UNMATCHED,
+            request.method,
+            response.status_code,
+            seconds,
+            timer.count,
+            timer.seconds,
+            None if response.streaming else len(response.content)
+        )
+        maybe_flush()
+        return response
+
+
+def _authorized(request):
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    header = request.META.get('HTTP_AUTHORIZATION', '')
+    if token and hmac.compare_digest(header.encode(), f'Bearer {token}'.encode()):
+        return True
+    return 'user_id' in request.session and request.session.get('user_type') == 'staff'
+
+
+def metrics_view(request):
+    """
+    Prometheus scrape endpoint. Staff session, or the METRICS_TOKEN bearer
+    token for the scraper.
+    """
+    if not _authorized(request):
+        return HttpResponse('Permission denied.\n', status=403, content_type=CONTENT_TYPE)
+    views, processes = collect()
+    return HttpResponse(render(views, processes), content_type=CONTENT_TYPE)
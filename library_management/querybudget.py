@@ -0,0 +1,120 @@
+"""
+Per-view SQL query budgets.
+
+A view declares the most queries one request may issue with the
+query_budget decorator, or QUERY_BUDGETS in settings maps URL names to
+budgets (taking precedence over the decorator). QueryBudgetMiddleware
+counts every query of the request, the session lookup and transaction
+savepoints included, and when a budgeted view goes over it reports the
+overrun with the statements that were repeated, which is what a per-row
+query in a loop looks like. QUERY_BUDGET_MODE decides what happens then:
+"log" logs a warning and counts the overrun in the request metrics,
+"raise" also raises QueryBudgetExceeded (for tests and benchmarks), "off"
+disables the checks.
+"""
+import logging
+import re
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+# Repeated statements listed in a report
+REPORT_FINGERPRINTS = 5
+
+_IN_LIST = re.compile(r'\bIN \((?:%s|\?)(?:, (?:%s|\?))*\)', re.IGNORECASE)
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_SPACE = re.compile(r'\s+')
+
+
+class QueryBudgetExceeded(RuntimeError):
+    """Raised in "raise" mode when a request issues more queries than its view's budget."""
+
+
+def query_budget(queries):
+    """Declare that one request to the decorated view may issue at most ``queries`` queries."""
+    def decorator(view):
+        view.query_budget = queries
+        return view
+    return decorator
+
+
+def fingerprint(sql):
+    """``sql`` with literals and IN lists collapsed, so repeats of one statement match."""
+    sql = _IN_LIST.sub('IN (...)', sql)
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    return _SPACE.sub(' ', sql).strip()
+
+
+class QueryLog:
+    """Execute wrapper keeping the SQL of a request's queries."""
+
+    def __init__(self):
+        self.statements = []
+
+    def __call__(self, execute, sql, params, many, context):
+        self.statements.append(sql)
+        return execute(sql, params, many, context)
+
+    def repeated(self):
+        """(count, fingerprint) of the statements issued more than once, most frequent first."""
+        counts = Counter(fingerprint(sql) for sql in self.statements)
+        return [(count, sql) for sql, count in counts.most_common(REPORT_FINGERPRINTS) if count > 1]
+
+
+def budget_for(request, view_func):
+    """The query budget of the view ``request`` resolved to, or None."""
+    match = getattr(request, 'resolver_match', None)
+    budgets = getattr(settings, 'QUERY_BUDGETS', {})
+    if match is not None and match.url_name in budgets:
+        return budgets[match.url_name]
+    return getattr(view_func, 'query_budget', None)
+
+
+def report(view, budget, log):
+    lines = [f'{view} issued {len(log.statements)} queries, budget {budget}']
+    for count, sql in log.repeated():
+        lines.append(f'  {count}x {sql}')
+    return '\n'.join(lines)
+
+
+class QueryBudgetMiddleware:
+    """Checks requests against their view's query budget; place it right after MetricsMiddleware."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        mode = getattr(settings, 'QUERY_BUDGET_MODE', 'log')
+        if mode == 'off':
+            return self.get_response(request)
+
+        request.query_budget = None
+        log = QueryLog()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(log))
+            response = self.get_response(request)
+
+        budget = request.query_budget
+        if budget is None or len(log.statements) <= budget:
+            return response
+
+        view = request.resolver_match.route
+        message = report(view, budget, log)
+        metrics.record_over_budget(view)
+        if mode == 'raise':
+            raise QueryBudgetExceeded(message)
+        logger.warning('Query budget exceeded: %s', message)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if hasattr(request, 'query_budget'):
+            request.query_budget = budget_for(request, view_func)
@@ -39,6 +39,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "library_management.metrics.MetricsMiddleware",
+    "library_management.querybudget.QueryBudgetMiddleware",
+    "library_management.tracing.TracingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -129,6 +132,72 @@ STATICFILES_DIRS = [
     BASE_DIR.parent / "web",
 ]
 
+# Background overdue sweeper (python manage.py sweep_overdue --loop)
+OVERDUE_SWEEP_INTERVAL = int(os.getenv("OVERDUE_SWEEP_INTERVAL", "300"))
+OVERDUE_SWEEP_LEASE = int(os.getenv("OVERDUE_SWEEP_LEASE", "600"))
+
+# Catalog search: "auto" uses the database's full-text index (MySQL FULLTEXT,
+# SQLite FTS5), "like" forces plain icontains matching
+BOOK_SEARCH_BACKEND = os.getenv("BOOK_SEARCH_BACKEND", "auto")
+
+# Seconds between background reloads of the in-memory autocomplete index,
+# which picks up books written by other processes; 0 disables reloading
+BOOK_SUGGEST_REFRESH = int(os.getenv("BOOK_SUGGEST_REFRESH", "300"))
+
+# Response cache for the catalog endpoints (Books/cache.py). CATALOG_CACHE
+# picks the backend: "locmem" (per-process LRU), "file" or "db" (shared by
+# all processes; "db" needs `python manage.py createcachetable`), or "none".
+# Entries are keyed by the catalog version, so writes invalidate them.
+CATALOG_CACHE = os.getenv("CATALOG_CACHE", "locmem")
+_catalog_cache_backends = {
+    "locmem": ("django.core.cache.backends.locmem.LocMemCache", "catalog"),
+    "file": (
+        "django.core.cache.backends.filebased.FileBasedCache",
+        os.getenv("CATALOG_CACHE_LOCATION", str(BASE_DIR.parent / ".catalog_cache")),
+    ),
+    "db": ("django.core.cache.backends.db.DatabaseCache", "catalog_cache"),
+    "none": ("django.core.cache.backends.dummy.DummyCache", ""),
+}
+_catalog_cache_backend, _catalog_cache_location = _catalog_cache_backends[CATALOG_CACHE]
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "catalog": {
+        "BACKEND": _catalog_cache_backend,
+        "LOCATION": _catalog_cache_location,
+        "TIMEOUT": int(os.getenv("CATALOG_CACHE_TIMEOUT", "3600")),
+        "OPTIONS": {
+            # Least recently used entries are evicted beyond this
+            "MAX_ENTRIES": int(os.getenv("CATALOG_CACHE_MAX_ENTRIES", "5000")),
+        },
+    },
+}
+
+# Seconds the staff circulation endpoints remember a request's
+# Idempotency-Key and response, so a retry is answered without redoing it
+IDEMPOTENCY_KEY_TTL = int(os.getenv("IDEMPOTENCY_KEY_TTL", "86400"))
+
+# Request metrics (see library_management/metrics.py). Each worker process
+# writes its numbers to METRICS_DIR every METRICS_FLUSH_INTERVAL seconds and
+# /api/metrics adds them up; empty METRICS_DIR reports one process only.
+# Prometheus authenticates with "Authorization: Bearer <METRICS_TOKEN>".
+METRICS_DIR = os.getenv("METRICS_DIR", str(BASE_DIR.parent / ".metrics"))
+METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", "5"))
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+# SQL query budgets of the views (see library_management/querybudget.py).
+# QUERY_BUDGET_MODE is "log", "raise" (tests and benchmarks) or "off";
+# QUERY_BUDGETS maps URL names to budgets overriding the views' own.
+QUERY_BUDGET_MODE = os.getenv("QUERY_BUDGET_MODE", "log")
+QUERY_BUDGETS = {}
+
+# Sampled request tracing (see library_management/tracing.py): the share of
+# requests traced, 0 to 1, and the JSONL file their spans are appended to
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0"))
+TRACE_LOG = os.getenv("TRACE_LOG", str(BASE_DIR.parent / ".traces" / "spans.jsonl"))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -0,0 +1,18 @@
+"""
+Text normalization shared by the catalog and member search.
+"""
+import unicodedata
+
+_TURKISH_I = str.maketrans({'İ': 'i', 'I': 'i', 'ı': 'i'})
+
+
+def fold_turkish(text):
+    """
+    Lowercase Turkish text and fold dotted/dotless i and accents,
+    so "IŞIK", "ışık" and "isik" all compare equal.
+    """
+    if not text:
+        return ''
+    text = text.translate(_TURKISH_I).lower()
+    decomposed = unicodedata.normalize('NFKD', text)
+    return ''.join(ch for ch in decomposed if not unicodedata.combining(ch))
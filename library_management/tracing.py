@@ -0,0 +1,159 @@
+"""
+Sampled request tracing.
+
+TracingMiddleware picks TRACE_SAMPLE_RATE of the requests (0.0 to 1.0) and
+records a trace for each: a "view" span covering the request, a "db" span
+per SQL query, and whatever spans the views open with span(), such as
+"serialize" and "json" in search_books. Spans nest under the span open when
+they start. A finished trace is appended to TRACE_LOG as one JSON object
+per span and line.
+
+When a request is not sampled nothing is recorded: no query wrapper is
+installed and span() hands back a shared no-op object, so a view can keep
+its spans in the hot path.
+"""
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+
+from .querybudget import fingerprint
+
+# Longest SQL fingerprint kept on a db span
+MAX_SQL_LENGTH = 1000
+
+_trace = ContextVar('trace', default=None)
+_write_lock = threading.Lock()
+
+
+class _NullSpan:
+    """Stands in for a span when the request is not sampled."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+
+NULL_SPAN = _NullSpan()
+
+
+class Span:
+    def __init__(self, trace, name, attrs):
+        self.trace = trace
+        self.name = name
+        self.attrs = attrs
+
+    def __enter__(self):
+        self.id, self.parent = self.trace.push()
+        self.start = time.time()
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self.started
+        if exc_type is not None:
+            self.attrs['error'] = exc_type.__name__
+        self.trace.pop(self, duration)
+        return False
+
+    def set(self, **attrs):
+        """Add attributes to the span."""
+        self.attrs.update(attrs)
+
+
+class Trace:
+    """The spans of one sampled request."""
+
+    def __init__(self):
+        self.id = uuid.uuid4().hex
+        self.spans = []
+        self._stack = []
+        self._next_id = 0
+
+    def push(self):
+        self._next_id += 1
+        parent = self._stack[-1] if self._stack else None
+        self._stack.append(self._next_id)
+        return self._next_id, parent
+
+    def pop(self, span, duration):
+        self._stack.pop()
+        self.spans.append({
+            'trace': self.id,
+            'span': span.id,
+            'parent': span.parent,
+            'name': span.name,
+            'start': round(span.start, 6),
+            'duration_ms': round(duration * 1000, 3),
+            'attrs': span.attrs,
+        })
+
+    def __call__(self, execute, sql, params, many, context):
+        # Execute wrapper: one db span per query
+        with Span(self, 'db', {'sql': fingerprint(sql)[:MAX_SQL_LENGTH], 'many': many}):
+            return execute(sql, params, many, context)
+
+
+def span(name, **attrs):
+    """
+    Context manager recording a span named ``name`` in the current trace;
+    a no-op when the request is not sampled.
+    """
+    trace = _trace.get()
+    if trace is None:
+        return NULL_SPAN
+    return Span(trace, name, attrs)
+
+
+def write(trace):
+    """Append the spans of ``trace`` to TRACE_LOG."""
+    path = settings.TRACE_LOG
+    lines = ''.join(json.dumps(record, default=str) + '\n' for record in trace.spans)
+    with _write_lock:
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        # One write per trace, so traces of concurrent workers do not interleave
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(lines)
+
+
+class TracingMiddleware:
+    """Traces TRACE_SAMPLE_RATE of the requests."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        rate = getattr(settings, 'TRACE_SAMPLE_RATE', 0.0)
+        if rate <= 0 or random.random() >= rate:
+            return self.get_response(request)
+
+        trace = Trace()
+        token = _trace.set(trace)
+        try:
+            with Span(trace, 'view', {'method': request.method, 'path': request.path}) as root:
+                with ExitStack() as stack:
+                    for connection in connections.all():
+                        stack.enter_context(connection.execute_wrapper(trace))
+                    response = self.get_response(request)
+                match = getattr(request, 'resolver_match', None)
+                root.set(
+                    route=match.route if match else None,
+                    status=response.status_code,
+                    bytes=None if response.streaming else len(response.content)
+                )
+        finally:
+            _trace.reset(token)
+        write(trace)
+        return response
@@ -8,6 +8,7 @@ from Books import views as book_views
 from user import views as user_views
 from Barrow import views as borrow_views
 from fine import views as fine_views
+from library_management.metrics import metrics_view
 
 urlpatterns = [
 	path("admin/", admin.site.urls),
@@ -20,6 +21,7 @@ urlpatterns = [
 	
 	# Book endpoints
 	path("api/books/search/", book_views.search_books, name="search_books"),
+	path("api/books/suggest/", book_views.suggest_books, name="suggest_books"),
 	path("api/books/<str:isbn>/", book_views.get_book_detail, name="book_detail"),
 	path("api/books/", book_views.book_list, name="book_list"),
 	
@@ -35,11 +37,15 @@ urlpatterns = [
 	
 	# Staff-only Book Management endpoints
 	path("api/staff/books/add/", book_views.add_book, name="staff_add_book"),
+	path("api/staff/books/bulk/", book_views.bulk_add_books, name="staff_bulk_add_books"),
 	path("api/staff/books/delete/<str:isbn>/", book_views.delete_book, name="staff_delete_book"),
+	path("api/staff/cache/stats/", book_views.catalog_cache_stats, name="staff_cache_stats"),
 	
 	# Staff-only Borrow Management endpoints
 	path("api/staff/borrows/create/", borrow_views.create_borrow, name="staff_create_borrow"),
 	path("api/staff/borrows/return/<int:borrow_id>/", borrow_views.return_book, name="staff_return_book"),
+	path("api/staff/borrows/bulk-create/", borrow_views.bulk_create_borrows, name="staff_bulk_create_borrows"),
+	path("api/staff/borrows/bulk-return/", borrow_views.bulk_return_books, name="staff_bulk_return_books"),
 	path("api/staff/borrows/late/", borrow_views.get_late_borrows, name="staff_late_borrows"),
 	path("api/staff/borrows/", borrow_views.get_all_borrows, name="staff_all_borrows"),
 	
@@ -52,6 +58,9 @@ urlpatterns = [
 	path("api/staff/members/search/", user_views.search_members, name="staff_search_members"),
 	path("api/staff/members/delete/<int:user_id>/", user_views.delete_member, name="staff_delete_member"),
 	path("api/staff/members/", user_views.get_all_members, name="staff_all_members"),
+	
+	# Prometheus metrics
+	path("api/metrics", metrics_view, name="metrics"),
 ]
 
 # Serve static files in development
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from user.stats import reconcile
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute every student's circulation counters (StudentStats) from the "
+        "borrow and fine history, creating missing rows and fixing drifted ones."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--student",
+            type=int,
+            action="append",
+            dest="students",
+            help="Only reconcile this student's user ID (repeatable).",
+        )
+
+    def handle(self, *args, **options):
+        fixed = reconcile(options["students"])
+        self.stdout.write(self.style.SUCCESS(
+            f"Student stats reconciled: {fixed} rows created or corrected"
+        ))
@@ -0,0 +1,59 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:27
+
+import unicodedata
+
+from django.db import migrations, models
+
+SOURCES = {"search_name": "Name", "search_email": "Email", "search_username": "Username"}
+BATCH_SIZE = 1000
+
+# Frozen copy of library_management.text.fold_turkish as of this migration
+_TURKISH_I = str.maketrans({"İ": "i", "I": "i", "ı": "i"})
+
+
+def fold(text):
+    if not text:
+        return ""
+    text = text.translate(_TURKISH_I).lower()
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def fill_search_columns(apps, schema_editor):
+    User = apps.get_model("user", "User")
+    last_id = 0
+    while True:
+        users = list(User.objects.filter(User_ID__gt=last_id).order_by("User_ID")[:BATCH_SIZE])
+        if not users:
+            break
+        for user in users:
+            for column, source in SOURCES.items():
+                setattr(user, column, fold(getattr(user, source))[:50])
+        User.objects.bulk_update(users, list(SOURCES))
+        last_id = users[-1].User_ID
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("user", "0003_alter_user_email_alter_user_phone_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="user",
+            name="search_email",
+            field=models.CharField(blank=True, db_index=True, default="", editable=False, max_length=50),
+        ),
+        migrations.AddField(
+            model_name="user",
+            name="search_name",
+            field=models.CharField(blank=True, db_index=True, default="", editable=False, max_length=50),
+        ),
+        migrations.AddField(
+            model_name="user",
+            name="search_username",
+            field=models.CharField(blank=True, db_index=True, default="", editable=False, max_length=50),
+        ),
+        migrations.RunPython(fill_search_columns, migrations.RunPython.noop),
+    ]
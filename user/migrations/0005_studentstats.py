@@ -0,0 +1,56 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+BATCH_SIZE = 1000
+
+
+def fill_student_stats(apps, schema_editor):
+    Student = apps.get_model("user", "Student")
+    StudentStats = apps.get_model("user", "StudentStats")
+    Borrow = apps.get_model("Barrow", "Borrow")
+    Fine = apps.get_model("fine", "Fine")
+
+    def per_student(queryset, key, aggregate):
+        return dict(queryset.order_by().values(key).annotate(value=aggregate).values_list(key, "value"))
+
+    active = per_student(Borrow.objects.filter(status__in=["active", "late"]), "student", Count("pk"))
+    total = per_student(Borrow.objects.all(), "student", Count("pk"))
+    unpaid = per_student(Fine.objects.filter(Status="unpaid"), "Student_ID", Sum("Amount"))
+
+    StudentStats.objects.bulk_create(
+        [
+            StudentStats(
+                student_id=pk,
+                active_borrows=active.get(pk, 0),
+                total_borrows=total.get(pk, 0),
+                unpaid_fines=unpaid.get(pk) or 0,
+            )
+            for pk in Student.objects.values_list("pk", flat=True)
+        ],
+        batch_size=BATCH_SIZE,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("user", "0004_search_columns"),
+        ("Barrow", "0004_overduesweep_watermark"),
+        ("fine", "0004_alter_fine_borrow_id"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StudentStats",
+            fields=[
+                ("student", models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name="stats", serialize=False, to="user.student")),
+                ("active_borrows", models.PositiveIntegerField(default=0)),
+                ("total_borrows", models.PositiveIntegerField(default=0)),
+                ("unpaid_fines", models.FloatField(default=0)),
+            ],
+        ),
+        migrations.RunPython(fill_student_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:44
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("user", "0005_studentstats"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="studentstats",
+            name="history_changed",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+BATCH_SIZE = 1000
+
+
+def fill_search_terms(apps, schema_editor):
+    # Built from the already folded search columns, as User.search_terms() does
+    User = apps.get_model("user", "User")
+    MemberSearchTerm = apps.get_model("user", "MemberSearchTerm")
+    last_id = 0
+    while True:
+        users = list(
+            User.objects.filter(User_ID__gt=last_id).order_by("User_ID")
+            .values_list("User_ID", "search_name", "search_email", "search_username", "Phone")[:BATCH_SIZE]
+        )
+        if not users:
+            break
+        rows = []
+        for user_id, name, email, username, phone in users:
+            words = name.split()
+            terms = {" ".join(words[i:]) for i in range(len(words))}
+            terms.update([email, username, phone])
+            terms.discard("")
+            rows.extend(MemberSearchTerm(user_id=user_id, term=term) for term in {term[:50] for term in terms})
+        MemberSearchTerm.objects.bulk_create(rows)
+        last_id = users[-1][0]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("user", "0006_studentstats_history_changed"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MemberSearchTerm",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("term", models.CharField(max_length=50)),
+                ("user", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="terms", to="user.user")),
+            ],
+            options={
+                "indexes": [models.Index(fields=["term", "user"], name="membersearchterm_term_user_idx")],
+                "constraints": [models.UniqueConstraint(fields=("user", "term"), name="membersearchterm_user_term_uniq")],
+            },
+        ),
+        migrations.RunPython(fill_search_terms, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:30
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("user", "0007_membersearchterm"),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name="user",
+            name="search_email",
+        ),
+        migrations.RemoveField(
+            model_name="user",
+            name="search_name",
+        ),
+        migrations.RemoveField(
+            model_name="user",
+            name="search_username",
+        ),
+    ]
@@ -1,4 +1,7 @@
-from django.db import models
+from django.db import models, transaction
+from django.utils import timezone
+
+from library_management.text import fold_turkish
 
 # Create your models here.
 class User(models.Model):
@@ -16,15 +19,82 @@ class User(models.Model):
 
     Type = models.CharField(max_length=10, choices=USER_TYPES)
 
+    # Fields the MemberSearchTerm rows are built from
+    TERM_SOURCES = ('Name', 'Email', 'Username', 'Phone')
+
     def __str__(self):
         return f"{self.Name} ({self.Type})"
+
+    def search_terms(self):
+        """
+        Terms member search matches the start of: the Turkish-folded name
+        from each of its words on, the folded email and username, and the
+        phone.
+        """
+        words = fold_turkish(self.Name).split()
+        terms = {' '.join(words[i:]) for i in range(len(words))}
+        terms.update([fold_turkish(self.Email), fold_turkish(self.Username), self.Phone])
+        terms.discard('')
+        max_length = MemberSearchTerm._meta.get_field('term').max_length
+        return {term[:max_length] for term in terms}
+
+    def refresh_search_terms(self, replace=True):
+        """Write this member's MemberSearchTerm rows, replacing the old ones."""
+        if replace:
+            MemberSearchTerm.objects.filter(user=self).delete()
+        MemberSearchTerm.objects.bulk_create([
+            MemberSearchTerm(user=self, term=term) for term in self.search_terms()
+        ])
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        adding = self._state.adding
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if update_fields is None or set(update_fields) & set(self.TERM_SOURCES):
+                self.refresh_search_terms(replace=not adding)
     
+class MemberSearchTerm(models.Model):
+    """
+    One row per term of a member's User.search_terms(), so member search
+    is a prefix range scan on one index (see search_members).
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='terms')
+    term = models.CharField(max_length=50)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'term'], name='membersearchterm_user_term_uniq'),
+        ]
+        indexes = [
+            # Prefix lookup by term, answered from the index alone
+            models.Index(fields=['term', 'user'], name='membersearchterm_term_user_idx'),
+        ]
+
 class Student(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True)
 
     def __str__(self):
         return f"Student: {self.user.Name}"
 
+class StudentStats(models.Model):
+    """
+    Circulation counters of one student, kept in step with Borrow and Fine
+    by the borrow, return, fine and payment paths (see user/stats.py), so
+    quota checks and member lists read one row instead of aggregating
+    history. `python manage.py reconcile_student_stats` repairs drift.
+    """
+    student = models.OneToOneField(Student, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    active_borrows = models.PositiveIntegerField(default=0)
+    total_borrows = models.PositiveIntegerField(default=0)
+    unpaid_fines = models.FloatField(default=0)
+    # Last change to the student's borrow or fine history; validates the
+    # cached borrowing history (ETag/Last-Modified)
+    history_changed = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"Stats: {self.student_id}"
+
 class Staff(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True)
 
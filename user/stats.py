@@ -0,0 +1,136 @@
+"""
+Maintenance of the denormalized StudentStats counters.
+
+Lending, returning, fining and payments adjust the student's row with a
+relative UPDATE inside their own transaction, so concurrent requests never
+overwrite each other's changes. The set-based fine accrual and the
+reconcile_student_stats command recompute rows from Borrow and Fine with
+correlated subqueries instead.
+"""
+from django.db.models import Count, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Now
+
+from Barrow.models import Borrow
+from fine.models import Fine
+from .models import Student, StudentStats
+
+OPEN_BORROW_STATUSES = ['active', 'late']
+COUNTERS = ['active_borrows', 'total_borrows', 'unpaid_fines']
+
+
+def history_counters(outer='pk'):
+    """
+    Expressions recomputing each counter from Borrow and Fine history for
+    the student referenced by ``outer`` in the enclosing query.
+    """
+    borrows = Borrow.objects.filter(student=OuterRef(outer)).order_by().values('student')
+    fines = Fine.objects.filter(
+        Student_ID=OuterRef(outer),
+        Status='unpaid'
+    ).order_by().values('Student_ID')
+    return {
+        'active_borrows': Coalesce(
+            Subquery(borrows.filter(status__in=OPEN_BORROW_STATUSES).annotate(n=Count('pk')).values('n')),
+            Value(0)
+        ),
+        'total_borrows': Coalesce(Subquery(borrows.annotate(n=Count('pk')).values('n')), Value(0)),
+        'unpaid_fines': Coalesce(Subquery(fines.annotate(total=Sum('Amount')).values('total')), Value(0.0)),
+    }
+
+
+def member_counters():
+    """
+    Counter expressions for a User queryset: the student's StudentStats
+    row, or the history subqueries when it has none (e.g. a user without
+    a student record, who counts as 0).
+    """
+    history = history_counters('pk')
+    return {
+        name: Coalesce(F(f'student__stats__{name}'), history[name])
+        for name in COUNTERS
+    }
+
+
+def reconcile(student_ids=None):
+    """
+    Rebuild the counters of ``student_ids`` (ids, or a queryset of them;
+    every student when None) from history, creating missing rows.
+    Returns the number of rows created or corrected.
+    """
+    students = Student.objects.all()
+    stats = StudentStats.objects.all()
+    if student_ids is not None:
+        students = students.filter(pk__in=student_ids)
+        stats = stats.filter(student__in=student_ids)
+
+    missing = students.filter(stats__isnull=True).annotate(
+        **{f'expected_{name}': value for name, value in history_counters('pk').items()}
+    ).values_list('pk', *[f'expected_{name}' for name in COUNTERS])
+    created = StudentStats.objects.bulk_create(
+        [
+            StudentStats(student_id=pk, active_borrows=active, total_borrows=total, unpaid_fines=unpaid)
+            for pk, active, total, unpaid in missing
+        ],
+        batch_size=1000,
+        ignore_conflicts=True
+    )
+
+    # Only rows whose counters differ from history are written
+    counters = history_counters('student')
+    corrected = stats.annotate(
+        **{f'expected_{name}': value for name, value in counters.items()}
+    ).exclude(
+        **{name: F(f'expected_{name}') for name in COUNTERS}
+    ).update(**history_counters('student'))
+    return len(created) + corrected
+
+
+def stats_for(student):
+    """The counters row of ``student``, rebuilt from history if it is missing."""
+    try:
+        return StudentStats.objects.get(student=student)
+    except StudentStats.DoesNotExist:
+        reconcile([student.pk])
+        return StudentStats.objects.get(student=student)
+
+
+def _adjust(student_id, **deltas):
+    """Add ``deltas`` to the counters of ``student_id`` with one UPDATE."""
+    if student_id is None:
+        return
+    rows = StudentStats.objects.filter(student_id=student_id)
+    for field, delta in deltas.items():
+        if field != 'unpaid_fines' and delta < 0:
+            # Unsigned counters: a row that would go negative has drifted
+            rows = rows.filter(**{f'{field}__gte': -delta})
+    changes = {field: F(field) + delta for field, delta in deltas.items()}
+    if not rows.update(history_changed=Now(), **changes):
+        # No row (or a drifted one): rebuild it from history, which
+        # already includes the change being recorded
+        reconcile([student_id])
+        touch_history([student_id])
+
+
+def touch_history(student_ids):
+    """Mark the history of ``student_ids`` (ids or a queryset of them) as changed."""
+    StudentStats.objects.filter(student__in=student_ids).update(history_changed=Now())
+
+
+def record_borrow(student_id):
+    """A borrow was created for the student."""
+    _adjust(student_id, active_borrows=1, total_borrows=1)
+
+
+def record_return(student_id):
+    """One of the student's open borrows was returned."""
+    _adjust(student_id, active_borrows=-1)
+
+
+def record_fine(student_id, amount):
+    """An unpaid fine of ``amount`` was added for the student."""
+    _adjust(student_id, unpaid_fines=amount)
+
+
+def record_payment(student_id, amount):
+    """An unpaid fine of ``amount`` was paid."""
+    _adjust(student_id, unpaid_fines=-amount)
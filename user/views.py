@@ -2,64 +2,93 @@ from django.shortcuts import render
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.contrib.auth.hashers import check_password, make_password
-from .models import User, Student, Staff
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from .models import MemberSearchTerm, User, Student, Staff, StudentStats
+from .stats import member_counters, stats_for
+from library_management.fields import FieldsError, lookups_for, requested_fields
+from library_management.listing import wants_total
+from library_management.querybudget import query_budget
+from library_management.tracing import span
+from library_management.text import fold_turkish
 from Barrow.models import Borrow
-from fine.models import Fine
-from datetime import date
+import hashlib
 import json
 
 # Create your views here.
 
-def update_late_borrows():
-    """Check and update overdue borrows to late status and create/update fines."""
-    from fine.models import Fine
-    today = date.today()
-    
-    # Get ALL overdue borrows (both active and already late status)
-    late_borrows = Borrow.objects.filter(
-        status__in=['active', 'late'],
-        last_date__lt=today
-    ).select_related('book', 'student')
-    
-    for borrow in late_borrows:
-        # Update status to late if it's still active
-        if borrow.status == 'active':
-            borrow.status = 'late'
-            borrow.save()
-        
-        # Update book status to late if not already
-        if borrow.book.status != 'late':
-            borrow.book.status = 'late'
-            borrow.book.save()
-        
-        # Calculate current fine amount
-        days_late = (today - borrow.last_date).days
-        fine_amount = days_late * 5.0  # 5 TL per day
-        
-        # Find existing unpaid fine for this borrow
-        existing_fine = Fine.objects.filter(Borrow_ID=borrow, Status='unpaid').first()
-        
-        if existing_fine:
-            # Update existing fine amount and date
-            existing_fine.Amount = fine_amount
-            existing_fine.Date = today
-            existing_fine.save()
-        else:
-            # Create new fine if it doesn't exist
-            try:
-                from user.models import Staff
-                staff = Staff.objects.first()
-                if staff and borrow.student:
-                    Fine.objects.create(
-                        Staff_ID=staff,
-                        Student_ID=borrow.student,
-                        Borrow_ID=borrow,
-                        Date=today,
-                        Status='unpaid',
-                        Amount=fine_amount
-                    )
-            except Exception:
-                pass  # If no staff exists, skip fine creation
+# fields= keys of member list results -> the User column each one needs;
+# the borrow and fine statistics come from the StudentStats row
+MEMBER_FIELDS = {
+    'user_id': 'User_ID',
+    'name': 'Name',
+    'email': 'Email',
+    'phone': 'Phone',
+    'username': 'Username',
+    'active_borrows': None,
+    'total_borrows': None,
+    'unpaid_fines': None,
+}
+SEARCH_MEMBER_FIELDS = [field for field in MEMBER_FIELDS if field != 'total_borrows']
+
+
+# sort= options of the member lists, "-" prefix for descending;
+# User_ID breaks ties
+MEMBER_SORTS = {
+    'user_id': 'User_ID',
+    'name': 'Name',
+    'username': 'Username',
+    'active_borrows': 'active_borrows',
+    'total_borrows': 'total_borrows',
+    'unpaid_fines': 'unpaid_fines',
+}
+DEFAULT_MEMBER_SORT = 'user_id'
+
+
+def member_page(request, users, fields):
+    """
+    One page of member results for ``users`` (a User queryset) in a single
+    query: the requested columns plus the counters, annotated from
+    StudentStats. Reads limit, offset and sort from ``request``.
+    Returns (results, has_more, offset); raises ValueError for a bad sort.
+    """
+    try:
+        limit = int(request.GET.get('limit', 50))
+        offset = int(request.GET.get('offset', 0))
+    except ValueError:
+        limit = 50
+        offset = 0
+    limit = max(1, min(limit, 200))
+    offset = max(offset, 0)
+    
+    sort = request.GET.get('sort', DEFAULT_MEMBER_SORT)
+    sort_key = sort.lstrip('-')
+    if sort_key not in MEMBER_SORTS:
+        raise ValueError(f'Invalid sort. Use one of: {", ".join(MEMBER_SORTS)} (prefix - for descending)')
+    
+    counters = member_counters()
+    needed = [field for field in fields if MEMBER_FIELDS[field] is None]
+    if sort_key in counters and sort_key not in needed:
+        needed.append(sort_key)
+    ordering = ('-' if sort.startswith('-') else '') + MEMBER_SORTS[sort_key]
+    
+    rows = list(
+        users.annotate(**{name: counters[name] for name in needed})
+        .order_by(ordering, 'User_ID')
+        .values(*lookups_for(fields, MEMBER_FIELDS), *needed)[offset:offset + limit + 1]
+    )
+    has_more = len(rows) > limit
+    
+    results = []
+    with span('serialize', members=len(rows[:limit])):
+        for row in rows[:limit]:
+            result = {}
+            for field in fields:
+                value = row[MEMBER_FIELDS[field] or field]
+                result[field] = float(value) if field == 'unpaid_fines' else value
+            results.append(result)
+    return results, has_more, offset
+
 
 def add_cors_headers(response):
     """Add CORS headers to response"""
@@ -69,6 +98,7 @@ def add_cors_headers(response):
     response['Access-Control-Allow-Credentials'] = 'true'
     return response
 
+@query_budget(6)
 @csrf_exempt
 def login_view(request):
     """
@@ -94,9 +124,6 @@ def login_view(request):
                 
                 # Check password securely using Django's check_password
                 if check_password(password, user.Password):
-                    # Update late borrows on login
-                    update_late_borrows()
-                    
                     # Store user info in session
                     request.session['user_id'] = user.User_ID
                     request.session['user_type'] = user.Type
@@ -125,6 +152,7 @@ def login_view(request):
     return add_cors_headers(response)
 
 
+@query_budget(3)
 @csrf_exempt
 def logout_view(request):
     """
@@ -140,15 +168,13 @@ def logout_view(request):
     return add_cors_headers(response)
 
 
+@query_budget(3)
 def check_session(request):
     """
     Check if user is logged in.
     """
     if 'user_id' in request.session:
         try:
-            # Update late borrows on session check
-            update_late_borrows()
-            
             user = User.objects.get(User_ID=request.session['user_id'])
             response = JsonResponse({
                 'logged_in': True,
@@ -167,10 +193,20 @@ def check_session(request):
     return add_cors_headers(response)
 
 
+def borrowing_etag(student_id, changed, limit, offset):
+    """ETag of one page of a student's borrowing history as of ``changed``."""
+    key = f'{student_id}:{changed.isoformat()}:{limit}:{offset}'
+    return hashlib.md5(key.encode()).hexdigest()
+
+
+@query_budget(12)
 def get_member_borrowings(request):
     """
-    Get borrowing history for logged-in member.
+    Get borrowing history for logged-in member, newest first.
     Includes past borrowings, active borrowings with return dates, and fine status.
+    Paginated with limit and offset. Responses carry an ETag/Last-Modified
+    from the student's last history change, so a revalidating request is
+    answered with 304 after reading a single row.
     """
     if 'user_id' not in request.session or request.session.get('user_type') != 'student':
         response = JsonResponse({'error': 'Unauthorized'}, status=401)
@@ -179,19 +215,49 @@ def get_member_borrowings(request):
     user_id = request.session['user_id']
     
     try:
-        student = Student.objects.get(user__User_ID=user_id)
-        
-        # Get all borrowings
-        borrowings = Borrow.objects.filter(student=student).order_by('-date')
-        
-        results = []
-        for borrow in borrowings:
-            # Get fine information if exists
-            fines = Fine.objects.filter(Student_ID=student, Borrow_ID=borrow)
-            
+        limit = int(request.GET.get('limit', 20))
+        offset = int(request.GET.get('offset', 0))
+    except ValueError:
+        limit = 20
+        offset = 0
+    limit = max(1, min(limit, 100))
+    offset = max(offset, 0)
+    
+    # The student's pk is its User_ID
+    changed = StudentStats.objects.filter(student_id=user_id).values_list('history_changed', flat=True).first()
+    if changed is None:
+        try:
+            student = Student.objects.get(user__User_ID=user_id)
+        except Student.DoesNotExist:
+            response = JsonResponse({'error': 'Student not found'}, status=404)
+            return add_cors_headers(response)
+        changed = stats_for(student).history_changed
+    
+    etag = borrowing_etag(user_id, changed, limit, offset)
+    last_modified = int(changed.timestamp())
+    not_modified = get_conditional_response(request, etag=quote_etag(etag), last_modified=last_modified)
+    if not_modified is not None:
+        return add_cors_headers(not_modified)
+    
+    # One joined query for the page and its books and fines
+    borrowings = list(
+        Borrow.objects.filter(student_id=user_id)
+        .select_related('book', 'fine')
+        .only(
+            'Borrow_ID', 'date', 'last_date', 'status',
+            'book__ISBN', 'book__name', 'book__author', 'book__image',
+            'fine__Amount', 'fine__Status', 'fine__Date', 'fine__Payment_Date'
+        )
+        .order_by('-date', '-Borrow_ID')[offset:offset + limit + 1]
+    )
+    has_more = len(borrowings) > limit
+    
+    results = []
+    with span('serialize', borrows=len(borrowings[:limit])):
+        for borrow in borrowings[:limit]:
+            fine = getattr(borrow, 'fine', None)
             fine_info = None
-            if fines.exists():
-                fine = fines.first()
+            if fine is not None:
                 fine_info = {
                     'amount': fine.Amount,
                     'status': fine.Status,
@@ -212,15 +278,22 @@ def get_member_borrowings(request):
                 'status': borrow.status,
                 'fine': fine_info
             })
-        
-        response = JsonResponse({'borrowings': results, 'count': len(results)})
-        return add_cors_headers(response)
-        
-    except Student.DoesNotExist:
-        response = JsonResponse({'error': 'Student not found'}, status=404)
-        return add_cors_headers(response)
+    
+    with span('json'):
+        response = JsonResponse({
+            'borrowings': results,
+            'count': len(results),
+            'offset': offset,
+            'has_more': has_more
+        })
+    response['ETag'] = quote_etag(etag)
+    response['Last-Modified'] = http_date(last_modified)
+    # Browsers keep the copy but revalidate it on every visit
+    response['Cache-Control'] = 'private, no-cache'
+    return add_cors_headers(response)
 
 
+@query_budget(4)
 def get_member_profile(request):
     """
     Get member profile information.
@@ -249,6 +322,7 @@ def get_member_profile(request):
         return add_cors_headers(response)
 
 
+@query_budget(6)
 @csrf_exempt
 def update_member_profile(request):
     """
@@ -331,6 +405,7 @@ def check_staff_permission(request):
     return user_type == 'staff'
 
 
+@query_budget(8)
 @csrf_exempt
 def add_member(request):
     """
@@ -372,6 +447,7 @@ def add_member(request):
             
             # Create student record
             student = Student.objects.create(user=user)
+            StudentStats.objects.create(student=student)
             
             response = JsonResponse({
                 'success': True,
@@ -397,76 +473,57 @@ def add_member(request):
     return add_cors_headers(response)
 
 
+@query_budget(4)
 def search_members(request):
     """
-    Search members by name, email, or phone. Staff only.
+    Search members by name, email, phone, or username. Staff only.
+    Matches the start of any word of the name, or the start of the email,
+    username or phone, ignoring case and Turkish accents.
+    Paginated and sorted like get_all_members.
     """
     if not check_staff_permission(request):
         response = JsonResponse({'error': 'Permission denied. Staff only.'}, status=403)
         return add_cors_headers(response)
     
+    try:
+        fields = requested_fields(request, MEMBER_FIELDS, SEARCH_MEMBER_FIELDS)
+    except FieldsError as e:
+        response = JsonResponse({'error': str(e)}, status=400)
+        return add_cors_headers(response)
+    
     query = request.GET.get('q', '').strip()
     
     if query:
-        from django.db.models import Q
+        # One prefix range scan over the members' folded search terms
+        folded = ' '.join(fold_turkish(query).split())
         users = User.objects.filter(
-            Type='student'
-        ).filter(
-            Q(Name__icontains=query) |
-            Q(Email__icontains=query) |
-            Q(Phone__icontains=query) |
-            Q(Username__icontains=query)
+            Type='student',
+            User_ID__in=MemberSearchTerm.objects.filter(term__startswith=folded).values('user_id')
         )
     else:
         # Return all students if no query
         users = User.objects.filter(Type='student')
     
-    results = []
-    for user in users:
-        try:
-            student = Student.objects.get(user=user)
-            
-            # Get active borrows count
-            active_borrows = Borrow.objects.filter(
-                student=student,
-                status__in=['active', 'late']
-            ).count()
-            
-            # Get unpaid fines total amount
-            from django.db.models import Sum
-            unpaid_fines = Fine.objects.filter(
-                Student_ID=student,
-                Status='unpaid'
-            ).aggregate(total=Sum('Amount'))['total'] or 0
-            
-            results.append({
-                'user_id': user.User_ID,
-                'name': user.Name,
-                'email': user.Email,
-                'phone': user.Phone,
-                'username': user.Username,
-                'active_borrows': active_borrows,
-                'unpaid_fines': float(unpaid_fines)
-            })
-        except Student.DoesNotExist:
-            # If student record doesn't exist, still show the user
-            results.append({
-                'user_id': user.User_ID,
-                'name': user.Name,
-                'email': user.Email,
-                'phone': user.Phone,
-                'username': user.Username,
-                'active_borrows': 0,
-                'unpaid_fines': 0
-            })
+    try:
+        results, has_more, offset = member_page(request, users, fields)
+    except ValueError as e:
+        response = JsonResponse({'error': str(e)}, status=400)
+        return add_cors_headers(response)
+    
+    total = users.count() if wants_total(request) else None
     
-    response = JsonResponse({
-        'results': results,
-        'count': len(results)
-    })
+    with span('json'):
+        response = JsonResponse({
+            'results': results,
+            'count': len(results),
+            'total': total,
+            'offset': offset,
+            'has_more': has_more
+        })
     return add_cors_headers(response)
 
 
+@query_budget(17)
 @csrf_exempt
 def delete_member(request, user_id):
     """
@@ -486,25 +543,17 @@ def delete_member(request, user_id):
             user = User.objects.get(User_ID=user_id, Type='student')
             student = Student.objects.get(user=user)
             
-            # Check for active borrows
-            active_borrows = Borrow.objects.filter(
-                student=student,
-                status__in=['active', 'late']
-            ).count()
+            stats = stats_for(student)
             
-            if active_borrows > 0:
+            # Check for active borrows
+            if stats.active_borrows > 0:
                 response = JsonResponse({
                     'error': 'Cannot delete member with active borrows'
                 }, status=400)
                 return add_cors_headers(response)
             
             # Check for unpaid fines
-            unpaid_fines = Fine.objects.filter(
-                Student_ID=student,
-                Status='unpaid'
-            ).count()
-            
-            if unpaid_fines > 0:
+            if stats.unpaid_fines > 0:
                 response = JsonResponse({
                     'error': 'Cannot delete member with unpaid fines'
                 }, status=400)
@@ -534,47 +583,33 @@ def delete_member(request, user_id):
     return add_cors_headers(response)
 
 
+@query_budget(4)
 def get_all_members(request):
     """
     Get all members with their statistics. Staff only.
+    fields= picks the result keys. Paginated with limit and offset, ordered
+    by sort=; the total count is only computed with include_total=1.
     """
     if not check_staff_permission(request):
         response = JsonResponse({'error': 'Permission denied. Staff only.'}, status=403)
         return add_cors_headers(response)
     
-    students = Student.objects.all().select_related('user')
+    users = User.objects.filter(Type='student', student__isnull=False)
+    try:
+        fields = requested_fields(request, MEMBER_FIELDS, MEMBER_FIELDS)
+        results, has_more, offset = member_page(request, users, fields)
+    except ValueError as e:
+        response = JsonResponse({'error': str(e)}, status=400)
+        return add_cors_headers(response)
     
-    results = []
-    for student in students:
-        # Get active borrows count
-        active_borrows = Borrow.objects.filter(
-            student=student,
-            status__in=['active', 'late']
-        ).count()
-        
-        total_borrows = Borrow.objects.filter(student=student).count()
-        
-        # Get unpaid fines total amount
-        from django.db.models import Sum
-        unpaid_fines = Fine.objects.filter(
-            Student_ID=student,
-            Status='unpaid'
-        ).aggregate(total=Sum('Amount'))['total'] or 0
-        
-        results.append({
-            'user_id': student.user.User_ID,
-            'name': student.user.Name,
-            'email': student.user.Email,
-            'phone': student.user.Phone,
-            'username': student.user.Username,
-            'active_borrows': active_borrows,
-            'total_borrows': total_borrows,
-            'unpaid_fines': float(unpaid_fines)
-        })
+    total = users.count() if wants_total(request) else None
     
-    response = JsonResponse({
-        'results': results,
-        'count': len(results)
-    })
+    with span('json'):
+        response = JsonResponse({
+            'results': results,
+            'count': len(results),
+            'total': total,
+            'offset': offset,
+            'has_more': has_more
+        })
     return add_cors_headers(response)
-
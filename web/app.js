@@ -4,9 +4,15 @@ const API_BASE_URL = 'http://localhost:8000/api';
 // Global state for pagination
 let currentSearchQuery = null;
 let currentOffset = 0;
+let nextCursor = null;
 let hasMoreResults = false;
 let totalResults = 0;
 let isLoadingMore = false;
+let suggestTimer = null;
+
+// Member borrowing history pagination
+const BORROWINGS_PAGE_SIZE = 20;
+let borrowingsOffset = 0;
 
 document.addEventListener("DOMContentLoaded", () => {
     highlightActiveNav();
@@ -218,6 +224,42 @@ function initBookSearch() {
                 performSearch();
             }
         });
+        
+        // Autocomplete, debounced so fast typing sends one request
+        searchInput.addEventListener('input', () => {
+            clearTimeout(suggestTimer);
+            suggestTimer = setTimeout(() => loadSuggestions(searchInput.value.trim()), 150);
+        });
+    }
+}
+
+async function loadSuggestions(prefix) {
+    const datalist = document.getElementById('searchSuggestions');
+    if (!datalist) return;
+    
+    if (prefix.length < 2) {
+        datalist.innerHTML = '';
+        return;
+    }
+    
+    try {
+        const response = await fetch(`${API_BASE_URL}/books/suggest/?q=${encodeURIComponent(prefix)}&limit=8`, {
+            credentials: 'include'
+        });
+        const data = await response.json();
+        
+        const options = [
+            ...data.titles.map(title => title.name),
+            ...data.authors.map(author => author.name)
+        ];
+        datalist.innerHTML = '';
+        [...new Set(options)].forEach(value => {
+            const option = document.createElement('option');
+            option.value = value;
+            datalist.appendChild(option);
+        });
+    } catch (error) {
+        console.error('Suggestions failed:', error);
     }
 }
 
@@ -238,6 +280,7 @@ async function performSearch() {
     // Reset pagination for new search
     currentSearchQuery = query;
     currentOffset = 0;
+    nextCursor = null;
     
     const searchInfo = document.getElementById('searchInfo');
     const clearButton = document.getElementById('clearSearch');
@@ -255,7 +298,7 @@ async function performSearch() {
             controller.abort();
         }, 30000); // 30 second timeout
         
-        const searchUrl = `${API_BASE_URL}/books/search/?q=${encodeURIComponent(query)}&limit=50&offset=${currentOffset}`;
+        const searchUrl = `${API_BASE_URL}/books/search/?q=${encodeURIComponent(query)}&limit=50&include_total=1`;
         console.log('[SEARCH] Fetching URL:', searchUrl);
         console.log('[SEARCH] Fetch started at:', new Date().toISOString());
         
@@ -277,7 +320,7 @@ async function performSearch() {
         
         console.log('[SEARCH] Starting to parse JSON...');
         const parseStartTime = Date.now();
-        const data = await response.json();
+        let data = await response.json();
         const parseEndTime = Date.now();
         console.log('[SEARCH] JSON parsed in', parseEndTime - parseStartTime, 'ms');
         console.log('[SEARCH] Data received:', {
@@ -288,14 +331,30 @@ async function performSearch() {
             resultsLength: data.results ? data.results.length : 0
         });
         
+        // Nothing matched exactly: retry typo-tolerant before giving up
+        let fuzzy = false;
+        if (data.total === 0) {
+            console.log('[SEARCH] No exact matches, retrying with fuzzy search');
+            const fuzzyResponse = await fetch(`${API_BASE_URL}/books/search/?q=${encodeURIComponent(query)}&limit=50&mode=fuzzy`, {
+                credentials: 'include'
+            });
+            if (fuzzyResponse.ok) {
+                data = await fuzzyResponse.json();
+                fuzzy = data.total > 0;
+            }
+        }
+        
         // Update global state
         totalResults = data.total;
         hasMoreResults = data.has_more;
+        nextCursor = data.next_cursor;
         
         console.log('[SEARCH] Calling displayBooks with', data.results.length, 'books');
         displayBooks(data.results, false);
         
-        searchInfo.textContent = `"${query}" için ${data.total} sonuç bulundu.`;
+        searchInfo.textContent = fuzzy
+            ? `"${query}" için tam eşleşme bulunamadı. Benzer ${data.total} sonuç gösteriliyor.`
+            : `"${query}" için ${data.total} sonuç bulundu.`;
         clearButton.style.display = 'inline-block';
         
         // Show or hide load more button
@@ -328,6 +387,7 @@ async function loadAllBooks() {
     // Reset pagination
     currentSearchQuery = null;
     currentOffset = 0;
+    nextCursor = null;
     
     booksGrid.innerHTML = '<p>Kitaplar yükleniyor...</p>';
     
@@ -337,7 +397,7 @@ async function loadAllBooks() {
         const timeoutId = setTimeout(() => controller.abort(), 30000); // 30 second timeout
         
         // Load only first 50 books for better performance
-        const response = await fetch(`${API_BASE_URL}/books/?limit=50&offset=${currentOffset}`, {
+        const response = await fetch(`${API_BASE_URL}/books/?limit=50&include_total=1`, {
             credentials: 'include',
             signal: controller.signal
         });
@@ -353,6 +413,7 @@ async function loadAllBooks() {
         // Update global state
         totalResults = data.total || data.count;
         hasMoreResults = data.has_more || false;
+        nextCursor = data.next_cursor;
         
         displayBooks(data.results, false);
         const totalInfo = data.total ? ` (Toplam ${data.total} kitap)` : '';
@@ -401,8 +462,8 @@ function displayBooks(books, append = false) {
             ? `<p class="expected-return">Beklenen iade tarihi: ${formatDate(book.expected_return_date)}</p>`
             : '';
         
-        // Truncate explanation to first 50 characters
-        const explanation = book.explanation || '';
+        // Truncate the summary to first 50 characters; the detail view has the full text
+        const explanation = book.summary || '';
         const truncatedExplanation = explanation.length > 50 
             ? explanation.substring(0, 50) + '...' 
             : explanation;
@@ -472,17 +533,26 @@ async function initProfile() {
     }
 }
 
-async function loadBorrowings() {
+async function loadBorrowings(append = false) {
     const borrowingsList = document.getElementById('borrowingsList');
+    const moreButton = document.getElementById('moreBorrowingsButton');
+    if (!append) {
+        borrowingsOffset = 0;
+    }
     
     try {
-        const response = await fetch(`${API_BASE_URL}/member/borrowings/`, {
+        // Unchanged pages are revalidated by the browser cache (ETag)
+        const response = await fetch(`${API_BASE_URL}/member/borrowings/?limit=${BORROWINGS_PAGE_SIZE}&offset=${borrowingsOffset}`, {
             credentials: 'include'
         });
         const data = await response.json();
         
         if (response.ok) {
-            displayBorrowings(data.borrowings);
+            displayBorrowings(data.borrowings, append);
+            borrowingsOffset += data.borrowings.length;
+            if (moreButton) {
+                moreButton.style.display = data.has_more ? 'inline-block' : 'none';
+            }
         } else {
             borrowingsList.innerHTML = '<p>Ödünç alma kayıtları yüklenemedi.</p>';
         }
@@ -492,15 +562,15 @@ async function loadBorrowings() {
     }
 }
 
-function displayBorrowings(borrowings) {
+function displayBorrowings(borrowings, append = false) {
     const borrowingsList = document.getElementById('borrowingsList');
     
-    if (borrowings.length === 0) {
+    if (borrowings.length === 0 && !append) {
         borrowingsList.innerHTML = '<p>Henüz ödünç alma kaydınız bulunmamaktadır.</p>';
         return;
     }
     
-    borrowingsList.innerHTML = borrowings.map(borrow => {
+    const html = borrowings.map(borrow => {
         const statusClass = borrow.status.toLowerCase();
         const statusText = {
             'active': 'Aktif',
@@ -536,6 +606,12 @@ function displayBorrowings(borrowings) {
             </div>
         `;
     }).join('');
+    
+    if (append) {
+        borrowingsList.insertAdjacentHTML('beforeend', html);
+    } else {
+        borrowingsList.innerHTML = html;
+    }
 }
 
 async function loadProfileInfo() {
@@ -864,13 +940,15 @@ async function loadMoreBooks() {
     try {
         currentOffset += 50;
         
+        // Continue after the last book of the previous page
+        const cursorParam = `cursor=${encodeURIComponent(nextCursor)}`;
         let url;
         if (currentSearchQuery) {
             // Loading more search results
-            url = `${API_BASE_URL}/books/search/?q=${encodeURIComponent(currentSearchQuery)}&limit=50&offset=${currentOffset}`;
+            url = `${API_BASE_URL}/books/search/?q=${encodeURIComponent(currentSearchQuery)}&limit=50&${cursorParam}`;
         } else {
             // Loading more all books
-            url = `${API_BASE_URL}/books/?limit=50&offset=${currentOffset}`;
+            url = `${API_BASE_URL}/books/?limit=50&${cursorParam}`;
         }
         
         const response = await fetch(url, {
@@ -886,6 +964,7 @@ async function loadMoreBooks() {
         // Update global state
         hasMoreResults = data.has_more || false;
         totalResults = data.total || totalResults;
+        nextCursor = data.next_cursor;
         
         // Append new books to existing ones
         displayBooks(data.results, true);